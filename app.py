@@ -1,67 +1,110 @@
+import queue
 import streamlit as st
 import os
 import sys
 import re
-from dotenv import load_dotenv
+import uuid
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(current_dir, "core"))
 
+import config
 from core.agent import ReactAgent  # 确保路径正确
+from memory.manager import get_memory_manager
+from tools import district_index
+from tools.static_map_cache import static_map_cache
+from utils.http_client import AMAP_BASE_URL
+from utils.event_loop import BackgroundLoop
+from utils.render import build_render_artifact
 
 # 页面配置
 st.set_page_config(page_title="灵感旅途", page_icon="🌍", layout="wide")
 
-# 加载环境变量
-load_dotenv()
 
+@st.cache_resource  # 整个进程一个常驻的事件循环，所有会话的查询都在这里并发执行
+def get_event_loop():
+    return BackgroundLoop()
 
-@st.cache_resource  # 保证 Agent 全局唯一且不重复初始化
+
+@st.cache_resource  # 保证 Agent 全局唯一且不重复初始化；每次查询的状态在 arun 内部隔离
 def get_agent():
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    url = "https://api.deepseek.com/v1"
-    return ReactAgent(api_key=api_key, url=url)
+    # 共享持久化记忆：重启或 rerun 后可复用之前的地理编码和 POI 结果
+    agent = ReactAgent(
+        api_key=config.DEEPSEEK_API_KEY,
+        url=config.LLM_BASE_URL,
+        memory=get_memory_manager(),
+        loop=get_event_loop(),
+    )
+    # 后台导入 openai，不阻塞首屏渲染
+    agent.model.warm_up()
+    # 没有行政区划快照时在后台拉取，侧边栏先走网络查询
+    district_index.warm_up()
+    return agent
 
 
-def render_assistant_response(text):
+def get_render_artifact(message: dict) -> dict:
     """
-    解析 Agent 的回复，如果里面有地图 URL，则渲染成图片组件
+    助手消息的渲染产物（见 utils/render.py），第一次用到时解析并存进消息里，
+    之后 rerun 不再重新匹配 URL、查询地图缓存。
     """
-    # [^)\s]+ 表示匹配除了 "右括号 )" 和 "空白字符" 之外的所有字符
-    # 这样就能把 key=<用户的密钥> 完整抓取下来了
-    map_url_pattern = r"(https://restapi\.amap\.com/v3/staticmap\?[^)\s]+)"
+    artifact = message.get("render")
+    if artifact is None:
+        # 地图图片走本地磁盘缓存：URL 里的 key（哪怕是 <用户的密钥> 这样的占位符）会被去掉，
+        # 下载时由服务端补上真实 Key，同一张图只下载一次
+        artifact = message["render"] = build_render_artifact(
+            message["content"], static_map_cache.get
+        )
+    return artifact
 
-    match = re.search(map_url_pattern, text)
 
-    if match:
-        full_url = match.group(1)  # 获取匹配到的 URL 完整部分
-
-        # 只要发现 URL 里包含 <...> 或者 key 不完整，就强行替换
-        if "<" in full_url or "key=" not in full_url or "用户的密钥" in full_url:
-            # 从环境变量重新获取 Key
-            real_key = os.getenv("GAODEDITY_API_KEY")
-
-            if real_key:
-                # 情况 A: Agent 把 key 写成了 key=<用户的密钥> -> 正则替换
-                if "key=" in full_url:
-                    full_url = re.sub(r"key=[^&]*", f"key={real_key}", full_url)
-                # 情况 B: Agent 压根没写 key 参数 -> 在末尾补上
-                else:
-                    full_url += f"&key={real_key}"
-
-            # 打印修复后的 URL 方便调试
-            print(f"🔧 [自动修复] 地图 Key 已替换，最终 URL: {full_url}")
-
-        # 将文本中的长 URL 替换为短提示
-        clean_text = text.replace(match.group(0), " *(⬇️ 查看下方地图)* ")
-        st.markdown(clean_text)
-
-        # 渲染图片
-        with st.expander("🗺️ 点击查看推荐位置分布图", expanded=True):
+def render_assistant_response(artifact: dict):
+    """
+    按渲染产物展示 Agent 的回复，如果里面有地图，则渲染成图片组件
+    """
+    st.markdown(artifact["markdown"])
+    if not artifact["map_url"]:
+        return
+
+    image_path = artifact["image"]
+    if image_path and not os.path.exists(image_path):
+        # 图片被缓存淘汰了，重新取一次
+        image_path = artifact["image"] = static_map_cache.get(artifact["map_url"])
+
+    # 渲染图片
+    with st.expander("🗺️ 点击查看推荐位置分布图", expanded=True):
+        if image_path:
             # width="stretch" 是新版 Streamlit 的写法，防止报错
-            st.image(full_url, caption="推荐行程可视化", width="stretch")
-    else:
-        st.markdown(text)
+            st.image(image_path, caption="推荐行程可视化", width="stretch")
+        else:
+            st.warning("地图加载失败，请检查 GAODEDITY_API_KEY 或地图参数。")
+
+
+def run_query(query: str, location: str, show_token):
+    """
+    把查询交给后台事件循环执行，脚本线程只负责把流式输出画到页面上。
+    st.* 只能在脚本线程里调用，所以 on_token 先把内容放进队列，这里取出来再渲染。
+    """
+    tokens = queue.Queue()
+    future = agent.loop.submit(
+        agent.arun(
+            query,
+            verbose=True,
+            on_token=lambda token, iteration: tokens.put((token, iteration)),
+            location=location,
+        )
+    )
+    try:
+        while not (future.done() and tokens.empty()):
+            try:
+                token, iteration = tokens.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            show_token(token, iteration)
+        return future.result()
+    except BaseException:
+        # 页面被关闭或脚本被中断时，取消后台的查询
+        future.cancel()
+        raise
 
 
 def get_think_response(text):
@@ -91,19 +134,26 @@ def get_think_response(text):
     return None
 
 
-# 初始化 Agent和critic Agent
+# 初始化 Agent
 agent = get_agent()
-critic_agent = get_agent()
+
+# 每次 rerun 只渲染最近的这么多条历史消息，更早的按页展开
+HISTORY_PAGE_SIZE = config.get_int("CHAT_HISTORY_PAGE_SIZE", 20)
 
 #  初始化 Session State
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "history_visible" not in st.session_state:
+    st.session_state.history_visible = HISTORY_PAGE_SIZE
 
 # 4. 侧边栏
 with st.sidebar:
     st.title("⚙️ 控制面板")
     if st.button("清空对话历史"):
         st.session_state.messages = []
+        st.session_state.history_visible = HISTORY_PAGE_SIZE
         st.rerun()
     st.markdown(" ")
     st.markdown("### 🤖 状态")
@@ -196,8 +246,8 @@ with st.sidebar:
         st.subheader("2. 测试高德地图 API")
 
         # 强制重新读取环境变量，防止缓存问题
-        load_dotenv(override=True)
-        my_key = os.getenv("GAODEDITY_API_KEY")
+        config.reload()
+        my_key = config.amap_key()
 
         if not my_key:
             st.error(
@@ -206,33 +256,41 @@ with st.sidebar:
         else:
             st.info(f"当前读取到的 Key 前4位: {my_key[:4]}****")
 
-            # 手动构造一个绝对正确的 URL (北京天安门)
-            # 这里的参数非常简单，排除复杂参数导致的错误
-            test_url = f"https://restapi.amap.com/v3/staticmap?location=116.397428,39.90923&zoom=13&size=700*300&markers=mid,0xFF0000,A:116.397428,39.90923&key={my_key}"
+            # 手动构造一个绝对正确的 URL (北京天安门)，不带 key：
+            # 和聊天里的地图一样经 static_map_cache 在服务端补上 key 下载，浏览器只拿到本地图片
+            test_url = (
+                f"{AMAP_BASE_URL}/v3/staticmap?location=116.397428,39.90923&zoom=13"
+                "&size=700*300&markers=mid,0xFF0000,A:116.397428,39.90923"
+            )
 
-            st.markdown(f"**正在尝试请求的 URL:**")
-            st.code(test_url)  # 展示出来，你可以复制到浏览器试试
+            st.markdown(f"**正在尝试请求的 URL（下载时由服务端补上 Key）:**")
+            st.code(test_url)
 
-            try:
+            image_path = static_map_cache.get(test_url)
+            if image_path:
                 st.image(
-                    test_url,
+                    image_path,
                     caption="如果能看到地图，说明 Key 和 API 正常",
-                    use_container_width=True,
+                    width="stretch",
                 )
                 st.success("✅ 高德地图加载成功！问题出在 Agent 生成的 URL 上。")
-            except Exception as e:
-                st.error(f"❌ 高德地图加载失败: {e}")
-                st.warning("请尝试复制上面的 URL 到浏览器中打开，看看报错信息是什么？")
+            else:
+                st.error("❌ 高德地图加载失败，请检查 Key 是否有效、是否开通了静态地图服务。")
 
 #  主界面
 st.title("🌍 灵感旅途")
 
 
-# 展示对话历史
-for message in st.session_state.messages:
+# 展示对话历史：只渲染最近 history_visible 条，长对话 rerun 的耗时不随历史增长
+messages = st.session_state.messages
+first = max(len(messages) - st.session_state.history_visible, 0)
+if first > 0 and st.button(f"显示更早的消息（还有 {first} 条）"):
+    st.session_state.history_visible += HISTORY_PAGE_SIZE
+    st.rerun()
+for message in messages[first:]:
     with st.chat_message(message["role"]):
         if message["role"] == "assistant":
-            render_assistant_response(message["content"])
+            render_assistant_response(get_render_artifact(message))
         else:
             st.markdown(message["content"])
 
@@ -242,29 +300,42 @@ if query := st.chat_input("今天的行程的灵感？"):
     with st.chat_message("user"):
         st.markdown(query)
     st.session_state.messages.append({"role": "user", "content": query})
+    agent.memory.save_message(st.session_state.session_id, "user", query)
 
-    # 如果侧边栏有确定的位置，将其作为系统提示前缀加到 query 中
-    context_prefix = ""
-    if "address_name" in st.session_state:
-        context_prefix = f"【系统提示：用户当前所在的精确位置是：{st.session_state.address_name}。请基于此位置回答。】\n"
-
-    full_prompt = context_prefix + query
+    # 如果侧边栏有确定的位置，作为动态上下文传给 Agent（不拼进系统提示，保证前缀缓存命中）
+    location = st.session_state.get("address_name")
 
     # 展示 Assistant 响应
     with st.chat_message("assistant"):
         with st.status("Agent 正在深度思考并调用工具...", expanded=True) as status:
-            response_text, thought_list = agent.run(full_prompt, verbose=True)
+            # 实时展示模型正在生成的内容，每一轮思考用一个占位框
+            stream_boxes = {}
+            stream_texts = {}
+
+            def show_token(token, iteration):
+                if iteration not in stream_boxes:
+                    stream_boxes[iteration] = st.empty()
+                    stream_texts[iteration] = f"**第 {iteration + 1} 次思考**\n\n"
+                stream_texts[iteration] += token
+                stream_boxes[iteration].markdown(stream_texts[iteration])
+
+            # 在常驻的后台事件循环里执行：多个会话共用同一个 agent 和连接池，不会互相排队
+            response_text, thought_list = run_query(query, location, show_token)
+            for box in stream_boxes.values():
+                box.empty()
             st.markdown(thought_list[1])
-            # 注意：这里传给 Agent 的是 full_prompt (带位置信息)，而不是原始 query
             status.update(label="思考完成！", state="complete", expanded=False)
             # 调用渲染函数
+        assistant_message = {"role": "assistant", "content": response_text}
         with st.spinner("正在渲染最终回答..."):
-            render_assistant_response(response_text)
+            render_assistant_response(get_render_artifact(assistant_message))
 
-    # 处理模型的回复的全部信息，得到有用的信息
+    # 保存完整的 ReAct 过程（后台异步写入，不阻塞页面）
     raw_response = thought_list[0]
-    # TODO:后续补充
-    pass
+    agent.memory.save_trace(
+        st.session_state.session_id, query, raw_response, response_text
+    )
+    agent.memory.save_message(st.session_state.session_id, "assistant", response_text)
 
-    # 注意：存入历史记录时，建议只存 response_text，保持纯净
-    st.session_state.messages.append({"role": "assistant", "content": response_text})
+    # 注意：存入历史记录时，建议只存 response_text，保持纯净；渲染产物随消息一起保存，rerun 时直接复用
+    st.session_state.messages.append(assistant_message)
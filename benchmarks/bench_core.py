@@ -0,0 +1,229 @@
+"""
+Agent 热路径的组件级基准测试。
+
+覆盖：ReActParser.parse、SystemPromptBuilder.build_system_prompt、ReactTools 构造、
+map_position 的 URL 拼接、nearby_search_advanced 的结果整理，以及一次完整的
+ReactAgent.run 和多会话并发的 ReactAgent.arun（连接本地模拟的 LLM 和高德服务，
+见 benchmarks/stubs.py）。
+
+请通过 python -m benchmarks.run 运行，它会先把上游地址指向本地模拟服务。
+"""
+
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "core"))
+
+from benchmarks.bench_parser import load_corpus
+from benchmarks.harness import measure
+from benchmarks.stubs import make_pois
+
+
+def bench_parser(quick: bool = False) -> dict:
+    from core.parser import ReActParser
+
+    parser = ReActParser()
+    corpus = load_corpus()
+    return measure(
+        lambda: [parser.parse(text) for text in corpus], number=5 if quick else 50
+    )
+
+
+def bench_build_system_prompt(quick: bool = False) -> dict:
+    from core.prompt import SystemPromptBuilder
+    from tools.tool import ReactTools
+
+    builder = SystemPromptBuilder(ReactTools())
+    return measure(builder.build_system_prompt, number=50 if quick else 2000)
+
+
+def bench_react_tools_init(quick: bool = False) -> dict:
+    from tools.tool import ReactTools
+
+    return measure(ReactTools, number=50 if quick else 2000)
+
+
+def bench_validate_args(quick: bool = False) -> dict:
+    """按工具描述校验、规整一次 map_position 的参数（坐标是数字列表，名称是一个字符串）"""
+    from tools.tool import ReactTools
+
+    tools = ReactTools()
+    kwargs = {
+        "locations": [[116.397 + i / 100, 39.909 + i / 100] for i in range(8)],
+        "names": "、".join(f"景点{i}" for i in range(8)),
+        "optimize_order": "true",
+    }
+    return measure(
+        lambda: tools.validate_args("map_position", kwargs), number=200 if quick else 20000
+    )
+
+
+def bench_map_position(quick: bool = False) -> dict:
+    from tools.map_position import map_position
+
+    locations = [f"104.0{i:02d}000,30.6{i:02d}000" for i in range(8)]
+    names = [f"景点{i}:名称,测试|{i}" for i in range(8)]
+    return measure(
+        lambda: map_position(locations, names), number=100 if quick else 5000
+    )
+
+
+def bench_optimize_route(quick: bool = False) -> dict:
+    import numpy as np
+    from tools.route_optimizer import optimize_route
+
+    rng = np.random.default_rng(0)
+    locations = [
+        f"{104 + rng.random() * 0.2:.6f},{30.6 + rng.random() * 0.2:.6f}"
+        for _ in range(100)
+    ]
+    return measure(lambda: optimize_route(locations), number=3 if quick else 20)
+
+
+def bench_rank_pois(quick: bool = False) -> dict:
+    from tools.poi_ranking import rank_pois
+
+    pois = make_pois(50)
+    return measure(
+        lambda: rank_pois(pois, "cheap,open_now", top_k=5), number=50 if quick else 2000
+    )
+
+
+def bench_format_pois_advanced(quick: bool = False) -> dict:
+    from tools.nearby_search import format_pois_advanced
+
+    pois = make_pois(10)
+    return measure(lambda: format_pois_advanced(pois), number=100 if quick else 5000)
+
+
+GEOCODE_ADDRESSES = [f"成都市锦江区春熙路{i}号" for i in range(8)]
+
+
+def bench_geocode_sequential(quick: bool = False) -> dict:
+    """逐个地理编码 8 个地址（不走缓存，连接本地模拟的高德服务）"""
+    from tools.address_to_location import address_to_location
+
+    return measure(
+        lambda: [address_to_location(a) for a in GEOCODE_ADDRESSES],
+        number=5 if quick else 200,
+    )
+
+
+def bench_geocode_batch(quick: bool = False) -> dict:
+    """同样 8 个地址用一次 batch=true 请求"""
+    from tools.address_to_location import batch_address_to_location
+
+    return measure(
+        lambda: batch_address_to_location(GEOCODE_ADDRESSES), number=5 if quick else 200
+    )
+
+
+def bench_render_artifact(quick: bool = False) -> dict:
+    """一条带静态地图的回复解析成渲染产物（不下载图片）"""
+    from utils.http_client import AMAP_BASE_URL
+    from utils.render import build_render_artifact
+
+    text = (
+        "思考：已经拿到周边景点。\n最终答案：推荐以下行程：\n"
+        + "\n".join(f"{i}. 景点{i}，距离 {i * 300} 米" for i in range(1, 9))
+        + f"\n![地图]({AMAP_BASE_URL}/v3/staticmap?size=750*400"
+        "&markers=mid,,A:116.397,39.909|mid,,B:116.403,39.915)"
+    )
+    return measure(lambda: build_render_artifact(text), number=200 if quick else 20000)
+
+
+def bench_agent_run(llm_url: str, quick: bool = False) -> dict:
+    """完整跑一次 ReAct 循环（3 轮模型调用、3 次工具调用），每次都清空工具缓存和 POI 索引"""
+    from core.agent import ReactAgent
+    from tools.poi_index import poi_index
+    from tools.tool_cache import default_tool_cache
+
+    agent = ReactAgent(api_key="stub", url=llm_url)
+    agent.model.client = agent.model.client.with_options(max_retries=0)
+
+    def run_once():
+        default_tool_cache.cache.clear()
+        poi_index.clear()
+        answer, _ = agent.run("成都春熙路附近吃火锅", verbose=False)
+        assert answer.startswith("推荐"), answer
+
+    return measure(run_once, number=2 if quick else 10, repeat=3)
+
+
+def bench_agent_run_plan(llm_url: str, quick: bool = False) -> dict:
+    """计划模式跑同一个问题（2 次模型调用、4 次工具调用），模拟服务需要用 PLAN_SCRIPT 启动"""
+    from core.agent import ReactAgent
+    from tools.poi_index import poi_index
+    from tools.tool_cache import default_tool_cache
+
+    agent = ReactAgent(api_key="stub", url=llm_url)
+
+    def run_once():
+        default_tool_cache.cache.clear()
+        poi_index.clear()
+        answer, _ = agent.run("成都春熙路附近吃火锅", verbose=False, mode="plan")
+        assert answer.startswith("推荐"), answer
+
+    return measure(run_once, number=2 if quick else 10, repeat=3)
+
+
+def bench_agent_run_plan_cached(llm_url: str, quick: bool = False) -> dict:
+    """同 bench_agent_run_plan，但开启模型回复缓存并预热一次，两次模型调用都命中缓存"""
+    import tempfile
+
+    from core.agent import ReactAgent
+    from tools.poi_index import poi_index
+    from tools.tool_cache import default_tool_cache
+    from utils.llm_cache import CompletionCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = ReactAgent(api_key="stub", url=llm_url)
+        agent.model.cache = CompletionCache(tmp)
+
+        def run_once():
+            default_tool_cache.cache.clear()
+            poi_index.clear()
+            answer, _ = agent.run("成都春熙路附近吃火锅", verbose=False, mode="plan")
+            assert answer.startswith("推荐"), answer
+
+        run_once()
+        return measure(run_once, number=2 if quick else 10, repeat=3)
+
+
+def bench_agent_arun_concurrent(llm_url: str, quick: bool = False, sessions: int = 16) -> dict:
+    """同一个 agent 上同时跑 sessions 个 arun，衡量多会话并发时的总耗时"""
+    import asyncio
+    from core.agent import ReactAgent
+    from tools.poi_index import poi_index
+    from tools.tool_cache import default_tool_cache
+
+    agent = ReactAgent(api_key="stub", url=llm_url)
+
+    async def run_all():
+        return await asyncio.gather(
+            *(agent.arun(f"成都春熙路附近吃火锅{i}", verbose=False) for i in range(sessions))
+        )
+
+    def run_once():
+        default_tool_cache.cache.clear()
+        poi_index.clear()
+        results = asyncio.run(run_all())
+        assert all(answer.startswith("推荐") for answer, _ in results)
+
+    return measure(run_once, number=1 if quick else 3, repeat=3)
+
+
+CASES = {
+    "parser.parse[corpus]": bench_parser,
+    "prompt.build_system_prompt": bench_build_system_prompt,
+    "tools.ReactTools()": bench_react_tools_init,
+    "tools.validate_args[map_position]": bench_validate_args,
+    "map_position[8 points]": bench_map_position,
+    "route_optimizer.optimize_route[100]": bench_optimize_route,
+    "poi_ranking.rank_pois[50]": bench_rank_pois,
+    "nearby_search.format_pois_advanced[10]": bench_format_pois_advanced,
+    "render.build_render_artifact": bench_render_artifact,
+    "address_to_location[8 sequential]": bench_geocode_sequential,
+    "batch_address_to_location[8]": bench_geocode_batch,
+}
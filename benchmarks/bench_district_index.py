@@ -0,0 +1,85 @@
+"""
+行政区划索引的基准测试：快照加载耗时、内存占用、单次查询耗时。
+
+运行（项目根目录）：
+    python -m benchmarks.bench_district_index            使用 data/districts.json
+    python -m benchmarks.bench_district_index --synthetic 使用合成的全国规模数据
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from tools.district_index import DistrictIndex, SNAPSHOT_PATH
+
+
+def synthetic_tree(provinces: int = 34, cities: int = 10, districts: int = 10) -> list:
+    """按全国规模（约 3,700 个节点）生成一棵假的行政区划树"""
+    root = ["中华人民共和国", "100000", "country", []]
+    for p in range(provinces):
+        province = [f"测试{p}省", f"{p + 11:02d}0000", "province", []]
+        for c in range(cities):
+            city = [f"测试{p}省{c}市", f"{p + 11:02d}{c + 1:02d}00", "city", []]
+            for d in range(districts):
+                city[3].append(
+                    [f"测试{p}省{c}市{d}区", f"{p + 11:02d}{c + 1:02d}{d + 1:02d}", "district", []]
+                )
+            province[3].append(city)
+        root[3].append(province)
+    return root
+
+
+def bench(path: str, repeat: int = 5) -> dict:
+    # 1. 加载耗时：读文件 + json 解析 + 建索引
+    load_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index = DistrictIndex.from_snapshot(path)
+        load_times.append(time.perf_counter() - start)
+
+    # 2. 内存占用：tracemalloc 统计索引常驻的内存
+    tracemalloc.start()
+    index = DistrictIndex.from_snapshot(path)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # 3. 查询耗时：省 -> 市 -> 区 三级联动各查一次
+    province = index.sub_districts("中国")[0]
+    city = index.sub_districts(province)[0]
+    number = 100_000
+    seconds = timeit.timeit(
+        lambda: (
+            index.sub_districts("中国"),
+            index.sub_districts(province),
+            index.sub_districts(city),
+        ),
+        number=number,
+    )
+    return {
+        "nodes": len(index),
+        "snapshot_bytes": os.path.getsize(path),
+        "load_ms_min": round(min(load_times) * 1000, 2),
+        "resident_kb": round(current / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+        "lookup_us": round(seconds / (number * 3) * 1e6, 3),
+    }
+
+
+if __name__ == "__main__":
+    if "--synthetic" in sys.argv or not os.path.exists(SNAPSHOT_PATH):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".json", delete=False, encoding="utf-8"
+        ) as f:
+            json.dump(synthetic_tree(), f, ensure_ascii=False, separators=(",", ":"))
+            path = f.name
+        print("使用合成数据：", path)
+    else:
+        path = SNAPSHOT_PATH
+        print("使用快照：", path)
+    print(json.dumps(bench(path), ensure_ascii=False, indent=2))
+    if path != SNAPSHOT_PATH:
+        os.remove(path)
@@ -0,0 +1,87 @@
+"""
+ReAct 解析器的微基准测试。
+
+对语料 benchmarks/corpus/react_outputs.jsonl 中的每条模型输出，按流式 token 切块后比较：
+- full:        生成结束后用 ReActParser.parse_all 整段解析一次
+- rescan:      每来一个 token 都对已生成的全文重新判断一次行动边界（从头扫描）
+- incremental: 每来一个 token 只把新内容 feed 给 IncrementalReActParser
+
+运行（项目根目录）：
+    python -m benchmarks.bench_parser [--chunk 2] [--number 200]
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from core.parser import ReActParser, IncrementalReActParser
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "react_outputs.jsonl")
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def chunked(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def run_full(parser: ReActParser, text: str):
+    return parser.parse_all(text)
+
+
+def run_rescan(parser: ReActParser, chunks: list[str]):
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        if parser.action_boundary(text) >= 0:
+            break
+    return parser.parse_all(text)
+
+
+def run_incremental(parser: ReActParser, chunks: list[str]):
+    stream_parser = IncrementalReActParser(parser)
+    for chunk in chunks:
+        stream_parser.feed(chunk)
+        if stream_parser.boundary() >= 0:
+            return stream_parser.actions
+    stream_parser.close()
+    return stream_parser.actions
+
+
+def bench(chunk_size: int = 2, number: int = 200) -> dict:
+    parser = ReActParser()
+    corpus = load_corpus()
+    chunks = [chunked(text, chunk_size) for text in corpus]
+
+    # 不同切块方式下，增量解析的结果必须一致
+    for text in corpus:
+        expected = run_incremental(parser, [text])
+        for size in (1, 3, 7):
+            assert run_incremental(parser, chunked(text, size)) == expected, text
+
+    results = {}
+    cases = {
+        "full": lambda: [run_full(parser, text) for text in corpus],
+        "rescan": lambda: [run_rescan(parser, c) for c in chunks],
+        "incremental": lambda: [run_incremental(parser, c) for c in chunks],
+    }
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        results[f"{name}_us_per_response"] = round(
+            seconds / (number * len(corpus)) * 1e6, 2
+        )
+    results["responses"] = len(corpus)
+    results["chunk_size"] = chunk_size
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--chunk", type=int, default=2, help="每个流式 token 的字符数")
+    arg_parser.add_argument("--number", type=int, default=200)
+    args = arg_parser.parse_args()
+    print(json.dumps(bench(args.chunk, args.number), ensure_ascii=False, indent=2))
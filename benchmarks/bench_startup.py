@@ -0,0 +1,91 @@
+"""
+冷启动基准测试：每次都在新的 Python 进程里测量，避免模块缓存的影响。
+
+- import:      导入 core.agent 的耗时
+- agent:       导入 + 构造 ReactAgent（含系统提示）的耗时
+- first_paint: 用 streamlit.testing 完整执行一遍 app.py（侧边栏的定位、省市区查询连接本地模拟服务）
+
+运行（项目根目录）：
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.stubs import StubAMapServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, "core")
+import core.agent
+print(time.perf_counter() - start)
+"""
+
+_AGENT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, "core")
+from core.agent import ReactAgent
+ReactAgent(api_key="stub", url="http://127.0.0.1:9/v1")
+print(time.perf_counter() - start)
+"""
+
+_FIRST_PAINT = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=30).run()
+assert not app.exception, app.exception
+print(time.perf_counter() - start)
+"""
+
+
+def _run(code: str, env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    with StubAMapServer() as amap, tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            AMAP_BASE_URL=amap.base_url,
+            WTTR_BASE_URL=amap.base_url,
+            GAODEDITY_API_KEY="stub-key",
+            DEEPSEEK_API_KEY="stub",
+            DISTRICT_INDEX_AUTO_BUILD="0",
+            MEMORY_DB_PATH=os.path.join(tmp, "memory.db"),
+            TRACE_JSONL_PATH="",
+        )
+        results = {}
+        for name, code in (("import", _IMPORT), ("agent", _AGENT), ("first_paint", _FIRST_PAINT)):
+            timings = [_run(code, env) * 1000 for _ in range(args.repeat)]
+            results[name] = {
+                "min_ms": round(min(timings), 1),
+                "median_ms": round(statistics.median(timings), 1),
+            }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
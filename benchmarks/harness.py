@@ -0,0 +1,102 @@
+"""
+基准测试的公共工具：计时、内存分配统计、结果保存与对比。
+"""
+
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+def measure(func, number: int = 100, repeat: int = 5, warmup: int = 1) -> dict:
+    """
+    多次运行 func，返回单次调用的耗时和内存分配情况：
+    - min_us / median_us: 每次调用耗时（微秒），取 repeat 轮里的最小值和中位数
+    - peak_kb:            单次调用期间 Python 分配的内存峰值（tracemalloc）
+    - alloc_blocks:       单次调用结束后仍存活的新增内存块数（泄漏/缓存增长的信号）
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    blocks_after = sys.getallocatedblocks()
+
+    return {
+        "min_us": round(min(timings) * 1e6, 2),
+        "median_us": round(statistics.median(timings) * 1e6, 2),
+        "peak_kb": round(peak / 1024, 2),
+        "alloc_blocks": blocks_after - blocks_before,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def environment() -> dict:
+    """记录运行环境，方便对比不同提交的结果"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def save(results: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def compare(baseline_path: str, results: dict, threshold: float = 0.10) -> list:
+    """
+    和基线结果对比 min_us，返回变慢超过 threshold 的用例列表，并打印对比表。
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"{'用例':<40}{'基线(us)':>12}{'当前(us)':>12}{'变化':>10}")
+    for name, current in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            print(f"{name:<40}{'-':>12}{current['min_us']:>12}{'新增':>10}")
+            continue
+        change = (current["min_us"] - base["min_us"]) / base["min_us"]
+        flag = " <-- 变慢" if change > threshold else ""
+        print(
+            f"{name:<40}{base['min_us']:>12}{current['min_us']:>12}{change:>+10.1%}{flag}"
+        )
+        if change > threshold:
+            regressions.append(name)
+    return regressions
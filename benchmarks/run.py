@@ -0,0 +1,76 @@
+"""
+运行全部组件基准测试，并可与之前保存的结果对比。
+
+    python -m benchmarks.run                          运行并打印结果
+    python -m benchmarks.run --out base.json          保存结果
+    python -m benchmarks.run --compare base.json      与基线对比，变慢超过 10% 时退出码为 1
+    python -m benchmarks.run --quick                  少跑几轮，快速检查
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.stubs import PLAN_SCRIPT, StubAMapServer, StubLLMServer
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--out", help="把结果保存为 JSON")
+    arg_parser.add_argument("--compare", help="与基线 JSON 对比")
+    arg_parser.add_argument("--threshold", type=float, default=0.10)
+    arg_parser.add_argument("--quick", action="store_true")
+    args = arg_parser.parse_args()
+
+    with StubAMapServer() as amap, StubLLMServer() as llm, StubLLMServer(
+        script=PLAN_SCRIPT
+    ) as plan_llm:
+        # 必须在导入工具模块之前设置，工具模块在导入时读取上游地址
+        os.environ["AMAP_BASE_URL"] = amap.base_url
+        os.environ["WTTR_BASE_URL"] = amap.base_url
+        os.environ["GAODEDITY_API_KEY"] = "stub-key"
+        os.environ["DISTRICT_INDEX_AUTO_BUILD"] = "0"
+
+        from benchmarks import bench_core
+        from benchmarks.harness import compare, environment, save
+
+        results = {"environment": environment(), "cases": {}}
+        for name, bench in bench_core.CASES.items():
+            results["cases"][name] = bench(quick=args.quick)
+            print(f"{name:<40} {results['cases'][name]['min_us']:>12} us")
+        name = "agent.run[stub llm+amap]"
+        results["cases"][name] = bench_core.bench_agent_run(
+            llm.base_url + "/v1", quick=args.quick
+        )
+        print(f"{name:<40} {results['cases'][name]['min_us']:>12} us")
+        name = "agent.run[plan mode]"
+        results["cases"][name] = bench_core.bench_agent_run_plan(
+            plan_llm.base_url + "/v1", quick=args.quick
+        )
+        print(f"{name:<40} {results['cases'][name]['min_us']:>12} us")
+        name = "agent.run[plan mode, llm cache hit]"
+        results["cases"][name] = bench_core.bench_agent_run_plan_cached(
+            plan_llm.base_url + "/v1", quick=args.quick
+        )
+        print(f"{name:<40} {results['cases'][name]['min_us']:>12} us")
+        name = "agent.arun[16 sessions]"
+        results["cases"][name] = bench_core.bench_agent_arun_concurrent(
+            llm.base_url + "/v1", quick=args.quick
+        )
+        print(f"{name:<40} {results['cases'][name]['min_us']:>12} us")
+
+    if args.out:
+        save(results, args.out)
+    else:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.compare:
+        regressions = compare(args.compare, results, args.threshold)
+        if regressions:
+            print("变慢的用例：", ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+本地模拟服务：用来在没有网络、不消耗 API 额度的情况下跑完整的 Agent 基准测试。
+
+- StubLLMServer:  兼容 OpenAI 的 /v1/chat/completions（支持 stream=True 的 SSE）
+- StubAMapServer: 高德 v3/geocode/geo、v3/ip、v3/config/district、v5/place/around、
+                  v3/staticmap，以及 wttr.in 风格的天气接口 /{city}?format=j1
+
+两个服务都可以设置固定延迟，模拟真实的网络耗时；StubAMapServer 还可以设置 QPS 上限，
+超出时和高德一样返回 HTTP 200 + infocode 10021，也可以让接下来的请求依次返回指定的
+infocode 错误（errors 列表），用来测试 utils/rate_limit.py。
+"""
+
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse, unquote
+
+# 默认的模型剧本：按对话里 assistant 消息的数量决定这一轮返回什么
+DEFAULT_SCRIPT = [
+    "思考：先同时查询天气和春熙路的坐标。\n"
+    "行动：get_weather\n行动输入：{\"city\": \"成都\"}\n"
+    "行动：address_to_location\n行动输入：{\"address\": \"成都市锦江区春熙路\"}\n",
+    "思考：拿到坐标了，搜索周边的火锅店。\n"
+    "行动：nearby_search_advanced\n"
+    "行动输入：{\"location\": \"104.080989,30.657689\", \"keywords\": \"火锅\", \"radius\": 1500}\n"
+    "观察：模型编造的观察，应当被截断",
+    "思考：信息足够了。\n最终答案：推荐你中午去春熙路附近的火锅店，天气晴朗适合步行。",
+]
+
+# 计划模式（mode="plan"）的剧本：第一轮给出工具调用的依赖图，第二轮根据执行结果回答
+PLAN_SCRIPT = [
+    "思考：需要春熙路坐标、天气，再按坐标搜索火锅店并画出地图。\n"
+    "计划：\n"
+    "[\n"
+    "  {\"id\": \"loc\", \"tool\": \"address_to_location\", \"args\": {\"address\": \"成都市锦江区春熙路\"}},\n"
+    "  {\"id\": \"weather\", \"tool\": \"get_weather\", \"args\": {\"city\": \"成都\"}},\n"
+    "  {\"id\": \"food\", \"tool\": \"nearby_search_advanced\", "
+    "\"args\": {\"location\": \"${loc}\", \"keywords\": \"火锅\", \"radius\": 1500, \"preferences\": \"open_now\", \"top_k\": 3}},\n"
+    "  {\"id\": \"map\", \"tool\": \"map_position\", "
+    "\"args\": {\"locations\": \"${food.*.位置详情.经纬度}\", \"names\": \"${food.*.基本信息.名称}\"}}\n"
+    "]",
+    "最终答案：推荐你中午去春熙路附近的火锅店，天气晴朗适合步行。",
+]
+
+
+def _stub_location(address: str, center=(104.080989, 30.657689)) -> str:
+    """模拟的地理编码：同一个地址总是得到同一个坐标，不同地址的坐标不同，方便检查批量结果是否对齐"""
+    offset = zlib.crc32(address.encode("utf-8")) % 1000 / 100000
+    return f"{center[0] + offset:.6f},{center[1] + offset:.6f}"
+
+
+def make_pois(count: int = 10, center=(104.080989, 30.657689)) -> list:
+    """生成和高德 v5/place/around 结构一致的 POI 数据"""
+    pois = []
+    for i in range(count):
+        lng = center[0] + 0.001 * (i % 5)
+        lat = center[1] + 0.001 * (i // 5)
+        pois.append(
+            {
+                "id": f"B0FFSTUB{i:04d}",
+                "name": f"测试火锅{i}号店",
+                "type": "餐饮服务;中餐厅;火锅店",
+                "typecode": "050117",
+                "address": f"春熙路{i}号",
+                "location": f"{lng:.6f},{lat:.6f}",
+                "distance": str(100 * i),
+                "business": {
+                    "opentime_today": "10:00-22:00",
+                    "business_area": "春熙路",
+                    "rating": f"{4.0 + (i % 10) / 10:.1f}",
+                    "cost": str(60 + 10 * i),
+                    "tag": "毛肚,鸭肠",
+                    "parking_type": "地下",
+                },
+                "photos": [{"url": f"https://example.com/{i}.jpg"}],
+            }
+        )
+    return pois
+
+
+class _StubServer:
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(self.handler_class):
+            stub = server
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, data, status: int = 200) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# 模拟错误时 info 字段的内容
+_AMAP_INFO = {
+    "10001": "INVALID_USER_KEY",
+    "10003": "DAILY_QUERY_OVER_LIMIT",
+    "10016": "SERVER_IS_BUSY",
+    "10021": "CUQPS_HAS_EXCEEDED_THE_LIMIT",
+}
+
+
+class _AMapHandler(_JSONHandler):
+    def do_GET(self):
+        self.stub.requests += 1
+        if self.stub.latency:
+            time.sleep(self.stub.latency)
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        infocode = self.stub.next_error() or ("10021" if self.stub.over_limit() else None)
+        if infocode:
+            self.send_json(
+                {"status": "0", "info": _AMAP_INFO.get(infocode, "ERROR"), "infocode": infocode}
+            )
+            return
+        if url.path == "/v3/staticmap":
+            self.send_png(params)
+            return
+        self.send_json(self.stub.respond(url.path, params))
+
+    def send_png(self, params: dict) -> None:
+        # 不是合法图片，只用来模拟静态地图返回的字节流
+        body = b"\x89PNG\r\n\x1a\n" + json.dumps(params, sort_keys=True).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubAMapServer(_StubServer):
+    handler_class = _AMapHandler
+
+    def __init__(self, latency: float = 0.0, pois: int = 10, qps_limit: int = 0):
+        super().__init__(latency)
+        self.pois = make_pois(pois)
+        # 滑动 1 秒窗口内最多接受多少个请求，0 表示不限
+        self.qps_limit = qps_limit
+        self.throttled = 0
+        # 接下来的请求依次返回这些 infocode 的错误，用完后恢复正常
+        self.errors = []
+        self._window = []
+        self._window_lock = threading.Lock()
+
+    def next_error(self):
+        with self._window_lock:
+            return self.errors.pop(0) if self.errors else None
+
+    def over_limit(self) -> bool:
+        if not self.qps_limit:
+            return False
+        now = time.monotonic()
+        with self._window_lock:
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.qps_limit:
+                self.throttled += 1
+                return True
+            self._window.append(now)
+            return False
+
+    def respond(self, path: str, params: dict) -> dict:
+        if path == "/v3/geocode/geo":
+            addresses = params.get("address", "").split("|")
+            return {
+                "status": "1",
+                "count": str(len(addresses)),
+                "geocodes": [
+                    {"location": _stub_location(address)} for address in addresses
+                ],
+            }
+        if path == "/v3/ip":
+            return {
+                "status": "1",
+                "province": "四川省",
+                "city": "成都市",
+                "adcode": "510100",
+                "rectangle": "103.9,30.5;104.3,30.8",
+            }
+        if path == "/v3/config/district":
+            return {
+                "status": "1",
+                "districts": [
+                    {"name": params.get("keywords"), "districts": [{"name": "锦江区"}]}
+                ],
+            }
+        if path == "/v5/place/around":
+            page_size = int(params.get("page_size", 10))
+            page = int(params.get("page_num", 1))
+            pois = self.pois[(page - 1) * page_size : page * page_size]
+            return {"status": "1", "infocode": "10000", "count": str(len(pois)), "pois": pois}
+        # wttr.in: /{city}?format=j1
+        city = unquote(path.strip("/"))
+        return {
+            "current_condition": [
+                {"weatherDesc": [{"value": f"{city} Sunny"}], "temp_C": "22"}
+            ]
+        }
+
+
+class _LLMHandler(_JSONHandler):
+    def do_POST(self):
+        self.stub.requests += 1
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.stub.latency:
+            time.sleep(self.stub.latency)
+        reply = self.stub.reply_for(request.get("messages", []))
+        usage = {"prompt_tokens": 1000, "completion_tokens": len(reply), "total_tokens": 1000 + len(reply)}
+        if not request.get("stream"):
+            self.send_json(
+                {
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": request.get("model"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": reply},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+            return
+        # SSE 流式响应，每个 chunk 几个字符
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for i in range(0, len(reply), self.stub.chunk_size):
+                chunk = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": request.get("model"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {"content": reply[i : i + self.stub.chunk_size]},
+                            "finish_reason": None,
+                        }
+                    ],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+                if self.stub.token_latency:
+                    time.sleep(self.stub.token_latency)
+            if request.get("stream_options", {}).get("include_usage"):
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前结束了流
+            pass
+        self.close_connection = True
+
+
+class StubLLMServer(_StubServer):
+    handler_class = _LLMHandler
+
+    def __init__(
+        self,
+        script: list = None,
+        latency: float = 0.0,
+        token_latency: float = 0.0,
+        chunk_size: int = 4,
+    ):
+        super().__init__(latency)
+        self.script = script or DEFAULT_SCRIPT
+        self.token_latency = token_latency
+        self.chunk_size = chunk_size
+
+    def reply_for(self, messages: list) -> str:
+        turn = sum(1 for m in messages if m.get("role") == "assistant")
+        return self.script[min(turn, len(self.script) - 1)]
+
+
+if __name__ == "__main__":
+    with StubAMapServer() as amap, StubLLMServer() as llm:
+        print("AMap stub:", amap.base_url)
+        print("LLM stub: ", llm.base_url + "/v1")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,55 @@
+"""
+全局配置：整个进程只在这里加载一次 .env，其他模块都通过本模块读取设置。
+
+- 已经存在的环境变量优先于 .env（方便测试和部署时覆盖）；
+- 各模块自己的可调参数（缓存大小、超时等）用 get_int / get_float / get_str 读取，
+  默认值仍写在各自模块里，和参数的说明放在一起。
+"""
+
+import os
+from dotenv import load_dotenv
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+
+load_dotenv(os.path.join(PROJECT_ROOT, ".env"))
+
+
+def get_str(name: str, default: str = None) -> str:
+    return os.getenv(name, default)
+
+
+def get_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def get_float(name: str, default):
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def reload() -> None:
+    """重新读取 .env 并覆盖当前值（调试用，例如修改了 Key 之后）"""
+    load_dotenv(os.path.join(PROJECT_ROOT, ".env"), override=True)
+
+
+# 模型
+DEEPSEEK_API_KEY = get_str("DEEPSEEK_API_KEY")
+LLM_BASE_URL = get_str("ANY_MODEL_ENDPOINT", "https://api.deepseek.com/v1")
+LLM_MODEL = get_str("LLM_MODEL", "deepseek-chat")
+
+# 工具链
+SERPER_API_KEY = get_str("SERPER_API_KEY")
+
+
+def amap_key() -> str:
+    """高德 Key 在调用时读取，调试时 reload() 之后立即生效"""
+    return get_str("GAODEDITY_API_KEY")
@@ -1,131 +1,649 @@
+import asyncio
+import contextvars
 import json5
 import re
 import time
 import os
 import sys
-from dotenv import load_dotenv
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from llm_client import OpenAICompatibleClient
 from prompt import SystemPromptBuilder
-from parser import ReActParser
+from parser import ReActParser, IncrementalReActParser
+from context import (
+    ContextManager,
+    DEFAULT_TOKEN_BUDGET,
+    OBSERVATION_SCHEMA,
+    RECALL_TOOL_NAME,
+    format_result,
+    summarize_payload,
+)
+from planner import PlanError, PlanExecutor, parse_plan
 
 sys.path.append(os.path.join("../tools"))
 from tools.tool import *
+from tools.tool_cache import ToolCache, default_tool_cache
+import config
+from utils.event_loop import BackgroundLoop, default_loop
+from utils.logger import get_logger, tracer
+from utils.tokens import count_tokens
+
+logger = get_logger(__name__)
+
+# 模型不应该自己写"观察"，遇到就让服务端直接停止生成
+STOP_SEQUENCES = ["观察：", "观察:"]
+# 同时在处理的查询数上限，超出的查询排队等待
+MAX_CONCURRENT_QUERIES = config.get_int("AGENT_MAX_CONCURRENT_QUERIES", 32)
+# 运行模式：react 每轮模型调用执行一批工具；plan 先一次性给出工具调用的依赖图，执行完再写答案
+AGENT_MODES = ("react", "plan")
+
+
+class _Waiter:
+    """排队等空位的一次查询：同步调用等 event，协程等 loop 里的 future"""
+
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        # 空位已经交给它（在锁内设置）
+        self.granted = False
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            # future 属于别的线程里的事件循环，只能通过 call_soon_threadsafe 设置
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class QueryLimiter:
+    """
+    限制同时在处理的查询数量，同步的 run 和异步的 arun 共用同一个上限。
+    没有空位时按到达顺序排队（先来先得），有查询结束时空位直接交给队首：
+    同步调用阻塞在 threading.Event 上，协程 await 一个 future，都不轮询。
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENT_QUERIES):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+
+    def _enter(self, waiter: _Waiter) -> bool:
+        """有空位且没人排队时直接占用并返回 True，否则排到队尾"""
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            # 占用数不变，空位直接转给队首
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        waiter.wake()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active": self._active, "waiting": len(self._waiters)}
+
+    def __enter__(self):
+        waiter = _Waiter(event=threading.Event())
+        if not self._enter(waiter):
+            waiter.event.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop=loop, future=loop.create_future())
+        if self._enter(waiter):
+            return self
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                # 空位已经交过来了，但查询被取消，转给下一个
+                self.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class QueryState:
+    """
+    一次查询的全部可变状态：上下文、中间过程、本轮的流式解析和 token 用量。
+    ReactAgent 本身只保存共享的只读资源（模型客户端、工具、线程池），
+    同一个 agent 可以被多个会话同时使用。
+    """
+
+    def __init__(
+        self,
+        agent: "ReactAgent",
+        query: str,
+        verbose: bool,
+        location: str,
+        bypass_cache: bool = False,
+    ):
+        # 上下文管理器负责 token 预算和观察结果的压缩
+        self.context = ContextManager(
+            agent.prompt_builder.build_messages(query, location),
+            budget_tokens=agent.context_budget,
+        )
+        self.parser = agent.parser
+        self.verbose = verbose
+        # 不读模型回复缓存（见 utils/llm_cache.py）
+        self.bypass_cache = bypass_cache
+        # raw_response 里会包含所有的中间过程, final_thought_response 是通过正则匹配后优化并且展示给user最终的思考内容
+        self.raw_response = ""
+        self.span = tracer.current()
+        self.start_turn()
+        self.log(f"开始处理问题: {query}")
+        if verbose:
+            tokens = agent.prompt_builder.token_report(location)
+            self.log(
+                f"提示词 token: 静态前缀 {tokens['static_tokens']}，"
+                f"动态后缀 {tokens['dynamic_tokens']}",
+                record=False,
+            )
+
+    def log(self, message: str, record: bool = True) -> None:
+        """verbose 时输出日志，record 表示同时记进 raw_response"""
+        if not self.verbose:
+            return
+        logger.info(f"[ReAct Agent] {message}")
+        if record:
+            self.raw_response += f"\n[ReAct Agent] {message}"
+
+    def start_turn(self) -> None:
+        """开始新一轮模型调用"""
+        self.stream_parser = IncrementalReActParser(self.parser)
+        self.response = ""
+        self.usage = {}
+
+    def feed(self, token: str) -> tuple[str, list, bool]:
+        """
+        处理一段流式输出，返回 (应转发给前端的部分, 新完成的行动, 是否应停止生成)。
+        模型开始编造"观察："时在该位置截断。
+        """
+        actions = self.stream_parser.feed(token)
+        cut = self.stream_parser.boundary()
+        self.response += token
+        if cut >= 0:
+            # 只转发截断位置之前、还没转发过的部分
+            token = token[: max(0, cut - (len(self.response) - len(token)))]
+            self.response = self.response[:cut]
+        return token, actions, cut >= 0
+
+    def record_response(self, response: str) -> None:
+        if self.usage:
+            self.log(
+                f"token 用量: 输入 {self.usage['prompt_tokens']}"
+                f"（缓存命中 {self.usage['cached_tokens']}），输出 {self.usage['completion_tokens']}",
+                record=False,
+            )
+        self.log(f"模型响应:\n{response}")
+        self.context.add_assistant(response)
+
+    @staticmethod
+    def is_final(action: str, response: str) -> bool:
+        return not action or action == "最终答案" or "最终答案：" in response
+
+    def finish(self, final_answer: str) -> tuple[str, list]:
+        self.log("任务完成")
+        final_thought_response = re.sub(
+            re.escape(final_answer), "🧱", self.raw_response
+        ).strip()
+        return final_answer, [self.raw_response, final_thought_response]
+
+    def add_observations(self, actions: list, observations: list) -> None:
+        # 完整结果存进观察仓库，对话里记录带编号的观察
+        observation = self.context.add_observations(actions, observations)
+        self.log(f"观察结果:\n{observation}", record=False)
 
 
 class ReactAgent:
-    def __init__(self, api_key: str = "", url: str = "") -> None:
+    def __init__(
+        self,
+        api_key: str = "",
+        url: str = "",
+        max_parallel_tools: int = 16,
+        context_budget: int = DEFAULT_TOKEN_BUDGET,
+        memory=None,
+        max_concurrent_queries: int = MAX_CONCURRENT_QUERIES,
+        loop: BackgroundLoop = None,
+    ) -> None:
         self.api_key = api_key
-        self.tools = ReactTools()
+        # 常驻的后台事件循环：同步的 run(mode="plan") 把协程交给它执行，不再每次新建事件循环
+        self.loop = loop or default_loop()
+        # 对话上下文的 token 预算，超出后较早的观察会被压缩成摘要
+        self.context_budget = context_budget
+        # 可选的持久化记忆（memory.manager.MemoryManager），工具结果会写入并复用
+        self.memory = memory
+        # 带记忆时单独建一个 ToolCache 绑定这份记忆，内存缓存仍与其他实例共享，
+        # 不去改进程共享的 default_tool_cache，免得一个 agent 把所有 agent 的持久化都改走
+        tool_cache = None
+        if memory is not None:
+            tool_cache = ToolCache(cache=default_tool_cache.cache, store=memory)
+        self.tools = ReactTools(cache=tool_cache)
         self.model = OpenAICompatibleClient(
-            model="deepseek-chat",
+            model=config.LLM_MODEL,
             api_key=api_key,
             base_url=url,
         )
-        # 构建系统prompt
-        self.prompt_builder = SystemPromptBuilder()
+        # 构建系统prompt（静态部分只构建一次，复用同一个工具实例）
+        self.prompt_builder = SystemPromptBuilder(
+            self.tools, extra_tools=[OBSERVATION_SCHEMA]
+        )
         self.system_prompt = self.prompt_builder.get_system_prompt()
 
         # 构建正则匹配
         self.parser = ReActParser()
 
-    # 解析大模型的回答
-    def _parse_action(self, text: str, verbose: bool = False) -> tuple[str, dict]:
-        """现在只需要调用解析器的方法"""
-        return self.parser.parse(text, verbose)
+        # 执行工具调用的线程池，所有会话共享（同步工具在 arun 里也放到这里执行）
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_parallel_tools, thread_name_prefix="react-tool"
+        )
+        # 同时处理的查询数上限
+        self.limiter = QueryLimiter(max_concurrent_queries)
+
+    @staticmethod
+    def _observation(action: str, action_input: dict, results, span) -> str:
+        observation = f"观察：{format_result(results)}"
+        if span.recording:
+            span.set(
+                args_bytes=len(format_result(action_input).encode("utf-8")),
+                result_bytes=len(observation.encode("utf-8")),
+            )
+        return observation
 
     def _execute_action(self, action: str, action_input: dict) -> str:
         """执行指定的行动，使用解耦后的 tools 管理器"""
         # 检查工具是否存在于我们的注册表中
         if action in self.tools._tools_map:
-            try:
-                # 动态调用工具函数并传入参数
-                # 使用 **action_input 将字典解包为命名参数
-                results = self.tools.execute_tool(action, **action_input)
-                return f"观察：{results}"
-            except Exception as e:
-                return f"观察：执行工具 {action} 时出错: {str(e)}"
+            with tracer.span("tool_call", action) as span:
+                try:
+                    # 动态调用工具函数并传入参数
+                    # 使用 **action_input 将字典解包为命名参数
+                    results = self.tools.execute_tool(action, **action_input)
+                except Exception as e:
+                    span.set(error=str(e))
+                    return f"观察：执行工具 {action} 时出错: {str(e)}"
+                return self._observation(action, action_input, results, span)
 
         return f"观察：未知行动 '{action}'，请尝试从已知工具列表中选择。"
 
+    async def _aexecute_action(self, action: str, action_input: dict) -> str:
+        """_execute_action 的异步版本"""
+        if action in self.tools._tools_map:
+            with tracer.span("tool_call", action) as span:
+                try:
+                    results = await self.tools.aexecute_tool(
+                        action, executor=self.executor, **action_input
+                    )
+                except Exception as e:
+                    span.set(error=str(e))
+                    return f"观察：执行工具 {action} 时出错: {str(e)}"
+                return self._observation(action, action_input, results, span)
+
+        return f"观察：未知行动 '{action}'，请尝试从已知工具列表中选择。"
+
+    def _submit_action(
+        self, action: str, action_input: dict, context: ContextManager = None
+    ):
+        """把一个行动提交到线程池执行，返回 Future；最终答案等非工具行动返回 None"""
+        if not action or action == "最终答案":
+            return None
+        # 复制当前上下文，让线程池里的工具调用挂在当前迭代的 span 下
+        ctx = contextvars.copy_context()
+        if action == RECALL_TOOL_NAME and context is not None:
+            # 取回被压缩的观察，不需要调用外部工具
+            return self.executor.submit(
+                ctx.run, context.recall, action_input.get("obs_id", "")
+            )
+        return self.executor.submit(ctx.run, self._execute_action, action, action_input)
+
+    def _start_action(
+        self, action: str, action_input: dict, context: ContextManager = None
+    ):
+        """_submit_action 的异步版本，返回 asyncio.Task；非工具行动返回 None"""
+        if not action or action == "最终答案":
+            return None
+        if action == RECALL_TOOL_NAME and context is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(context.recall(action_input.get("obs_id", "")))
+            return future
+        return asyncio.ensure_future(self._aexecute_action(action, action_input))
+
+    def _stream_response(
+        self,
+        state: QueryState,
+        chat_history: list,
+        on_token=None,
+        iteration: int = 0,
+    ) -> tuple[str, list]:
+        """
+        流式获取模型响应，边生成边解析：
+        - 每当一组 行动/行动输入 完整输出，就立刻提交工具调用，不等模型说完；
+        - 一旦模型开始编造"观察："，就立即停止生成。
+        on_token(token, iteration) 用于把生成的内容实时转发给前端。
+
+        返回 (response, [(action, action_input, future), ...])
+        """
+        state.start_turn()
+        started = []
+        stopped = False
+        for token in self.model.generate_stream(
+            chat_history,
+            stop=STOP_SEQUENCES,
+            usage=state.usage,
+            bypass_cache=state.bypass_cache,
+        ):
+            token, actions, stopped = state.feed(token)
+            for action, action_input in actions:
+                future = self._submit_action(action, action_input, state.context)
+                started.append((action, action_input, future))
+            if on_token and token:
+                on_token(token, iteration)
+            if stopped:
+                break
+        if not stopped:
+            for action, action_input in state.stream_parser.close():
+                future = self._submit_action(action, action_input, state.context)
+                started.append((action, action_input, future))
+        return state.response.rstrip(), started
+
+    async def _astream_response(
+        self,
+        state: QueryState,
+        chat_history: list,
+        on_token=None,
+        iteration: int = 0,
+    ) -> tuple[str, list]:
+        """_stream_response 的异步版本，工具调用以 asyncio.Task 的形式提前开始"""
+        state.start_turn()
+        started = []
+        stopped = False
+        stream = self.model.agenerate_stream(
+            chat_history,
+            stop=STOP_SEQUENCES,
+            usage=state.usage,
+            bypass_cache=state.bypass_cache,
+        )
+        try:
+            async for token in stream:
+                token, actions, stopped = state.feed(token)
+                for action, action_input in actions:
+                    task = self._start_action(action, action_input, state.context)
+                    started.append((action, action_input, task))
+                if on_token and token:
+                    on_token(token, iteration)
+                if stopped:
+                    break
+        finally:
+            # 提前结束时立即关闭连接，服务端随之停止生成
+            await stream.aclose()
+        if not stopped:
+            for action, action_input in state.stream_parser.close():
+                task = self._start_action(action, action_input, state.context)
+                started.append((action, action_input, task))
+        return state.response.rstrip(), started
+
     def _format_response(self, response_text: str) -> str:
         """格式化最终响应"""
         if "最终答案：" in response_text:
             return response_text.split("最终答案：")[-1].strip()
         return response_text
 
-    def run(self, query: str, max_iterations: int = 20, verbose: bool = True) -> str:
+    def run(
+        self,
+        query: str,
+        max_iterations: int = 20,
+        verbose: bool = True,
+        on_token=None,
+        location: str = None,
+        mode: str = "react",
+        bypass_cache: bool = False,
+    ) -> tuple[str, list]:
         """运行 ReAct Agent
 
         Args:
             query: 用户查询
             max_iterations: 最大迭代次数
-            verbose: 是否显示中间执行过程
+            verbose: 是否显示中间执行过程，同时开启链路追踪（见 utils/logger.py）
+            on_token: 可选回调 on_token(token, iteration)，实时接收模型生成的内容
+            location: 用户当前位置，放进动态上下文而不是系统提示，保证系统提示可以命中前缀缓存
+            mode: "react"（默认）或 "plan"。plan 模式下模型一次给出全部工具调用的依赖图，
+                并发执行后再调用一次模型写出答案，通常只需要 2 次模型调用；
+                计划不合法时退回 ReAct 循环。同步调用时计划在后台事件循环（self.loop）里执行
+            bypass_cache: 开启了模型回复缓存（LLM_CACHE_ENABLED）时，本次查询不读缓存，
+                新的回复仍会写入缓存
+
+        Returns:
+            (final_answer, [raw_response, final_thought_response])
         """
-        chat_history = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": f"问题：{query}"},
-        ]
+        self._check_mode(mode)
+        with self.limiter:
+            # verbose 关闭时 query 是空 span，下面的迭代/模型/工具 span 也都不会创建
+            with tracer.span("query", root=verbose, query_chars=len(query), mode=mode) as span:
+                state = QueryState(self, query, verbose, location, bypass_cache)
+                if mode == "plan":
+                    result = self.loop.run(
+                        self._arun_plan(state, query, location, max_iterations, on_token)
+                    )
+                else:
+                    result = self._run(state, max_iterations, on_token)
+                if span.recording:
+                    span.set(cache=self.tools.cache_stats())
+                return result
 
-        # 绿色ANSI颜色代码
-        GREEN = "\033[92m"
-        RESET = "\033[0m"
+    async def arun(
+        self,
+        query: str,
+        max_iterations: int = 20,
+        verbose: bool = True,
+        on_token=None,
+        location: str = None,
+        mode: str = "react",
+        bypass_cache: bool = False,
+    ) -> tuple[str, list]:
+        """
+        run 的异步版本：等待模型输出和工具结果时不占用线程，
+        一个进程里可以同时处理很多个会话。参数和返回值与 run 相同。
+        """
+        self._check_mode(mode)
+        async with self.limiter:
+            with tracer.span("query", root=verbose, query_chars=len(query), mode=mode) as span:
+                state = QueryState(self, query, verbose, location, bypass_cache)
+                if mode == "plan":
+                    result = await self._arun_plan(
+                        state, query, location, max_iterations, on_token
+                    )
+                else:
+                    result = await self._arun(state, max_iterations, on_token)
+                if span.recording:
+                    span.set(cache=self.tools.cache_stats())
+                return result
 
-        # raw_response 里会包含所有的中间过程, final_thought_response 是通过正则匹配后优化并且展示给user最终的思考内容
-        raw_response = ""
-        final_thought_response = ""
-        if verbose:
-            print(f"{GREEN}[ReAct Agent] 开始处理问题: {query}{RESET}")
-            raw_response += f"\n[ReAct Agent] 开始处理问题: {query}"
+    def _run(self, state: QueryState, max_iterations: int, on_token):
+        response = ""
         for iteration in range(max_iterations):
-            if verbose:
-                print(f"{GREEN}[ReAct Agent] 第 {iteration + 1} 次思考...{RESET}")
-                raw_response += f"\n[ReAct Agent] 第 {iteration + 1} 次思考..."
-            # 获取模型响应
-            response = self.model.generate(chat_history)
-
-            if verbose:
-                print(f"{GREEN}[ReAct Agent] 模型响应:\n{response}{RESET}")
-                raw_response += f"\n[ReAct Agent] 模型响应:\n{response}"
-            chat_history.append({"role": "assistant", "content": response})
-            # 解析行动
-            action, action_input = self._parse_action(response, verbose=verbose)
-
-            if not action or action == "最终答案" or "最终答案：" in response:
-                final_answer = self._format_response(response)
-                if verbose:
-                    print(f"{GREEN}[ReAct Agent] 任务完成{RESET}")
-                    raw_response += f"\n[ReAct Agent] 任务完成"
-
-                final_thought_response = re.sub(
-                    re.escape(final_answer), "🧱", raw_response
-                ).strip()
-                return final_answer, [raw_response, final_thought_response]
-
-            if verbose:
-                print(
-                    f"{GREEN}[ReAct Agent] 执行行动: {action} | 参数: {action_input}{RESET}"
+            state.span.set(iterations=iteration + 1)
+            with tracer.span("iteration", iteration=iteration + 1) as span:
+                state.log(f"第 {iteration + 1} 次思考...")
+                messages = state.context.messages()
+                if span.recording:
+                    span.set(context_tokens=state.context.token_count())
+                # 流式获取模型响应，行动一输出完整就开始执行工具
+                response, started = self._stream_response(
+                    state, messages, on_token, iteration
                 )
+                state.record_response(response)
+                # 一次回复里可能包含多组互不依赖的行动
+                action = started[0][0] if started else ""
+                if state.is_final(action, response):
+                    return state.finish(self._format_response(response))
 
-            # 执行行动
-            observation = self._execute_action(action, action_input)
+                started = [item for item in started if item[2] is not None]
+                for name, args, _ in started:
+                    state.log(f"执行行动: {name} | 参数: {args}", record=False)
+                # 工具在流式生成时已经并行开始执行，这里按顺序收集结果
+                actions = [(name, args) for name, args, _ in started]
+                observations = [future.result() for _, _, future in started]
+                state.add_observations(actions, observations)
+                span.set(actions=[name for name, _ in actions])
 
-            if verbose:
-                print(f"{GREEN}[ReAct Agent] 观察结果:\n{observation}{RESET}")
+        # 达到最大迭代次数，返回当前响应
+        state.log("达到最大迭代次数，返回当前响应", record=False)
+        return state.finish(self._format_response(response))
 
-            # 更新当前文本以继续对话
-            chat_history.append({"role": "user", "content": observation})
+    async def _arun(self, state: QueryState, max_iterations: int, on_token):
+        response = ""
+        for iteration in range(max_iterations):
+            state.span.set(iterations=iteration + 1)
+            with tracer.span("iteration", iteration=iteration + 1) as span:
+                state.log(f"第 {iteration + 1} 次思考...")
+                messages = state.context.messages()
+                if span.recording:
+                    span.set(context_tokens=state.context.token_count())
+                response, started = await self._astream_response(
+                    state, messages, on_token, iteration
+                )
+                state.record_response(response)
+                action = started[0][0] if started else ""
+                if state.is_final(action, response):
+                    return state.finish(self._format_response(response))
 
-        # 达到最大迭代次数，返回当前响应
-        if verbose:
-            print(f"{GREEN}[ReAct Agent] 达到最大迭代次数，返回当前响应{RESET}")
-        return self._format_response(response)
+                started = [item for item in started if item[2] is not None]
+                for name, args, _ in started:
+                    state.log(f"执行行动: {name} | 参数: {args}", record=False)
+                actions = [(name, args) for name, args, _ in started]
+                observations = await asyncio.gather(*(task for _, _, task in started))
+                state.add_observations(actions, list(observations))
+                span.set(actions=[name for name, _ in actions])
+
+        state.log("达到最大迭代次数，返回当前响应", record=False)
+        return state.finish(self._format_response(response))
+
+    @staticmethod
+    def _check_mode(mode: str) -> None:
+        if mode not in AGENT_MODES:
+            raise ValueError(f"未知的运行模式: {mode}，可选 {', '.join(AGENT_MODES)}")
+
+    async def _astream_text(
+        self, state: QueryState, messages: list, on_token=None, iteration: int = 0
+    ) -> str:
+        """流式获取一段完整回复（计划模式用，不边生成边执行工具）"""
+        state.start_turn()
+        parts = []
+        stream = self.model.agenerate_stream(
+            messages, usage=state.usage, bypass_cache=state.bypass_cache
+        )
+        try:
+            async for token in stream:
+                parts.append(token)
+                if on_token:
+                    on_token(token, iteration)
+        finally:
+            await stream.aclose()
+        return "".join(parts).strip()
+
+    def _plan_report(self, nodes: list, results: dict) -> str:
+        """
+        把每一步的执行结果整理成给模型看的文本。
+        总长度超出上下文预算时，超出平均份额的结果压缩成摘要（同 ContextManager 的压缩规则）。
+        """
+        share = max(self.context_budget // max(len(nodes), 1), 1)
+        lines = []
+        for node in nodes:
+            status, value, args = results[node.id]
+            text = format_result(value)
+            if status == "ok" and count_tokens(text) > share:
+                text = summarize_payload(text)
+            label = {"ok": "", "error": "失败：", "skipped": "跳过："}[status]
+            lines.append(
+                f"[{node.id}] {node.tool} {format_result(args)}\n{label}{text}"
+            )
+        return "\n\n".join(lines)
+
+    async def _arun_plan(
+        self,
+        state: QueryState,
+        query: str,
+        location: str,
+        max_iterations: int,
+        on_token,
+    ):
+        """
+        计划模式：第一次模型调用给出工具调用的依赖图（见 core/planner.py），
+        PlanExecutor 并发执行依赖已就绪的步骤，第二次模型调用根据全部结果写出答案。
+        """
+        messages = self.prompt_builder.build_plan_messages(query, location)
+        state.span.set(iterations=1)
+        with tracer.span("iteration", iteration=1, phase="plan"):
+            state.log("生成工具调用计划...")
+            response = await self._astream_text(state, messages, on_token, 0)
+        state.log(f"模型响应:\n{response}")
+        try:
+            nodes = parse_plan(response, self.tools._tools_map)
+        except PlanError as e:
+            nodes = e
+        if not isinstance(nodes, list):
+            if nodes is None and "最终答案" in response:
+                # 不需要调用工具
+                return state.finish(self._format_response(response))
+            state.log(f"计划无法执行（{nodes or '回复中没有计划'}），改用 ReAct 循环", record=False)
+            return await self._arun(state, max_iterations, on_token)
+
+        state.span.set(plan_steps=len(nodes))
+        for node in nodes:
+            state.log(
+                f"计划步骤 {node.id}: {node.tool} | 参数: {node.args} | 依赖: {node.deps}",
+                record=False,
+            )
+        with tracer.span("plan_execute", steps=len(nodes)):
+            results = await PlanExecutor(self.tools, self.executor).execute(nodes)
+        report = self._plan_report(nodes, results)
+        state.log(f"执行结果:\n{report}", record=False)
+
+        messages += [
+            {"role": "assistant", "content": response},
+            {
+                "role": "user",
+                "content": f"执行结果：\n{report}\n\n请基于以上结果给出 最终答案：",
+            },
+        ]
+        state.span.set(iterations=2)
+        with tracer.span("iteration", iteration=2, phase="answer"):
+            state.log("根据执行结果生成答案...")
+            answer = await self._astream_text(state, messages, on_token, 1)
+        state.log(f"模型响应:\n{answer}")
+        return state.finish(self._format_response(answer))
 
 
 if __name__ == "__main__":
-    load_dotenv()
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    url = "https://api.deepseek.com/v1"
-    agent = ReactAgent(api_key=api_key, url=url)
+    agent = ReactAgent(api_key=config.DEEPSEEK_API_KEY, url=config.LLM_BASE_URL)
     city_info = agent.tools._tools_map["get_city"]()
     city_name = city_info[0].get("city")
     print("当前定位城市：", city_name)
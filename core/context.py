@@ -0,0 +1,205 @@
+import json
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+import config
+from utils.tokens import count_tokens, count_message_tokens
+
+# 对话上下文的 token 预算，超出后从最早的观察开始压缩
+DEFAULT_TOKEN_BUDGET = config.get_int("CONTEXT_TOKEN_BUDGET", 6000)
+# 最近几条观察永远保留完整内容
+KEEP_RECENT_OBSERVATIONS = 2
+# 压缩后每条观察最多保留多少行 / 多少字符
+SUMMARY_MAX_ROWS = 10
+SUMMARY_MAX_CHARS = 300
+
+# 压缩成表格时优先保留的字段（兼容 search_nearby_poi 和 nearby_search_advanced 的结果）
+SUMMARY_FIELDS = (
+    "名称",
+    "评分",
+    "人均消费",
+    "费用",
+    "距离",
+    "今日营业时间",
+    "状态",
+    "经纬度",
+)
+
+RECALL_TOOL_NAME = "get_observation"
+
+OBSERVATION_SCHEMA = {
+    "name_for_human": "查看完整观察结果",
+    "name_for_model": RECALL_TOOL_NAME,
+    "description_for_model": (
+        "较早的观察结果会被压缩成摘要，并标注编号（如 obs-2）。"
+        "当你需要摘要里没有的字段（如详细地址、图片链接）时，用编号取回该观察的完整内容。"
+    ),
+    "parameters": [
+        {
+            "name": "obs_id",
+            "description": "观察结果的编号，例如 'obs-2'。",
+            "required": True,
+            "schema": {"type": "string"},
+        }
+    ],
+}
+
+
+def format_result(results) -> str:
+    """把工具返回值转成紧凑的文本：列表/字典用 JSON，比 Python repr 更省 token"""
+    if isinstance(results, (list, dict)):
+        return json.dumps(results, ensure_ascii=False, separators=(",", ":"), default=str)
+    return str(results)
+
+
+def summarize_payload(payload: str) -> str:
+    """把一条完整的观察内容压缩成摘要：POI 列表压成表格，其他内容截断"""
+    try:
+        data = json.loads(payload)
+    except (ValueError, TypeError):
+        data = None
+    if isinstance(data, list) and data and all(isinstance(d, dict) for d in data):
+        rows = [_flatten(item) for item in data]
+        columns = [f for f in SUMMARY_FIELDS if any(f in row for row in rows)]
+        if not columns:
+            columns = list(rows[0].keys())[:4]
+        lines = ["|".join(columns)]
+        for row in rows[:SUMMARY_MAX_ROWS]:
+            lines.append("|".join(str(row.get(c, "")) for c in columns))
+        if len(rows) > SUMMARY_MAX_ROWS:
+            lines.append(f"...共 {len(rows)} 条")
+        return "\n".join(lines)
+    if len(payload) > SUMMARY_MAX_CHARS:
+        return payload[:SUMMARY_MAX_CHARS] + f"...(共 {len(payload)} 字)"
+    return payload
+
+
+def _flatten(item: dict) -> dict:
+    """把嵌套字典展开成一层，只保留叶子字段"""
+    flat = {}
+    for key, value in item.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value))
+        else:
+            flat[key] = value
+    return flat
+
+
+class ObservationStore:
+    """完整的观察结果存放在这里，对话里只需要保留摘要和编号"""
+
+    def __init__(self):
+        self._payloads: dict[str, str] = {}
+
+    def add(self, payload: str) -> str:
+        obs_id = f"obs-{len(self._payloads) + 1}"
+        self._payloads[obs_id] = payload
+        return obs_id
+
+    def get(self, obs_id: str):
+        return self._payloads.get(str(obs_id).strip())
+
+
+class ContextManager:
+    """
+    管理一次查询的 chat_history：
+    - 每条观察都存进 ObservationStore 并分配编号；
+    - 发给模型前检查 token 预算，超出时把较早的观察压缩成摘要，
+      这样每轮请求的大小基本保持稳定，不会随迭代次数二次增长。
+    已经压缩过的消息不会再变化，之前的消息前缀仍然可以命中服务端缓存。
+    """
+
+    def __init__(
+        self,
+        messages: list,
+        budget_tokens: int = DEFAULT_TOKEN_BUDGET,
+        keep_recent: int = KEEP_RECENT_OBSERVATIONS,
+    ):
+        self.history = list(messages)
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.store = ObservationStore()
+        # 观察消息在 history 中的下标 -> [(obs_id, action, payload), ...]
+        self._observations: dict[int, list] = {}
+        self._compacted: set[int] = set()
+
+    def add_assistant(self, content: str) -> None:
+        self.history.append({"role": "assistant", "content": content})
+
+    def add_observations(self, actions: list, observations: list) -> str:
+        """记录一轮的观察结果（每个行动一条），返回写入对话的消息内容"""
+        parts = []
+        for (action, _), observation in zip(actions, observations):
+            payload = observation.split("观察：", 1)[-1]
+            parts.append((self.store.add(payload), action, payload))
+        content = self._render(parts, compact=False)
+        self._observations[len(self.history)] = parts
+        self.history.append({"role": "user", "content": content})
+        return content
+
+    def recall(self, obs_id: str) -> str:
+        """get_observation 工具：取回某条观察的完整内容"""
+        payload = self.store.get(obs_id)
+        if payload is None:
+            return f"观察：未找到编号为 {obs_id} 的观察结果。"
+        return f"观察：{payload}"
+
+    def messages(self) -> list:
+        """返回本轮要发给模型的消息，必要时先压缩较早的观察"""
+        if count_message_tokens(self.history) > self.budget_tokens:
+            candidates = sorted(self._observations)[: -self.keep_recent or None]
+            for index in candidates:
+                if index in self._compacted:
+                    continue
+                self.history[index] = {
+                    "role": "user",
+                    "content": self._render(self._observations[index], compact=True),
+                }
+                self._compacted.add(index)
+                if count_message_tokens(self.history) <= self.budget_tokens:
+                    break
+        return self.history
+
+    def token_count(self) -> int:
+        return count_message_tokens(self.history)
+
+    def _render(self, parts: list, compact: bool) -> str:
+        lines = []
+        for i, (obs_id, action, payload) in enumerate(parts):
+            if compact:
+                body = summarize_payload(payload)
+                label = f"观察（编号 {obs_id}，已压缩，可用 {RECALL_TOOL_NAME} 取回完整内容）："
+            else:
+                body = payload
+                label = f"观察（编号 {obs_id}）："
+            if len(parts) > 1:
+                label = f"[{i + 1}] {action} -> {label}"
+            # 表格摘要另起一行，便于模型阅读
+            sep = "\n" if compact and "\n" in body else ""
+            lines.append(f"{label}{sep}{body}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    pois = [
+        {
+            "基本信息": {"名称": f"火锅{i}", "评分": "4.5", "距离": f"{i * 100}米", "人均消费": "90元"},
+            "运营状态": {"今日营业时间": "10:00-22:00", "商圈": "春熙路"},
+            "位置详情": {"详细地址": "某某路", "经纬度": "104.08,30.65"},
+        }
+        for i in range(10)
+    ]
+    context = ContextManager(
+        [{"role": "system", "content": "系统"}, {"role": "user", "content": "问题"}],
+        budget_tokens=800,
+    )
+    for step in range(4):
+        context.add_assistant(f"行动：nearby_search_advanced #{step}")
+        context.add_observations(
+            [("nearby_search_advanced", {})], [f"观察：{format_result(pois)}"]
+        )
+        print(f"第 {step + 1} 轮后 token 数：", count_message_tokens(context.messages()))
+    print(context.messages()[3]["content"])
+    print(count_tokens(context.recall("obs-1")))
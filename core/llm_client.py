@@ -1,5 +1,16 @@
+import asyncio
+import json
 import os
-from openai import OpenAI
+import sys
+import threading
+import weakref
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+from utils.llm_cache import ENABLED as LLM_CACHE_ENABLED, CompletionCache, completion_cache
+from utils.logger import get_logger, tracer
+
+logger = get_logger(__name__)
 
 
 class OpenAICompatibleClient:
@@ -7,22 +18,256 @@ class OpenAICompatibleClient:
     一个用于调用任何兼容OpenAI接口的LLM服务的客户端。
     """
 
-    def __init__(self, model: str, api_key: str, base_url: str):
+    def __init__(
+        self, model: str, api_key: str, base_url: str, cache: CompletionCache = None
+    ):
         self.model = model
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = api_key
+        self.base_url = base_url
+        # 可选的回复缓存（见 utils/llm_cache.py），为 None 时每次都调用接口
+        self.cache = cache if cache is not None else (
+            completion_cache if LLM_CACHE_ENABLED else None
+        )
+        # openai 包导入较慢（约 0.5 秒），第一次调用时才创建客户端，见 warm_up()
+        self._client = None
+        # 异步客户端的连接池绑定在事件循环上，每个事件循环一个
+        self._async_clients = weakref.WeakKeyDictionary()
+        # 最近一次调用和累计的 token 用量，cached_tokens 是服务端前缀缓存命中的部分
+        self.last_usage = {}
+        self.total_usage = {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+        }
+        self._usage_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """同步的 OpenAI 客户端"""
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    @client.setter
+    def client(self, value) -> None:
+        self._client = value
+
+    def warm_up(self) -> threading.Thread:
+        """在后台线程里提前导入 openai，页面渲染不用等它，用户发出第一个问题时已经准备好"""
+        thread = threading.Thread(target=lambda: self.client, name="llm-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def async_client(self):
+        """当前事件循环专用的 AsyncOpenAI 客户端"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+            self._async_clients[loop] = client
+        return client
 
-    def generate(self, messages: list) -> str:
+    def _record_usage(self, usage, out: dict = None) -> dict:
+        """
+        记录接口返回的 usage，兼容 DeepSeek 和 OpenAI 两种缓存命中字段。
+        out 是调用方自己的字典，并发查询时用它拿到本次调用的用量，而不是共享的 last_usage。
+        """
+        if usage is None:
+            return {}
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None) if details else None
+        record = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+            "cached_tokens": cached or 0,
+        }
+        if out is not None:
+            out.update(record)
+        with self._usage_lock:
+            self.last_usage = record
+            self.total_usage["calls"] += 1
+            for key, value in record.items():
+                self.total_usage[key] += value
+        for key, value in record.items():
+            tracer.incr("agent_llm_tokens_total", value, kind=key.replace("_tokens", ""))
+        return record
+
+    @staticmethod
+    def _payload_size(messages: list) -> int:
+        return len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+
+    def _lookup(self, messages: list, bypass_cache: bool, span, **params):
+        """
+        查回复缓存，返回 (缓存键, 缓存的回复)。没有开启缓存时键为 None；
+        bypass_cache 时不读缓存，但新的回复仍会写入（相当于"重新生成"）。
+        """
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(self.model, messages, **params)
+        cached = None if bypass_cache else self.cache.get(key)
+        result = "bypass" if bypass_cache else ("hit" if cached is not None else "miss")
+        span.set(cache=result)
+        tracer.incr("agent_llm_cache_total", result=result)
+        return key, cached
+
+    def generate(self, messages: list, bypass_cache: bool = False) -> str:
         """调用LLM API来生成回应。"""
-        print("正在调用大语言模型...")
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,  # 这里换成了带有基于的列表
-                stream=False,
-            )
-            answer = response.choices[0].message.content
-            print("大语言模型响应成功。")
-            return answer
-        except Exception as e:
-            print(f"调用LLM API时发生错误: {e}")
-            return "错误:调用语言模型服务时出错。"
+        logger.debug("正在调用大语言模型...")
+        with tracer.span("llm_call", self.model, stream=False) as span:
+            if span.recording:
+                span.set(request_bytes=self._payload_size(messages))
+            key, cached = self._lookup(messages, bypass_cache, span)
+            if cached is not None:
+                span.set(response_chars=len(cached))
+                return cached
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,  # 这里换成了带有基于的列表
+                    stream=False,
+                )
+                answer = response.choices[0].message.content
+                span.set(response_chars=len(answer or ""), **self._record_usage(response.usage))
+                logger.debug("大语言模型响应成功。")
+                if key and answer:
+                    self.cache.put(key, answer)
+                return answer
+            except Exception as e:
+                logger.error(f"调用LLM API时发生错误: {e}")
+                span.set(error=str(e))
+                return "错误:调用语言模型服务时出错。"
+
+    def generate_stream(
+        self,
+        messages: list,
+        stop: list = None,
+        usage: dict = None,
+        bypass_cache: bool = False,
+    ):
+        """
+        流式调用LLM API，逐段 yield 生成的文本。
+        调用方提前结束迭代（break）时会关闭连接，服务端随之停止生成，不再浪费输出 token。
+        token 用量在最后一个 chunk 里返回（同时写入 usage 字典），提前结束时这一轮不会记录 usage。
+        命中回复缓存时一次 yield 整段回复，不消耗 token；只有完整结束的回复才会写入缓存。
+        """
+        logger.debug("正在流式调用大语言模型...")
+        self.last_usage = {}
+        # 生成器会把控制权交回调用方，span 不能成为"当前 span"
+        span = tracer.span("llm_call", self.model, detached=True, stream=True)
+        with span:
+            if span.recording:
+                span.set(request_bytes=self._payload_size(messages))
+            key, cached = self._lookup(messages, bypass_cache, span, stop=stop)
+            if cached is not None:
+                span.set(response_chars=len(cached))
+                yield cached
+                return
+            try:
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=True,
+                    stop=stop,
+                    # 让最后一个 chunk 带上 token 用量
+                    stream_options={"include_usage": True},
+                )
+            except Exception as e:
+                logger.error(f"调用LLM API时发生错误: {e}")
+                span.set(error=str(e))
+                yield "错误:调用语言模型服务时出错。"
+                return
+
+            chars = 0
+            parts = []
+            try:
+                for chunk in stream:
+                    if chunk.usage is not None:
+                        span.set(**self._record_usage(chunk.usage, usage))
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if chars == 0 and span.recording:
+                            span.set(first_token_ms=span.elapsed_ms())
+                        chars += len(delta)
+                        if key:
+                            parts.append(delta)
+                        yield delta
+                if parts:
+                    # 走到这里说明流完整结束（调用方提前结束时不会执行）
+                    self.cache.put(key, "".join(parts))
+            except Exception as e:
+                logger.error(f"读取LLM流式响应时发生错误: {e}")
+                span.set(error=str(e))
+            finally:
+                span.set(response_chars=chars)
+                stream.close()
+
+    async def agenerate_stream(
+        self,
+        messages: list,
+        stop: list = None,
+        usage: dict = None,
+        bypass_cache: bool = False,
+    ):
+        """
+        generate_stream 的异步版本，等待模型输出时不占用线程。
+        提前结束时调用方应当 aclose() 这个生成器，才能及时关闭连接。
+        """
+        logger.debug("正在异步流式调用大语言模型...")
+        span = tracer.span("llm_call", self.model, detached=True, stream=True)
+        with span:
+            if span.recording:
+                span.set(request_bytes=self._payload_size(messages))
+            key, cached = self._lookup(messages, bypass_cache, span, stop=stop)
+            if cached is not None:
+                span.set(response_chars=len(cached))
+                yield cached
+                return
+            try:
+                stream = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=True,
+                    stop=stop,
+                    stream_options={"include_usage": True},
+                )
+            except Exception as e:
+                logger.error(f"调用LLM API时发生错误: {e}")
+                span.set(error=str(e))
+                yield "错误:调用语言模型服务时出错。"
+                return
+
+            chars = 0
+            parts = []
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        span.set(**self._record_usage(chunk.usage, usage))
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if chars == 0 and span.recording:
+                            span.set(first_token_ms=span.elapsed_ms())
+                        chars += len(delta)
+                        if key:
+                            parts.append(delta)
+                        yield delta
+                if parts:
+                    # 走到这里说明流完整结束（调用方提前结束时不会执行）
+                    self.cache.put(key, "".join(parts))
+            except Exception as e:
+                logger.error(f"读取LLM流式响应时发生错误: {e}")
+                span.set(error=str(e))
+            finally:
+                span.set(response_chars=chars)
+                await stream.close()
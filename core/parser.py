@@ -1,5 +1,18 @@
+import json
 import re
+
 import json5
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _loads(text: str):
+    """模型输出绝大多数是标准 JSON，先用快得多的 json 解析，失败（单引号、尾逗号等）再交给 json5"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json5.loads(text)
 
 
 class ReActParser:
@@ -10,21 +23,67 @@ class ReActParser:
     def __init__(self):
         # 预编译正则，提高多次调用的效率
         self.action_pattern = r"行动[:：]\s*(\w+)"
-        self.action_input_pattern = r"行动输入[:：]\s*({.*?}|\{.*?\}|[^\n]*)"
+        # 参数依次尝试：```json 代码块、以行尾结束的 {...}（可以嵌套）、到第一个 } 为止的 {...}、整行文本
+        self.action_input_pattern = (
+            r"行动输入[:：]\s*(```(?:json)?\s*\{.*?\}\s*```"
+            r"|\{.*?\}(?=[ \t]*(?:\n|$))|\{.*?\}|[^\n]*)"
+        )
+        self._action_re = re.compile(self.action_pattern, re.IGNORECASE)
+        self._action_input_re = re.compile(self.action_input_pattern, re.DOTALL)
 
     def parse(self, text: str, verbose: bool = False) -> tuple[str, dict]:
         """
-        从文本中提取 Action 和 Action Input
+        从文本中提取 Action 和 Action Input（只取第一组）
         """
-        action_match = re.search(self.action_pattern, text, re.IGNORECASE)
-        action_input_match = re.search(self.action_input_pattern, text, re.DOTALL)
+        actions = self.parse_all(text, verbose)
+        if not actions:
+            return "", {}
+        return actions[0]
 
-        action = action_match.group(1).strip() if action_match else ""
-        action_input_str = (
-            action_input_match.group(1).strip() if action_input_match else ""
-        )
+    def parse_all(self, text: str, verbose: bool = False) -> list[tuple[str, dict]]:
+        """
+        从文本中提取所有的 Action 和 Action Input，按出现顺序返回。
+        模型可以在一次回复里给出多组互不依赖的 行动/行动输入。
+        """
+        action_matches = list(self._action_re.finditer(text))
+        if not action_matches:
+            # 没有行动时，仍尝试兼容只有 行动输入 的旧格式
+            input_match = self._action_input_re.search(text)
+            if input_match:
+                return [("", self._parse_input(input_match.group(1), verbose))]
+            return []
+
+        actions = []
+        for i, action_match in enumerate(action_matches):
+            # 每个行动的参数只在它和下一个行动之间查找，避免串到别的行动上
+            end = (
+                action_matches[i + 1].start()
+                if i + 1 < len(action_matches)
+                else len(text)
+            )
+            segment = text[action_match.end() : end]
+            input_match = self._action_input_re.search(segment)
+            action_input_str = input_match.group(1) if input_match else ""
+            actions.append(
+                (
+                    action_match.group(1).strip(),
+                    self._parse_input(action_input_str, verbose),
+                )
+            )
+        return actions
 
-        # 清理和解析JSON
+    def action_boundary(self, text: str) -> int:
+        """
+        判断一段（可能还没生成完的）文本是否可以提前结束，返回截断位置，不能确定时返回 -1。
+        流式场景请直接使用 IncrementalReActParser，避免每次都从头扫描。
+        """
+        stream_parser = IncrementalReActParser(self)
+        stream_parser.feed(text)
+        return stream_parser.boundary()
+
+    def _parse_input(self, action_input_str: str, verbose: bool = False) -> dict:
+        """清理并解析 行动输入 中的参数"""
+        action_input_str = action_input_str.strip()
         action_input_dict = {}
         if action_input_str:
             try:
@@ -32,17 +91,17 @@ class ReActParser:
                 clean_input = self._clean_markdown(action_input_str)
 
                 if clean_input.startswith("{") and clean_input.endswith("}"):
-                    action_input_dict = json5.loads(clean_input)
+                    action_input_dict = _loads(clean_input)
                 else:
                     # 兜底逻辑：处理非 JSON 格式的字符串输入
                     action_input_dict = {"search_query": clean_input.strip("\"'")}
             except Exception as e:
                 if verbose:
-                    print(f"[ReAct Parser] 解析参数失败: {e}")
+                    logger.warning(f"解析行动输入失败: {e}")
                 # 最终兜底：将原始字符串设为 search_query
                 action_input_dict = {"search_query": action_input_str.strip("\"'")}
 
-        return action, action_input_dict
+        return action_input_dict
 
     def _clean_markdown(self, text: str) -> str:
         """去掉模型输出中可能包含的 ```json ... ``` 标记"""
@@ -53,3 +112,202 @@ class ReActParser:
             # 移除结尾的 ```
             text = re.sub(r"\s*```$", "", text)
         return text.strip()
+
+
+# 增量解析器的状态
+_SEEK, _NAME, _SEEK_INPUT, _INPUT_START, _JSON, _FENCE_END, _PLAIN = range(7)
+
+
+class IncrementalReActParser:
+    """
+    流式增量解析器：模型每生成一段文本就 feed 一次，
+    一旦某组 行动/行动输入 完整（JSON 参数的括号已经配对），立刻返回它，
+    这样 Agent 可以在模型还在输出后面的内容时就开始调用工具。
+
+    内部是一个按字符推进的状态机，已经扫描过的文本不会重复扫描。
+    """
+
+    _marker_re = re.compile(r"行动(输入)?[:：]")
+    _name_re = re.compile(r"\s*(\w+)")
+
+    def __init__(self, parser: ReActParser = None):
+        self.parser = parser or ReActParser()
+        self.text = ""
+        self.actions: list[tuple[str, dict]] = []
+        self._pos = 0
+        self._state = _SEEK
+        self._action = ""
+        self._input_start = 0
+        self._fenced = False
+        # JSON 括号匹配的中间状态，跨 feed 保留
+        self._depth = 0
+        self._quote = ""
+        self._escaped = False
+        # 最后一组完整行动的结束位置
+        self._last_end = -1
+
+    def feed(self, chunk: str) -> list[tuple[str, dict]]:
+        """输入新生成的文本，返回这次新完成的 (action, action_input) 列表"""
+        self.text += chunk
+        text = self.text
+        completed = []
+        while self._pos < len(text):
+            state = self._state
+            if state == _SEEK:
+                match = self._marker_re.search(text, self._pos)
+                if not match:
+                    # 保留末尾几个字符，标记可能被截在两段之间
+                    self._pos = max(self._pos, len(text) - 4)
+                    break
+                if match.group(1):
+                    # 只有 行动输入 没有 行动 的旧格式
+                    self._action = ""
+                    self._state = _INPUT_START
+                else:
+                    self._state = _NAME
+                self._pos = match.end()
+            elif state == _NAME:
+                match = self._name_re.match(text, self._pos)
+                if not match:
+                    if text[self._pos :].strip():
+                        self._state = _SEEK
+                        continue
+                    break
+                if match.end() == len(text):
+                    # 工具名可能还没输出完
+                    break
+                self._action = match.group(1).strip()
+                self._pos = match.end()
+                self._state = _SEEK_INPUT
+            elif state == _SEEK_INPUT:
+                match = self._marker_re.search(text, self._pos)
+                if not match:
+                    self._pos = max(self._pos, len(text) - 5)
+                    break
+                self._pos = match.end()
+                if match.group(1):
+                    self._state = _INPUT_START
+                else:
+                    # 上一个行动没有参数，直接下一个行动
+                    completed.append(self._complete(""))
+                    self._state = _NAME
+            elif state == _INPUT_START:
+                rest = text[self._pos :]
+                stripped = rest.lstrip()
+                if not stripped:
+                    self._pos = len(text)
+                    break
+                self._pos += len(rest) - len(stripped)
+                if "```".startswith(stripped[:3]) and len(stripped) < 3:
+                    break
+                self._input_start = self._pos
+                self._fenced = stripped.startswith("```")
+                if self._fenced:
+                    brace = text.find("{", self._pos)
+                    if brace < 0:
+                        break
+                    self._pos = brace
+                    self._state = _JSON
+                elif stripped.startswith("{"):
+                    self._state = _JSON
+                else:
+                    self._state = _PLAIN
+                self._depth = 0
+                self._quote = ""
+                self._escaped = False
+            elif state == _JSON:
+                end = self._scan_json(text)
+                if end < 0:
+                    break
+                self._pos = end
+                if self._fenced:
+                    self._state = _FENCE_END
+                else:
+                    completed.append(self._complete(text[self._input_start : end]))
+            elif state == _FENCE_END:
+                close = text.find("```", self._pos)
+                if close < 0:
+                    self._pos = max(self._pos, len(text) - 2)
+                    break
+                self._pos = close + 3
+                completed.append(self._complete(text[self._input_start : self._pos]))
+            elif state == _PLAIN:
+                newline = text.find("\n", self._pos)
+                if newline < 0:
+                    self._pos = len(text)
+                    break
+                self._pos = newline
+                completed.append(self._complete(text[self._input_start : newline]))
+        return completed
+
+    def close(self) -> list[tuple[str, dict]]:
+        """流结束时调用，把以文本结尾收尾的最后一组行动也输出"""
+        completed = []
+        if self._state == _PLAIN:
+            completed.append(self._complete(self.text[self._input_start :]))
+        elif self._state in (_SEEK_INPUT, _INPUT_START) and self._action:
+            completed.append(self._complete(""))
+        elif self._state == _NAME:
+            match = self._name_re.match(self.text, self._pos)
+            if match:
+                self._action = match.group(1).strip()
+                self._pos = match.end()
+                completed.append(self._complete(""))
+        return completed
+
+    def boundary(self) -> int:
+        """
+        判断是否可以提前结束生成。
+
+        当已经有完整的 行动/行动输入，且后面开始出现模型自己编造的
+        "观察："或其他无关内容时，返回应当截断的位置；还不能确定时返回 -1。
+        后面紧跟的是下一组 行动/思考 时继续等待，以支持一次回复多个行动。
+        """
+        if self._last_end < 0 or self._state != _SEEK:
+            return -1
+        rest = self.text[self._last_end :]
+        stripped = rest.lstrip()
+        if not stripped:
+            return -1
+        cut = self._last_end + len(rest) - len(stripped)
+        # 流式输出时 "观察" 可能只到了第一个字
+        if stripped.startswith("观"):
+            return cut
+        first_line = stripped.split("\n", 1)[0]
+        # 新的一行还太短，无法判断是不是下一组行动
+        if "\n" not in stripped and len(first_line) < 4:
+            return -1
+        if first_line.startswith(("行动", "思考", "最终答案")):
+            return -1
+        return cut
+
+    def _scan_json(self, text: str) -> int:
+        """从上次停下的位置继续做括号匹配，配对完成返回结束位置，否则返回 -1"""
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == self._quote:
+                    self._quote = ""
+            elif ch in "\"'":
+                self._quote = ch
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return i + 1
+        self._pos = len(text)
+        return -1
+
+    def _complete(self, action_input_str: str) -> tuple[str, dict]:
+        action = (self._action, self.parser._parse_input(action_input_str))
+        self.actions.append(action)
+        self._last_end = self._pos
+        self._action = ""
+        self._state = _SEEK
+        return action
+
@@ -0,0 +1,224 @@
+import asyncio
+import json5
+import os
+import re
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+import config
+from utils.logger import tracer
+
+# 一个计划最多包含多少次工具调用
+MAX_PLAN_NODES = config.get_int("AGENT_MAX_PLAN_NODES", 20)
+# 引用前面步骤的输出：${步骤id} 或 ${步骤id.字段.下标}，* 表示对列表里的每一项取值
+_REFERENCE = re.compile(r"\$\{\s*([A-Za-z_][\w-]*)((?:\.[^.}\s]+)*)\s*\}")
+
+
+class PlanError(ValueError):
+    """模型给出的计划无法解析或不合法"""
+
+
+class PlanNode:
+    """计划里的一次工具调用"""
+
+    __slots__ = ("id", "tool", "args", "deps")
+
+    def __init__(self, node_id: str, tool: str, args: dict, deps: list):
+        self.id = node_id
+        self.tool = tool
+        self.args = args
+        self.deps = deps
+
+    def __repr__(self) -> str:
+        return f"PlanNode({self.id!r}, {self.tool!r}, deps={self.deps})"
+
+
+def _references(value) -> set:
+    """参数里引用到的步骤 id"""
+    if isinstance(value, str):
+        return {match.group(1) for match in _REFERENCE.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(_references(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(_references(v) for v in value)) if value else set()
+    return set()
+
+
+def parse_plan(text: str, tool_names) -> list:
+    """
+    从模型回复里取出计划（"计划：" 后面的 JSON 数组），校验后按拓扑顺序返回 PlanNode 列表。
+    每一步形如 {"id": "loc", "tool": "address_to_location", "args": {...}, "after": [...]}，
+    依赖关系来自 args 里的 ${...} 引用和可选的 after。
+    回复里没有计划时返回 None；计划不合法时抛出 PlanError。
+    """
+    head, sep, body = text.partition("计划：")
+    if not sep:
+        head, sep, body = text.partition("计划:")
+    if not sep:
+        return None
+    start, end = body.find("["), body.rfind("]")
+    if start < 0 or end < start:
+        raise PlanError("计划不是 JSON 数组")
+    try:
+        steps = json5.loads(body[start : end + 1])
+    except ValueError as e:
+        raise PlanError(f"计划 JSON 解析失败: {e}")
+    if not isinstance(steps, list) or not steps:
+        raise PlanError("计划为空")
+    if len(steps) > MAX_PLAN_NODES:
+        raise PlanError(f"计划最多包含 {MAX_PLAN_NODES} 步，实际 {len(steps)} 步")
+
+    nodes = {}
+    for index, step in enumerate(steps, 1):
+        if not isinstance(step, dict):
+            raise PlanError(f"第 {index} 步不是对象")
+        node_id = str(step.get("id") or f"s{index}")
+        tool = step.get("tool")
+        args = step.get("args") or {}
+        if node_id in nodes:
+            raise PlanError(f"步骤 id 重复: {node_id}")
+        if tool not in tool_names:
+            raise PlanError(f"步骤 {node_id} 使用了未知工具: {tool}")
+        if not isinstance(args, dict):
+            raise PlanError(f"步骤 {node_id} 的 args 不是对象")
+        after = step.get("after") or []
+        if isinstance(after, str):
+            after = [after]
+        deps = sorted(_references(args) | {str(d) for d in after})
+        nodes[node_id] = PlanNode(node_id, tool, args, deps)
+
+    for node in nodes.values():
+        for dep in node.deps:
+            if dep not in nodes:
+                raise PlanError(f"步骤 {node.id} 引用了不存在的步骤: {dep}")
+    return _topological_order(nodes)
+
+
+def _topological_order(nodes: dict) -> list:
+    """Kahn 算法排序，同时检查是否有环"""
+    pending = {node_id: len(node.deps) for node_id, node in nodes.items()}
+    children = {node_id: [] for node_id in nodes}
+    for node in nodes.values():
+        for dep in node.deps:
+            children[dep].append(node.id)
+    ready = [node_id for node_id, count in pending.items() if count == 0]
+    order = []
+    while ready:
+        node_id = ready.pop(0)
+        order.append(nodes[node_id])
+        for child in children[node_id]:
+            pending[child] -= 1
+            if pending[child] == 0:
+                ready.append(child)
+    if len(order) != len(nodes):
+        cyclic = [node_id for node_id, count in pending.items() if count > 0]
+        raise PlanError(f"计划里有循环依赖: {', '.join(cyclic)}")
+    return order
+
+
+def _lookup(value, path: list):
+    """按路径取值，* 对列表的每一项继续取值；取不到时抛出 KeyError"""
+    for i, key in enumerate(path):
+        if key == "*":
+            if not isinstance(value, list):
+                raise KeyError("*")
+            return [_lookup(item, path[i + 1 :]) for item in value]
+        if isinstance(value, list):
+            try:
+                value = value[int(key)]
+            except (ValueError, IndexError):
+                raise KeyError(key)
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            raise KeyError(key)
+    return value
+
+
+def resolve_args(value, outputs: dict):
+    """
+    把参数里的 ${...} 替换成前面步骤的输出。
+    整个字符串就是一个引用时保留原始类型（列表、字典），嵌在文本里时按字符串拼接。
+    """
+    if isinstance(value, dict):
+        return {k: resolve_args(v, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_args(v, outputs) for v in value]
+    if not isinstance(value, str):
+        return value
+
+    def resolve(match):
+        path = [p for p in match.group(2).split(".") if p]
+        try:
+            return _lookup(outputs[match.group(1)], path)
+        except KeyError as e:
+            raise PlanError(f"无法从步骤 {match.group(1)} 的结果中取到 {match.group(0)}（缺少 {e}）")
+
+    whole = _REFERENCE.fullmatch(value.strip())
+    if whole:
+        return resolve(whole)
+    return _REFERENCE.sub(lambda match: str(resolve(match)), value)
+
+
+class PlanExecutor:
+    """
+    执行工具调用的依赖图：依赖都完成的步骤立即并发执行，
+    执行前把参数里的引用替换成依赖步骤的结果。
+    某一步失败（抛异常、返回 None 或引用取不到值）时，依赖它的步骤被跳过。
+    """
+
+    def __init__(self, tools, executor=None):
+        self.tools = tools
+        self.executor = executor
+
+    async def execute(self, nodes: list) -> dict:
+        """返回 {步骤id: (状态, 结果或错误信息, 实际使用的参数)}，状态为 ok / error / skipped"""
+        results = {}
+        outputs = {}
+        waiting = list(nodes)
+        running = {}
+        try:
+            while waiting or running:
+                for node in list(waiting):
+                    failed = [dep for dep in node.deps if dep in results and results[dep][0] != "ok"]
+                    if failed:
+                        waiting.remove(node)
+                        results[node.id] = ("skipped", f"依赖的步骤 {', '.join(failed)} 没有成功", node.args)
+                        continue
+                    if all(dep in outputs for dep in node.deps):
+                        waiting.remove(node)
+                        try:
+                            args = resolve_args(node.args, outputs)
+                        except PlanError as e:
+                            results[node.id] = ("error", str(e), node.args)
+                            continue
+                        task = asyncio.ensure_future(self._call(node, args))
+                        running[task] = (node, args)
+                if not running:
+                    continue
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node, args = running.pop(task)
+                    try:
+                        value = task.result()
+                    except Exception as e:
+                        results[node.id] = ("error", f"执行工具 {node.tool} 时出错: {e}", args)
+                        continue
+                    if value is None:
+                        results[node.id] = ("error", f"工具 {node.tool} 没有返回结果", args)
+                        continue
+                    outputs[node.id] = value
+                    results[node.id] = ("ok", value, args)
+        finally:
+            for task in running:
+                task.cancel()
+        return {node.id: results[node.id] for node in nodes}
+
+    async def _call(self, node: PlanNode, args: dict):
+        with tracer.span("tool_call", node.tool, plan_step=node.id) as span:
+            try:
+                return await self.tools.aexecute_tool(node.tool, executor=self.executor, **args)
+            except Exception as e:
+                span.set(error=str(e))
+                raise
@@ -1,29 +1,42 @@
 import os
 import sys
 import time
-from dotenv import load_dotenv
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 from tools.tool import ReactTools
+from utils.tokens import count_tokens
 
 
 class SystemPromptBuilder:
-    def __init__(self):
-        self.tools = ReactTools()
+    """
+    系统提示分成两部分：
+    - 静态前缀：人设、工具列表、ReAct 规则。只构建一次，逐字节不变，
+      这样服务端的提示词前缀缓存（prompt cache）才能命中；
+    - 动态后缀：当前时间、用户位置等每次都会变的信息，放在用户消息开头。
+    """
+
+    def __init__(self, tools: ReactTools = None, extra_tools: list = None):
+        # 复用 Agent 的工具实例，不再单独创建一份
+        self.tools = tools or ReactTools()
+        # Agent 自己处理的工具（不在 ReactTools 里），例如取回被压缩的观察
+        self.extra_tools = extra_tools or []
+        self._static_prompt = None
+        self._plan_prompt = None
 
     def build_system_prompt(self) -> str:
-        """构建系统提示，直接从工具类获取描述"""
+        """构建静态系统提示，直接从工具类获取描述"""
+        tool_configs = self.tools.toolConfig + self.extra_tools
         tool_info = []
-        for tool in self.tools.toolConfig:
+        for tool in tool_configs:
             tool_info.append(
                 f"- {tool['name_for_model']}: {tool['description_for_model']}"
             )
 
-        tool_names = [tool["name_for_model"] for tool in self.tools.toolConfig]
+        tool_names = [tool["name_for_model"] for tool in tool_configs]
 
-        prompt = f"""现在时间是 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}。你是一位智能旅行助手，可以根据用户的要求定制化短途且详细周边游玩，可以推荐城市的游玩路线，范围等。 你可以使用以下工具来获取所需的信息：
+        prompt = f"""你是一位智能旅行助手，可以根据用户的要求定制化短途且详细周边游玩，可以推荐城市的游玩路线，范围等。 你可以使用以下工具来获取所需的信息：
 {chr(10).join(tool_info)}
 
 请遵循以下 ReAct 模式：
@@ -33,6 +46,9 @@ class SystemPromptBuilder:
 行动输入：提供工具的参数
 观察：工具返回的结果
 
+如果需要的多个工具之间互不依赖（例如同时查询天气和多个周边地点），可以在一次回复中连续给出多组 行动/行动输入，它们会被同时执行，观察结果会按顺序编号返回。
+有依赖关系的工具（例如需要先把地址转成经纬度再搜索周边）请分多轮调用。
+
 你可以重复以上循环，直到获得足够的信息来回答问题。
 
 最终答案：基于所有信息给出最终答案
@@ -46,9 +62,92 @@ class SystemPromptBuilder:
 开始！"""
         return prompt
 
+    def build_plan_prompt(self) -> str:
+        """
+        构建计划模式（plan-and-execute）的静态系统提示：模型一次给出全部工具调用及其依赖关系，
+        由 core/planner.py 并发执行，最后再调用一次模型写出答案。
+        """
+        tool_info = []
+        for tool in self.tools.toolConfig:
+            params = ", ".join(
+                f"{p['name']}{'*' if p.get('required') else ''}"
+                for p in tool.get("parameters", [])
+            )
+            tool_info.append(
+                f"- {tool['name_for_model']}({params}): {tool['description_for_model']}"
+            )
+
+        prompt = f"""你是一位智能旅行助手，可以根据用户的要求定制化短途且详细周边游玩，可以推荐城市的游玩路线，范围等。 你可以使用以下工具（参数名后带 * 的为必填）：
+{chr(10).join(tool_info)}
+
+请先一次性规划出回答问题需要的全部工具调用，按以下格式输出，不要输出其他内容：
+
+思考：分析问题，列出需要的信息以及它们之间的依赖关系
+计划：
+[
+  {{"id": "loc", "tool": "address_to_location", "args": {{"address": "成都市锦江区春熙路"}}}},
+  {{"id": "weather", "tool": "get_weather", "args": {{"city": "成都"}}}},
+  {{"id": "food", "tool": "nearby_search_advanced", "args": {{"location": "${{loc}}", "keywords": "火锅", "preferences": "open_now"}}}},
+  {{"id": "map", "tool": "map_position", "args": {{"locations": "${{food.*.位置详情.经纬度}}", "names": "${{food.*.基本信息.名称}}"}}}}
+]
+
+规则：
+- 计划是一个 JSON 数组，每一步包含 id、tool、args；
+- 需要用到前面步骤的结果时，在参数里写 ${{步骤id}}，或用 ${{步骤id.字段.下标}} 取其中一部分，* 表示对列表的每一项取值；
+- 互不依赖的步骤会被同时执行，有依赖的步骤会在依赖完成后自动执行，所以不要按"先做什么再做什么"拆成多轮；
+- 不需要调用工具就能回答时，直接输出 最终答案：...
+
+执行结果会在下一条消息中给出，届时请输出 最终答案：基于所有信息给出的最终答案"""
+        return prompt
+
+    def get_plan_prompt(self) -> str:
+        """计划模式的系统提示同样只构建一次"""
+        if self._plan_prompt is None:
+            self._plan_prompt = self.build_plan_prompt()
+        return self._plan_prompt
+
+    def build_plan_messages(self, query: str, location: str = None) -> list:
+        """计划模式的初始消息"""
+        return [
+            {"role": "system", "content": self.get_plan_prompt()},
+            {
+                "role": "user",
+                "content": f"{self.build_dynamic_context(location)}\n问题：{query}",
+            },
+        ]
+
+    def build_dynamic_context(self, location: str = None) -> str:
+        """构建动态上下文：当前时间（精确到分钟）和用户位置"""
+        context = f"现在时间是 {time.strftime('%Y-%m-%d %H:%M', time.localtime())}。"
+        if location:
+            context += f"用户当前所在的精确位置是：{location}。请基于此位置回答。"
+        return f"【系统提示：{context}】"
+
+    def build_messages(self, query: str, location: str = None) -> list:
+        """组装一次查询的初始消息：静态系统提示 + 带动态上下文的用户问题"""
+        return [
+            {"role": "system", "content": self.get_system_prompt()},
+            {
+                "role": "user",
+                "content": f"{self.build_dynamic_context(location)}\n问题：{query}",
+            },
+        ]
+
+    def token_report(self, location: str = None) -> dict:
+        """统计静态前缀和动态后缀各占多少 token"""
+        return {
+            "static_tokens": count_tokens(self.get_system_prompt()),
+            "dynamic_tokens": count_tokens(self.build_dynamic_context(location)),
+        }
+
     def get_system_prompt(self) -> str:
-        return self.build_system_prompt()
+        """静态系统提示只构建一次"""
+        if self._static_prompt is None:
+            self._static_prompt = self.build_system_prompt()
+        return self._static_prompt
 
     def refresh_system_prompt(self) -> str:
-        # TODO: 如果工具列表发生变化，或者用户有特殊需求，可以调用此方法刷新提示
-        pass
+        """工具列表发生变化时，调用此方法重新构建静态系统提示"""
+        self._static_prompt = None
+        self._plan_prompt = None
+        return self.get_system_prompt()
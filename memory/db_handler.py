@@ -0,0 +1,186 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+DEFAULT_DB_PATH = config.get_str(
+    "MEMORY_DB_PATH", os.path.join(config.DATA_DIR, "memory.db")
+)
+
+# 后台写线程：每攒够多少条，或者最多等多久，提交一次事务
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.5
+# 数据保留策略
+RETENTION_DAYS = config.get_int("MEMORY_RETENTION_DAYS", 30)
+MAX_ROWS_PER_TABLE = config.get_int("MEMORY_MAX_ROWS", 100000)
+PRUNE_INTERVAL = 10 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_session
+    ON conversations (session_id, created_at);
+
+CREATE TABLE IF NOT EXISTS traces (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    raw_response TEXT,
+    final_answer TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_traces_session
+    ON traces (session_id, created_at);
+
+CREATE TABLE IF NOT EXISTS tool_results (
+    tool TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (tool, params_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_tool_results_expires
+    ON tool_results (expires_at);
+"""
+
+# 写操作：(sql, 参数)
+_INSERT_SQL = {
+    "conversation": "INSERT INTO conversations (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+    "trace": "INSERT INTO traces (session_id, query, raw_response, final_answer, created_at) VALUES (?, ?, ?, ?, ?)",
+    "tool_result": "INSERT OR REPLACE INTO tool_results (tool, params_hash, params, result, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+_STOP = object()
+
+
+class SQLiteHandler:
+    """
+    SQLite 持久化存储。
+
+    - WAL 模式：读写互不阻塞，多个线程可以同时读；
+    - 所有写操作进入队列，由后台线程批量提交，请求路径不会等待磁盘 fsync；
+    - 后台线程定期按保留天数和行数上限清理旧数据。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        self._queue: queue.Queue = queue.Queue()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._writer = threading.Thread(
+            target=self._write_loop, name="memory-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 下 NORMAL 足够安全，且每次提交不需要 fsync
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """每个线程一个只读连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # ---------- 写 ----------
+
+    def enqueue(self, kind: str, params: tuple) -> None:
+        """把一条写操作放进队列，立即返回"""
+        self._queue.put((kind, params))
+
+    def flush(self) -> None:
+        """等待队列里的写操作全部落盘"""
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._writer.join(timeout=5)
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        last_prune = time.monotonic()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            # 攒一批再提交，减少事务次数
+            while item is not _STOP and len(batch) < BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+            writes = [b for b in batch if b is not _STOP]
+            try:
+                with conn:
+                    for kind, params in writes:
+                        conn.execute(_INSERT_SQL[kind], params)
+            except sqlite3.Error as e:
+                logger.warning(f"写入记忆数据库出错: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(writes) < len(batch):
+                conn.close()
+                return
+            if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                self.prune(conn)
+                last_prune = time.monotonic()
+
+    def prune(self, conn: sqlite3.Connection = None) -> None:
+        """
+        清理过期的工具结果、超过保留天数的对话，以及超过行数上限的最旧数据。
+        不传 conn 时临时打开一个连接，用完关闭。
+        """
+        own = conn is None
+        if own:
+            conn = self._connect()
+        now = time.time()
+        cutoff = now - RETENTION_DAYS * 24 * 3600
+        try:
+            with conn:
+                conn.execute("DELETE FROM tool_results WHERE expires_at < ?", (now,))
+                # 工具结果没有自增 id，超过行数上限时按过期时间删掉最快过期的那些（走 expires_at 索引）
+                conn.execute(
+                    "DELETE FROM tool_results WHERE rowid IN "
+                    "(SELECT rowid FROM tool_results ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (MAX_ROWS_PER_TABLE,),
+                )
+                for table in ("conversations", "traces"):
+                    conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (cutoff,))
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE id <= "
+                        f"(SELECT MAX(id) FROM {table}) - ?",
+                        (MAX_ROWS_PER_TABLE,),
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"清理记忆数据库出错: {e}")
+        finally:
+            if own:
+                conn.close()
+
+    # ---------- 读 ----------
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        return self._reader().execute(sql, params).fetchall()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import threading
+import time
+from memory.db_handler import SQLiteHandler, DEFAULT_DB_PATH
+from utils.cache import MISSING
+
+
+class MemoryManager:
+    """
+    对话历史、ReAct 推理过程和工具结果的持久化记忆。
+
+    写操作全部异步（进入 SQLiteHandler 的后台队列），读操作直接查询。
+    工具结果按 (工具名, 参数哈希) 存储，Agent 重启或 Streamlit rerun 后可以直接复用
+    之前的地理编码和 POI 查询结果。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db = SQLiteHandler(db_path)
+
+    # ---------- 对话与推理过程 ----------
+
+    def save_message(self, session_id: str, role: str, content: str) -> None:
+        self.db.enqueue("conversation", (session_id, role, content, time.time()))
+
+    def save_trace(
+        self, session_id: str, query: str, raw_response: str, final_answer: str
+    ) -> None:
+        """保存一次查询的完整 ReAct 过程（agent.run 返回的 raw_response）"""
+        self.db.enqueue(
+            "trace", (session_id, query, raw_response, final_answer, time.time())
+        )
+
+    def get_history(self, session_id: str, limit: int = 50) -> list:
+        rows = self.db.query(
+            "SELECT role, content FROM conversations WHERE session_id = ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (session_id, limit),
+        )
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def get_traces(self, session_id: str, limit: int = 20) -> list:
+        rows = self.db.query(
+            "SELECT query, raw_response, final_answer, created_at FROM traces "
+            "WHERE session_id = ? ORDER BY created_at DESC LIMIT ?",
+            (session_id, limit),
+        )
+        return [
+            {"query": q, "raw_response": r, "final_answer": a, "created_at": t}
+            for q, r, a, t in rows
+        ]
+
+    # ---------- 工具结果 ----------
+
+    @staticmethod
+    def params_hash(key) -> str:
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def get_tool_result(self, tool: str, key):
+        """读取未过期的工具结果，没有时返回 MISSING"""
+        rows = self.db.query(
+            "SELECT result FROM tool_results WHERE tool = ? AND params_hash = ? "
+            "AND expires_at > ?",
+            (tool, self.params_hash(key), time.time()),
+        )
+        if not rows:
+            return MISSING
+        return json.loads(rows[0][0])
+
+    def put_tool_result(self, tool: str, key, result, ttl: float) -> None:
+        try:
+            payload = json.dumps(result, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        self.db.enqueue(
+            "tool_result",
+            (tool, self.params_hash(key), repr(key), payload, now, now + ttl),
+        )
+
+    def flush(self) -> None:
+        self.db.flush()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_memory_manager(db_path: str = DEFAULT_DB_PATH) -> MemoryManager:
+    """进程内共享一个 MemoryManager（共享一个后台写线程）"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = MemoryManager(db_path)
+    return _manager
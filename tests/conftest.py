@@ -0,0 +1,5 @@
+import os
+import sys
+
+# core/ 下的模块之间用顶层名字互相导入（和 app.py 一样），测试前把 core 加进 sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core"))
@@ -0,0 +1,67 @@
+"""utils/cache.py 的 TTLCache：过期、按条目数和内存上限的 LRU 淘汰"""
+
+import types
+
+import pytest
+
+from utils import cache as module
+from utils.cache import MISSING, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TTLCache()
+    cache.set("a", 1, ttl=10)
+    clock[0] += 9
+    assert cache.get("a") == 1
+    clock[0] += 2
+    assert cache.get("a") is MISSING
+    assert cache.stats()["entries"] == 0
+
+
+def test_cached_none_is_a_hit():
+    cache = TTLCache()
+    cache.set("a", None, ttl=60)
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_cap_evicts_until_under_limit():
+    cache = TTLCache(max_bytes=25)
+    for key in "abc":
+        cache.set(key, "x" * 8, ttl=60)  # repr 长度为 10
+    assert cache.get("a") is MISSING
+    assert cache.stats()["bytes"] == 20
+
+
+def test_value_larger_than_cap_is_not_cached():
+    cache = TTLCache(max_bytes=10)
+    cache.set("small", 1, ttl=60)
+    cache.set("big", "x" * 100, ttl=60)
+    assert cache.get("big") is MISSING
+    assert cache.get("small") == 1
+
+
+def test_overwrite_replaces_size_accounting():
+    cache = TTLCache()
+    cache.set("a", "x" * 8, ttl=60)
+    cache.set("a", 1, ttl=60)
+    assert cache.stats()["bytes"] == 1
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,110 @@
+"""memory/db_handler.py 的后台批量写入和数据清理"""
+
+import sqlite3
+import time
+
+import pytest
+
+from memory import db_handler
+from memory.db_handler import SQLiteHandler
+
+
+@pytest.fixture
+def db(tmp_path):
+    handler = SQLiteHandler(str(tmp_path / "memory.db"))
+    yield handler
+    handler.close()
+
+
+def _conversation(content: str, created_at: float = None) -> tuple:
+    return ("s1", "user", content, created_at or time.time())
+
+
+def _tool_result(name: str, expires_at: float) -> tuple:
+    return ("get_weather", name, "{}", "晴", time.time(), expires_at)
+
+
+def test_flush_waits_for_queued_writes(db):
+    for i in range(50):
+        db.enqueue("conversation", _conversation(f"m{i}"))
+    db.flush()
+    assert db.query("SELECT COUNT(*) FROM conversations") == [(50,)]
+
+
+def test_full_batch_commits_without_waiting_for_the_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_handler, "BATCH_SIZE", 3)
+    monkeypatch.setattr(db_handler, "FLUSH_INTERVAL", 30)
+    handler = SQLiteHandler(str(tmp_path / "memory.db"))
+    try:
+        start = time.monotonic()
+        for i in range(3):
+            handler.enqueue("conversation", _conversation(f"m{i}"))
+        handler.flush()
+        assert time.monotonic() - start < 5
+        assert handler.query("SELECT COUNT(*) FROM conversations") == [(3,)]
+    finally:
+        handler.close()
+
+
+def test_failed_batch_does_not_stop_the_writer(db):
+    """一批里有写入失败时整批回滚，后台线程继续处理后面的写操作"""
+    db.enqueue("conversation", ("s1", "user"))
+    db.flush()
+    db.enqueue("conversation", _conversation("ok"))
+    db.flush()
+    assert db.query("SELECT content FROM conversations") == [("ok",)]
+
+
+def test_close_commits_pending_writes(tmp_path):
+    path = str(tmp_path / "memory.db")
+    handler = SQLiteHandler(path)
+    handler.enqueue("conversation", _conversation("last"))
+    handler.close()
+    assert not handler._writer.is_alive()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT content FROM conversations").fetchall() == [("last",)]
+
+
+def test_prune_drops_expired_and_old_rows(db):
+    now = time.time()
+    old = now - (db_handler.RETENTION_DAYS + 1) * 24 * 3600
+    db.enqueue("conversation", _conversation("old", old))
+    db.enqueue("conversation", _conversation("new", now))
+    db.enqueue("tool_result", _tool_result("expired", now - 1))
+    db.enqueue("tool_result", _tool_result("fresh", now + 60))
+    db.flush()
+    db.prune()
+    assert db.query("SELECT content FROM conversations") == [("new",)]
+    assert db.query("SELECT params_hash FROM tool_results") == [("fresh",)]
+
+
+def test_prune_caps_rows_per_table(db, monkeypatch):
+    """超过行数上限时对话保留最新的，工具结果保留最晚过期的"""
+    monkeypatch.setattr(db_handler, "MAX_ROWS_PER_TABLE", 2)
+    now = time.time()
+    for i in range(4):
+        db.enqueue("conversation", _conversation(f"m{i}"))
+        db.enqueue("tool_result", _tool_result(f"r{i}", now + 60 * (4 - i)))
+    db.flush()
+    db.prune()
+    assert db.query("SELECT content FROM conversations ORDER BY id") == [("m2",), ("m3",)]
+    assert db.query("SELECT params_hash FROM tool_results ORDER BY params_hash") == [
+        ("r0",),
+        ("r1",),
+    ]
+
+
+def test_prune_closes_the_connection_it_opens(db, monkeypatch):
+    opened = []
+    connect = db._connect
+
+    def tracked():
+        conn = connect()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(db, "_connect", tracked)
+    db.prune()
+    assert len(opened) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
@@ -0,0 +1,96 @@
+"""utils/llm_cache.py 的缓存键规范化、过期，以及 utils/disk_lru.py 的按大小淘汰"""
+
+import os
+import types
+
+import pytest
+
+from utils import llm_cache as module
+from utils.disk_lru import DiskLRU
+from utils.llm_cache import CompletionCache
+
+MESSAGES = [
+    {"role": "system", "content": "你是旅行助手。现在时间是 2026-10-18 11:15。"},
+    {"role": "user", "content": "成都春熙路附近的美食"},
+]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_800_000_000.0]
+    monkeypatch.setattr(module, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_key_ignores_current_time_whitespace_and_extra_fields():
+    other = [
+        {"role": "system", "content": "你是旅行助手。现在时间是 2026-10-19 08:00。", "id": 1},
+        {"role": "user", "content": "  成都春熙路附近的美食\n"},
+    ]
+    assert CompletionCache.key("m", MESSAGES, temperature=0) == CompletionCache.key(
+        "m", other, temperature=0, stop=None
+    )
+
+
+@pytest.mark.parametrize(
+    "model, params, messages",
+    [
+        ("other-model", {"temperature": 0}, MESSAGES),
+        ("m", {"temperature": 0.7}, MESSAGES),
+        ("m", {"temperature": 0}, MESSAGES[:1] + [{"role": "user", "content": "火锅"}]),
+    ],
+)
+def test_key_changes_with_model_params_or_history(model, params, messages):
+    assert CompletionCache.key(model, messages, **params) != CompletionCache.key(
+        "m", MESSAGES, temperature=0
+    )
+
+
+def test_entry_expires_after_ttl(tmp_path, clock):
+    cache = CompletionCache(str(tmp_path), ttl=60)
+    key = CompletionCache.key("m", MESSAGES)
+    cache.put(key, "推荐火锅")
+    clock[0] += 59
+    assert cache.get(key) == "推荐火锅"
+    clock[0] += 2
+    assert cache.get(key) is None
+    assert not os.path.exists(cache._path(key))
+    assert cache.stats() == {"hits": 1, "misses": 1, "bytes": 0}
+
+
+def test_overwrite_accounts_only_the_difference(tmp_path):
+    cache = CompletionCache(str(tmp_path))
+    key = CompletionCache.key("m", MESSAGES)
+    cache.put(key, "短")
+    cache.put(key, "长一些的回复")
+    assert cache.stats()["bytes"] == os.path.getsize(cache._path(key))
+
+
+def _write(directory, name: str, size: int, mtime: float) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_disk_lru_evicts_least_recently_used_down_to_target(tmp_path):
+    lru = DiskLRU(str(tmp_path), max_bytes=1000, suffix=".json")
+    paths = [_write(tmp_path, f"{i}.json", 300, 1000 + i) for i in range(3)]
+    lru.account(0)
+    assert lru.total == 900
+    lru.touch(paths[0])
+    _write(tmp_path, "3.json", 300, 1100)
+    lru.account(300)
+    # 超出上限后删到 800 以下：最久没用的 1、2 被删，刚 touch 过的 0 保留
+    assert sorted(os.listdir(tmp_path)) == ["0.json", "3.json"]
+    assert lru.total == 600
+
+
+def test_disk_lru_ignores_other_suffixes(tmp_path):
+    _write(tmp_path, "a.json", 100, 1000)
+    _write(tmp_path, "a.json.tmp", 5000, 1000)
+    lru = DiskLRU(str(tmp_path), max_bytes=1000, suffix=".json")
+    lru.account(0)
+    assert lru.total == 100
+    assert os.path.exists(tmp_path / "a.json.tmp")
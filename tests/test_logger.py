@@ -0,0 +1,51 @@
+"""utils/logger.py 的计数器和 JSON Lines 写入"""
+
+import json
+import logging
+
+from utils.logger import Tracer, get_logger
+
+
+def test_incr_counts_without_a_span(tmp_path):
+    tracer = Tracer(str(tmp_path / "traces.jsonl"))
+    tracer.incr("agent_tool_cache_total", tool="get_weather", result="hit")
+    tracer.incr("agent_tool_cache_total", tool="get_weather", result="hit")
+
+    assert 'agent_tool_cache_total{result="hit",tool="get_weather"} 2' in tracer.prometheus_text()
+
+
+def test_spans_are_written_by_the_background_writer(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path))
+    with tracer.span("query", root=True) as root:
+        with tracer.span("tool_call", "get_weather"):
+            pass
+    tracer.flush()
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [r["kind"] for r in records] == ["tool_call", "query"]
+    assert records[0]["parent_id"] == root.span_id
+
+
+def test_no_file_when_path_is_empty(tmp_path):
+    tracer = Tracer("")
+    with tracer.span("query", root=True):
+        pass
+    tracer.flush()
+
+    assert tracer._writer is None
+    assert "kind=\"query\"" in tracer.prometheus_text()
+
+
+def test_log_level_is_applied_when_root_has_handlers(monkeypatch):
+    """根 logger 已有 handler 时不再加 handler，但级别仍按 LOG_LEVEL 设置"""
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    handler = logging.NullHandler()
+    logging.getLogger().addHandler(handler)
+    try:
+        logger = get_logger("tests.level")
+    finally:
+        logging.getLogger().removeHandler(handler)
+
+    assert logger.level == logging.WARNING
+    assert not logger.handlers
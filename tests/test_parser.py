@@ -0,0 +1,80 @@
+"""ReActParser.parse_all 和流式的 IncrementalReActParser 对同一段输出必须解析出相同的行动"""
+
+import re
+
+import pytest
+
+from benchmarks.bench_parser import chunked, load_corpus
+from core.parser import IncrementalReActParser, ReActParser
+
+_INPUT_RE = re.compile(r"(行动输入[:：])(\{[^\n]*\})")
+
+
+def _fenced(text: str) -> str:
+    """把每个单行 JSON 的 行动输入 改写成 ```json 代码块"""
+    return _INPUT_RE.sub(lambda m: f"{m.group(1)}```json\n{m.group(2)}\n```", text)
+
+
+CORPUS = load_corpus()
+FENCED = [_fenced(text) for text in CORPUS if _INPUT_RE.search(text)]
+EXTRA = [
+    # 嵌套的 JSON、编造的观察里也有括号
+    '行动：map_position\n行动输入：{"locations": ["104.08,30.65"], "style": {"size": 2}}\n观察：{"ok": 1}',
+    # 不带语言标记的代码块，代码块和 JSON 写在同一行
+    '行动：get_weather\n行动输入：```\n{"city": "成都"}\n```\n'
+    '行动：address_to_location\n行动输入：```json {"address": "春熙路"} ```\n',
+    # 多行 JSON
+    '行动：get_weather\n行动输入：{\n  "city": "成都"\n}\n观察：晴',
+]
+
+
+def _incremental(parser: ReActParser, chunks: list) -> list:
+    stream_parser = IncrementalReActParser(parser)
+    for chunk in chunks:
+        stream_parser.feed(chunk)
+    stream_parser.close()
+    return stream_parser.actions
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return ReActParser()
+
+
+def test_corpus_has_fenced_cases():
+    assert FENCED
+    assert any("```json" in text for text in CORPUS)
+
+
+@pytest.mark.parametrize("text", CORPUS + FENCED + EXTRA)
+def test_parse_all_matches_incremental(parser, text):
+    expected = parser.parse_all(text)
+    assert expected == _incremental(parser, [text])
+    for size in (1, 3, 7):
+        assert _incremental(parser, chunked(text, size)) == expected
+
+
+@pytest.mark.parametrize("text", FENCED)
+def test_fenced_input_parses_like_plain(parser, text):
+    plain = text.replace("```json\n", "").replace("\n```", "")
+    assert parser.parse_all(text) == parser.parse_all(plain)
+    assert all("search_query" not in args for _, args in parser.parse_all(text))
+
+
+def test_fenced_json_is_not_treated_as_plain_text(parser):
+    text = '行动：map_position\n行动输入：```json\n{"locations": ["104.08,30.65"]}\n```\n'
+    assert parser.parse_all(text) == [("map_position", {"locations": ["104.08,30.65"]})]
+
+
+def test_strict_json_input_skips_json5(parser, monkeypatch):
+    """标准 JSON 只走 json.loads，不调用 json5"""
+    def fail(text):
+        raise AssertionError("json5 不该被调用")
+
+    monkeypatch.setattr("core.parser.json5.loads", fail)
+    assert parser._parse_input('{"city": "成都", "days": 3}') == {"city": "成都", "days": 3}
+
+
+def test_json5_input_still_parses(parser):
+    """单引号、尾逗号这类非标准 JSON 回退到 json5"""
+    assert parser._parse_input("{'city': '成都', 'days': 3,}") == {"city": "成都", "days": 3}
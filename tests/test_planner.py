@@ -0,0 +1,83 @@
+"""core/planner.py：计划的依赖校验、拓扑排序和 ${...} 引用替换"""
+
+import pytest
+
+from core.planner import PlanError, parse_plan, resolve_args
+
+TOOLS = {"address_to_location", "get_weather", "search_nearby_poi"}
+
+
+def _plan(steps: str) -> str:
+    return f"思考：先定位再搜索\n计划：{steps}\n"
+
+
+def test_reply_without_plan_returns_none():
+    assert parse_plan("思考：直接回答\n最终答案：好", TOOLS) is None
+
+
+def test_steps_are_ordered_by_dependencies():
+    text = _plan(
+        '[{"id": "poi", "tool": "search_nearby_poi", "args": {"location": "${loc.location}"}},'
+        ' {"id": "loc", "tool": "address_to_location", "args": {"address": "春熙路"}},'
+        ' {"id": "wx", "tool": "get_weather", "args": {"city": "成都"}, "after": "poi"}]'
+    )
+    nodes = parse_plan(text, TOOLS)
+    assert [node.id for node in nodes] == ["loc", "poi", "wx"]
+    assert nodes[1].deps == ["loc"]
+    assert nodes[2].deps == ["poi"]
+
+
+def test_cycle_is_rejected():
+    text = _plan(
+        '[{"id": "a", "tool": "get_weather", "args": {"city": "${b}"}},'
+        ' {"id": "b", "tool": "get_weather", "args": {"city": "${a}"}}]'
+    )
+    with pytest.raises(PlanError, match="循环依赖"):
+        parse_plan(text, TOOLS)
+
+
+def test_reference_to_missing_step_is_rejected():
+    text = _plan('[{"id": "a", "tool": "get_weather", "args": {"city": "${nope.city}"}}]')
+    with pytest.raises(PlanError, match="不存在的步骤: nope"):
+        parse_plan(text, TOOLS)
+
+
+@pytest.mark.parametrize(
+    "steps, message",
+    [
+        ('[{"id": "a", "tool": "rm_rf", "args": {}}]', "未知工具"),
+        ('[{"id": "a", "tool": "get_weather"}, {"id": "a", "tool": "get_weather"}]', "id 重复"),
+        ("[]", "计划为空"),
+        ("[{oops]", "解析失败"),
+        ('{"id": "a"}', "不是 JSON 数组"),
+    ],
+)
+def test_invalid_plans_raise_plan_error(steps, message):
+    with pytest.raises(PlanError, match=message):
+        parse_plan(_plan(steps), TOOLS)
+
+
+OUTPUTS = {
+    "loc": {"location": "104.08,30.65", "city": "成都"},
+    "poi": [{"name": "火锅店", "location": "104.09,30.66"}, {"name": "茶馆", "location": "104.07,30.64"}],
+}
+
+
+def test_whole_reference_keeps_the_original_type():
+    assert resolve_args({"places": "${poi}"}, OUTPUTS) == {"places": OUTPUTS["poi"]}
+
+
+def test_embedded_reference_is_formatted_as_text():
+    assert resolve_args("${loc.city}春熙路", OUTPUTS) == "成都春熙路"
+
+
+def test_index_and_star_paths():
+    assert resolve_args("${poi.1.name}", OUTPUTS) == "茶馆"
+    assert resolve_args(["${poi.*.location}"], OUTPUTS) == [["104.09,30.66", "104.07,30.64"]]
+
+
+def test_missing_path_raises_plan_error():
+    with pytest.raises(PlanError, match="缺少 'adcode'"):
+        resolve_args("${loc.adcode}", OUTPUTS)
+    with pytest.raises(PlanError):
+        resolve_args("${poi.5.name}", OUTPUTS)
@@ -0,0 +1,99 @@
+"""tools/poi_index.py：覆盖判断、过期和 POI 的引用计数"""
+
+import types
+
+import pytest
+
+from tools import poi_index as module
+from tools.poi_index import POIIndex
+
+CENTER = "104.080000,30.650000"
+
+
+def _poi(poi_id: str, north_m: float, typecode: str = "050100") -> dict:
+    """中心正北 north_m 米处的 POI（纬度 1 度约 111195 米）"""
+    return {
+        "id": poi_id,
+        "name": poi_id,
+        "location": f"104.080000,{30.65 + north_m / 111195:.6f}",
+        "typecode": typecode,
+    }
+
+
+POIS = [_poi("far", 800), _poi("near", 100), _poi("mid", 400, "050300")]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_query_inside_a_complete_search_is_answered_locally():
+    index = POIIndex()
+    index.add(CENTER, "", "050000", 1000, POIS, complete=True)
+    results = index.query(CENTER, "", "050000", 500)
+    assert [p["id"] for p in results] == ["near", "mid"]
+    assert [p["distance"] for p in results] == ["100", "400"]
+    assert index.query(CENTER, "", "050000", 1000, page=2, page_size=2)[0]["id"] == "far"
+
+
+def test_query_reaching_outside_the_circle_misses():
+    index = POIIndex()
+    index.add(CENTER, "", "050000", 1000, POIS, complete=True)
+    assert index.query("104.080000,30.655000", "", "050000", 1000) is None
+    assert index.stats()["misses"] == 1
+
+
+def test_full_page_only_covers_up_to_the_farthest_poi():
+    index = POIIndex()
+    index.add(CENTER, "", "050000", 3000, POIS, complete=False)
+    assert index.query(CENTER, "", "050000", 800) is not None
+    assert index.query(CENTER, "", "050000", 1000) is None
+
+
+def test_subtype_is_filtered_from_a_broader_search():
+    index = POIIndex()
+    index.add(CENTER, "", "050000", 1000, POIS, complete=True)
+    assert [p["id"] for p in index.query(CENTER, "", "050300", 1000)] == ["mid"]
+    index.clear()
+    index.add(CENTER, "", "050300", 1000, POIS[2:], complete=True)
+    assert index.query(CENTER, "", "050000", 1000) is None
+
+
+def test_keywords_and_fields_must_match():
+    index = POIIndex()
+    index.add(CENTER, "火锅", "050000", 1000, POIS, complete=True, fields="cost,rating")
+    assert index.query(CENTER, "", "050000", 500) is None
+    assert index.query(CENTER, "火锅", "050000", 500, fields="photos") is None
+    assert index.query(CENTER, "火锅", "050000", 500, fields="rating") is not None
+
+
+def test_coverage_expires_after_ttl(clock):
+    index = POIIndex(ttl=60)
+    index.add(CENTER, "", "050000", 1000, POIS, complete=True)
+    clock[0] += 59
+    assert index.query(CENTER, "", "050000", 500) is not None
+    clock[0] += 2
+    assert index.query(CENTER, "", "050000", 500) is None
+    assert index.stats()["coverages"] == 0
+    assert index.stats()["pois"] == 0
+
+
+def test_shared_pois_are_released_with_their_last_coverage():
+    index = POIIndex(max_coverages=2)
+    index.add(CENTER, "", "050000", 1000, POIS, complete=True)
+    index.add(CENTER, "火锅", "050000", 1000, POIS[:1], complete=True)
+    assert index.stats()["pois"] == 3
+    index.add(CENTER, "烧烤", "050000", 1000, [], complete=True)
+    # 第一条记录被淘汰，"far" 仍被第二条引用
+    assert index.stats()["pois"] == 1
+    index.add(CENTER, "咖啡", "050000", 1000, [], complete=True)
+    assert index.stats()["pois"] == 0
+
+
+def test_pois_without_location_are_not_indexed():
+    index = POIIndex()
+    index.add(CENTER, "", "050000", 1000, POIS + [{"id": "x", "name": "x"}], complete=True)
+    assert index.stats()["coverages"] == 0
@@ -0,0 +1,127 @@
+"""core/agent.py 的 QueryLimiter：并发上限和先来先得"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.agent import QueryLimiter
+from utils.event_loop import BackgroundLoop
+
+
+@pytest.fixture(scope="module")
+def loop():
+    return BackgroundLoop(name="test-limiter")
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.001)
+
+
+def test_cap_is_shared_by_sync_and_async(loop):
+    limiter = QueryLimiter(2)
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def hold():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    def sync_query():
+        with limiter:
+            hold()
+
+    async def async_query():
+        async with limiter:
+            await asyncio.get_running_loop().run_in_executor(None, hold)
+
+    futures = [loop.submit(async_query()) for _ in range(5)]
+    threads = [threading.Thread(target=sync_query) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert peak[0] == 2
+    assert limiter.stats() == {"active": 0, "waiting": 0}
+
+
+def test_waiters_are_admitted_in_arrival_order(loop):
+    limiter = QueryLimiter(1)
+    order = []
+    limiter.__enter__()
+
+    async def async_query(name):
+        async with limiter:
+            order.append(name)
+
+    def sync_query(name):
+        with limiter:
+            order.append(name)
+
+    # 协程和同步调用交替排队，每个都确认排上了再放下一个
+    futures, threads = [], []
+    for i, kind in enumerate(["async", "sync", "async", "sync"]):
+        name = f"{kind}{i}"
+        if kind == "async":
+            futures.append(loop.submit(async_query(name)))
+        else:
+            thread = threading.Thread(target=sync_query, args=(name,))
+            thread.start()
+            threads.append(thread)
+        _wait_for(lambda: limiter.stats()["waiting"] == i + 1)
+
+    limiter.release()
+    for future in futures:
+        future.result(timeout=5)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ["async0", "sync1", "async2", "sync3"]
+    assert limiter.stats() == {"active": 0, "waiting": 0}
+
+
+def test_async_waiter_wakes_without_polling_delay(loop):
+    limiter = QueryLimiter(1)
+    limiter.__enter__()
+    admitted = []
+
+    async def async_query():
+        async with limiter:
+            admitted.append(time.perf_counter())
+
+    future = loop.submit(async_query())
+    _wait_for(lambda: limiter.stats()["waiting"] == 1)
+    released = time.perf_counter()
+    limiter.release()
+    future.result(timeout=5)
+
+    assert admitted[0] - released < 0.02
+
+
+def test_cancelled_waiter_leaves_the_queue(loop):
+    limiter = QueryLimiter(1)
+    limiter.__enter__()
+
+    async def async_query():
+        async with limiter:
+            pass
+
+    future = loop.submit(async_query())
+    _wait_for(lambda: limiter.stats()["waiting"] == 1)
+    future.cancel()
+    _wait_for(lambda: limiter.stats()["waiting"] == 0)
+    limiter.release()
+
+    assert limiter.stats() == {"active": 0, "waiting": 0}
@@ -0,0 +1,203 @@
+"""utils/rate_limit.py 对着本地的高德模拟服务（benchmarks.stubs.StubAMapServer）的测试"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+import requests
+
+from benchmarks.stubs import StubAMapServer
+from utils.rate_limit import Upstream, classify_amap
+
+
+@pytest.fixture
+def amap():
+    with StubAMapServer() as server:
+        yield server
+
+
+def _sender(server: StubAMapServer):
+    def send():
+        return requests.get(
+            f"{server.base_url}/v5/place/around",
+            params={"location": "104.080989,30.657689", "page_num": 1},
+            timeout=5,
+        )
+
+    return send
+
+
+def _run_concurrently(target, count: int) -> list:
+    results = [None] * count
+
+    def worker(i):
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_limited_upstream_stays_under_qps_cap():
+    """本地限速低于上游的 QPS 上限时，并发请求不会触发上游限流"""
+    with StubAMapServer(qps_limit=10) as amap:
+        upstream = Upstream("amap", qps=8, burst=1, classify=classify_amap, max_retries=0)
+        send = _sender(amap)
+        start = time.monotonic()
+        responses = _run_concurrently(lambda: upstream.call(send), 16)
+        elapsed = time.monotonic() - start
+
+    assert all(r.json()["status"] == "1" for r in responses)
+    assert amap.throttled == 0
+    assert amap.requests == 16
+    # 第一个请求用掉唯一的令牌，剩下 15 个按每秒 8 个匀速发出
+    assert elapsed >= 15 / 8 * 0.9
+    assert upstream.stats()["wait_seconds"] > 0
+
+
+def test_throttled_infocode_is_retried_with_backoff(amap, monkeypatch):
+    """infocode 10021 按退避时间重试，直到成功"""
+    amap.errors = ["10021", "10021"]
+    upstream = Upstream("amap", qps=0, classify=classify_amap, max_retries=3, base_delay=0.05)
+    delays = []
+    backoff = upstream.backoff
+
+    def record(attempt, response=None):
+        delay = backoff(attempt, response)
+        delays.append((attempt, delay))
+        return delay
+
+    monkeypatch.setattr(upstream, "backoff", record)
+    response = upstream.call(_sender(amap))
+
+    assert response.json()["status"] == "1"
+    assert amap.requests == 3
+    assert [attempt for attempt, _ in delays] == [0, 1]
+    stats = upstream.stats()
+    assert stats["retries"] == 2
+    assert stats["throttled"] == 2
+
+
+def test_retries_give_up_after_max_retries(amap):
+    """一直被限流时重试 max_retries 次后返回最后一次的响应"""
+    amap.errors = ["10021"] * 10
+    upstream = Upstream("amap", qps=0, classify=classify_amap, max_retries=2, base_delay=0.01)
+    response = upstream.call(_sender(amap))
+
+    assert response.json()["infocode"] == "10021"
+    assert amap.requests == 3
+
+
+@pytest.mark.parametrize("infocode", ["10001", "10003"])
+def test_fatal_infocode_is_not_retried(amap, infocode):
+    """Key 无效、日配额用完等错误重试也没用，直接返回"""
+    amap.errors = [infocode]
+    upstream = Upstream("amap", qps=0, classify=classify_amap, max_retries=3, base_delay=0.01)
+    response = upstream.call(_sender(amap))
+
+    assert response.json()["infocode"] == infocode
+    assert amap.requests == 1
+    stats = upstream.stats()
+    assert stats["fatal"] == 1
+    assert stats["retries"] == 0
+
+
+def test_backoff_grows_with_jitter_and_honours_retry_after():
+    upstream = Upstream("amap", qps=0, base_delay=0.2, max_delay=5.0)
+    for attempt in range(6):
+        cap = min(5.0, 0.2 * 2 ** attempt)
+        for _ in range(20):
+            assert cap / 2 <= upstream.backoff(attempt) <= cap
+
+    class Throttled:
+        headers = {"Retry-After": "3"}
+
+    assert upstream.backoff(0, Throttled()) == 3.0
+
+
+def test_hedging_sends_one_duplicate_when_a_token_is_free():
+    """慢请求超过 hedge_after 后只再发一份"""
+    with StubAMapServer(latency=0.3) as amap:
+        upstream = Upstream("amap", qps=0.1, burst=2, classify=classify_amap, hedge_after=0.05)
+        response = upstream.call(_sender(amap), hedge=True)
+
+    assert response.json()["status"] == "1"
+    assert upstream.stats()["hedged"] == 1
+    assert amap.requests == 2
+
+
+def test_hedging_is_capped_by_the_token_bucket():
+    """对冲请求也要取令牌：令牌用完后慢请求不再加发，重复请求数不超过桶里剩下的令牌"""
+    with StubAMapServer(latency=0.3) as amap:
+        upstream = Upstream(
+            "amap", qps=0.1, burst=6, classify=classify_amap, hedge_after=0.05
+        )
+        send = _sender(amap)
+        responses = _run_concurrently(lambda: upstream.call(send, hedge=True), 4)
+        time.sleep(0.1)
+
+    assert all(r.json()["status"] == "1" for r in responses)
+    stats = upstream.stats()
+    assert stats["hedged"] == 2
+    assert amap.requests == 4 + 2
+
+
+def test_hedging_skipped_without_a_free_token():
+    with StubAMapServer(latency=0.2) as amap:
+        upstream = Upstream("amap", qps=0.1, burst=1, classify=classify_amap, hedge_after=0.05)
+        upstream.call(_sender(amap), hedge=True)
+
+    assert upstream.stats()["hedged"] == 0
+    assert amap.requests == 1
+
+
+def _async_sender(server: StubAMapServer, client):
+    def send():
+        return client.get(
+            f"{server.base_url}/v5/place/around",
+            params={"location": "104.080989,30.657689", "page_num": 1},
+        )
+
+    return send
+
+
+def test_async_call_retries_throttled_and_returns_fatal(amap):
+    """acall 和 call 的重试规则相同"""
+    upstream = Upstream("amap", qps=0, classify=classify_amap, max_retries=3, base_delay=0.01)
+
+    async def main():
+        async with httpx.AsyncClient() as client:
+            send = _async_sender(amap, client)
+            amap.errors = ["10021", "10021"]
+            ok = await upstream.acall(send, network_errors=(httpx.TransportError,))
+            amap.errors = ["10001"]
+            fatal = await upstream.acall(send, network_errors=(httpx.TransportError,))
+            return ok, fatal
+
+    ok, fatal = asyncio.run(main())
+    assert ok.json()["status"] == "1"
+    assert fatal.json()["infocode"] == "10001"
+    assert amap.requests == 4
+    stats = upstream.stats()
+    assert (stats["retries"], stats["throttled"], stats["fatal"]) == (2, 2, 1)
+
+
+def test_async_limited_upstream_stays_under_qps_cap():
+    with StubAMapServer(qps_limit=10) as amap:
+        upstream = Upstream("amap", qps=8, burst=1, classify=classify_amap, max_retries=0)
+
+        async def main():
+            async with httpx.AsyncClient() as client:
+                send = _async_sender(amap, client)
+                return await asyncio.gather(*(upstream.acall(send) for _ in range(16)))
+
+        responses = asyncio.run(main())
+
+    assert all(r.json()["status"] == "1" for r in responses)
+    assert amap.throttled == 0
+    assert upstream.stats()["wait_seconds"] > 0
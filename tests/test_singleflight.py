@@ -0,0 +1,103 @@
+"""utils/singleflight.py：同时在飞的相同调用只执行一次，结果和异常分发给所有等待者"""
+
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+WAITERS = 4
+
+
+def _start_callers(flight: SingleFlight, func, count: int = WAITERS + 1) -> tuple:
+    """count 个线程同时调用同一个 key，等其余调用方都排到第一个后面再返回"""
+    outcomes = [None] * count
+
+    def caller(i):
+        try:
+            outcomes[i] = flight.do("key", func, group="get_weather")
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()["merged"] < count - 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    return threads, outcomes
+
+
+def _blocking(release: threading.Event, action):
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        return action()
+
+    return func, calls
+
+
+def _join(threads):
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_calls_run_once_and_share_the_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    func, calls = _blocking(release, lambda: {"city": "成都"})
+    threads, outcomes = _start_callers(flight, func)
+    release.set()
+    _join(threads)
+
+    assert len(calls) == 1
+    assert all(result == {"city": "成都"} for result, _ in outcomes)
+    assert sorted(shared for _, shared in outcomes) == [False] + [True] * WAITERS
+    assert flight.stats()["merged_by_group"] == {"get_weather": WAITERS}
+
+
+def test_error_is_raised_in_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    error = RuntimeError("上游超时")
+
+    def fail():
+        raise error
+
+    func, calls = _blocking(release, fail)
+    threads, outcomes = _start_callers(flight, func)
+    release.set()
+    _join(threads)
+
+    assert len(calls) == 1
+    assert all(outcome is error for outcome in outcomes)
+
+
+def test_key_is_released_after_an_error():
+    """失败的调用不会留在表里，下一次调用重新执行"""
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 1) == (1, False)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_waiters_get_a_copy_of_the_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    func, _ = _blocking(release, lambda: ["锦江区"])
+    threads, outcomes = _start_callers(flight, func)
+    release.set()
+    _join(threads)
+
+    results = [result for result, _ in outcomes]
+    results[0].append("青羊区")
+    assert all(result == ["锦江区"] for result in results[1:])
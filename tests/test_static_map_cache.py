@@ -0,0 +1,65 @@
+"""tools/static_map_cache.py 的下载失败回退和命中统计"""
+
+import threading
+
+import pytest
+
+from tools import static_map_cache as module
+from tools.static_map_cache import StaticMapCache
+
+URL = "https://restapi.amap.com/v3/staticmap?location=104.08,30.65&zoom=14&key=<用户的密钥>"
+
+
+class _Image:
+    status_code = 200
+    headers = {"Content-Type": "image/png"}
+    content = b"\x89PNG fake"
+
+
+@pytest.fixture
+def amap(monkeypatch):
+    calls = []
+
+    def http_get(url, **kwargs):
+        calls.append(url)
+        return _Image()
+
+    monkeypatch.setattr(module, "http_get", http_get)
+    monkeypatch.setattr(module.config, "amap_key", lambda: "real-key")
+    return calls
+
+
+def test_download_is_cached_without_the_key(tmp_path, amap):
+    cache = StaticMapCache(str(tmp_path))
+    path = cache.get(URL)
+    assert open(path, "rb").read() == _Image.content
+    assert cache.get(URL.replace("<用户的密钥>", "other")) == path
+    assert len(amap) == 1
+    assert amap[0].endswith("&key=real-key")
+    assert cache.stats() == {"hits": 1, "misses": 1, "bytes": len(_Image.content)}
+
+
+def test_write_error_returns_none(tmp_path, amap):
+    """缓存目录写不进去时返回 None（页面只显示文字），不把 OSError 抛给渲染"""
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    cache = StaticMapCache(str(blocker))
+    assert cache.get(URL) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_counters_are_exact_under_concurrency(tmp_path, amap):
+    cache = StaticMapCache(str(tmp_path))
+    cache.get(URL)
+
+    def worker():
+        for _ in range(500):
+            cache.get(URL)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["hits"] == 8 * 500
+    assert cache.stats()["misses"] == 1
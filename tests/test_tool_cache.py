@@ -0,0 +1,72 @@
+"""tools/tool_cache.py 的 per_item 策略：批量工具逐项读写单项工具的缓存，结果按输入顺序对齐"""
+
+import pytest
+
+from tools.tool_cache import ToolCache
+from utils.cache import TTLCache
+
+
+@pytest.fixture
+def tools():
+    calls = []
+
+    def address_to_location(address):
+        calls.append([address])
+        return f"loc:{address}"
+
+    def batch_address_to_location(addresses):
+        calls.append(list(addresses))
+        return [None if a == "坏地址" else {"location": f"loc:{a}"} for a in addresses]
+
+    cache = ToolCache(cache=TTLCache())
+    single = cache.wrap("address_to_location", address_to_location)
+    batch = cache.wrap("batch_address_to_location", batch_address_to_location)
+    return single, batch, calls
+
+
+def test_batch_requests_only_uncached_items_in_input_order(tools):
+    single, batch, calls = tools
+    single("春熙路")
+    calls.clear()
+
+    results = batch(["太古里", "春熙路", "宽窄巷子"])
+    assert calls == [["太古里", "宽窄巷子"]]
+    assert results == [{"location": "loc:太古里"}, "loc:春熙路", {"location": "loc:宽窄巷子"}]
+
+
+def test_batch_results_fill_the_single_item_cache(tools):
+    single, batch, calls = tools
+    batch(["太古里"])
+    calls.clear()
+    assert single("太古里") == {"location": "loc:太古里"}
+    assert calls == []
+
+
+def test_duplicates_are_requested_once_and_repeated_in_output(tools):
+    _, batch, calls = tools
+    results = batch(["太古里", " 太古里 ", "春熙路", "太古里"])
+    assert calls == [["太古里", "春熙路"]]
+    assert [r["location"] for r in results] == ["loc:太古里", "loc:太古里", "loc:春熙路", "loc:太古里"]
+
+
+def test_failed_items_are_not_cached(tools):
+    _, batch, calls = tools
+    assert batch(["坏地址", "春熙路"]) == [None, {"location": "loc:春熙路"}]
+    calls.clear()
+    assert batch(["坏地址", "春熙路"])[0] is None
+    assert calls == [["坏地址"]]
+
+
+def test_each_result_is_an_independent_copy(tools):
+    _, batch, _ = tools
+    first = batch(["太古里", "太古里"])
+    first[0]["location"] = "changed"
+    assert first[1]["location"] == "loc:太古里"
+    assert batch(["太古里"]) == [{"location": "loc:太古里"}]
+
+
+def test_non_list_argument_bypasses_the_cache(tools):
+    _, batch, calls = tools
+    batch("太古里")
+    batch("太古里")
+    assert len(calls) == 2
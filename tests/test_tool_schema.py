@@ -0,0 +1,87 @@
+"""tools/tool_schema.py：按工具描述转换参数类型，参数不对时给出提示"""
+
+import pytest
+
+from tools.tool_schema import ToolArgumentError, compile_validator
+
+SCHEMA = {
+    "name_for_model": "search_nearby_poi",
+    "parameters": [
+        {"name": "location", "description": "中心点坐标", "required": True, "schema": {"type": "string"}},
+        {"name": "radius", "description": "半径", "schema": {"type": "integer", "minimum": 1}},
+        {"name": "open_now", "description": "营业中", "schema": {"type": "boolean"}},
+        {"name": "score", "description": "评分", "schema": {"type": "number"}},
+        {"name": "types", "description": "分类", "schema": {"type": "array", "items": {"type": "string"}}},
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def validate():
+    return compile_validator(SCHEMA)
+
+
+@pytest.mark.parametrize(
+    "location",
+    [[104.08, 30.65], {"lng": 104.08, "lat": 30.65}, " 104.08,30.65 "],
+)
+def test_coordinates_are_coerced_to_text(validate, location):
+    assert validate({"location": location}) == {"location": "104.08,30.65"}
+
+
+def test_scalars_are_coerced(validate):
+    args = validate({"location": "1,2", "radius": "500", "open_now": "是", "score": "4.5"})
+    assert args == {"location": "1,2", "radius": 500, "open_now": True, "score": 4.5}
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["050000|070000", "050000、070000", '["050000", "070000"]', ("050000", "070000")],
+)
+def test_list_written_as_text_is_split(validate, value):
+    assert validate({"location": "1,2", "types": value})["types"] == ["050000", "070000"]
+
+
+def test_none_optional_is_dropped(validate):
+    assert validate({"location": "1,2", "radius": None}) == {"location": "1,2"}
+
+
+def test_unknown_parameter_suggests_the_closest_name(validate):
+    with pytest.raises(ToolArgumentError, match="未知参数 raduis（是否想用 radius）"):
+        validate({"location": "1,2", "raduis": 500})
+
+
+def test_all_problems_are_reported_together(validate):
+    with pytest.raises(ToolArgumentError) as info:
+        validate({"radius": "5.5", "open_now": "maybe"})
+    message = str(info.value)
+    assert "参数 radius 应为整数" in message
+    assert "参数 open_now 应为布尔值" in message
+    assert "缺少必填参数 location" in message
+    assert "可用参数（* 为必填）：location*, radius" in message
+
+
+def test_minimum_and_empty_required(validate):
+    with pytest.raises(ToolArgumentError) as info:
+        validate({"location": "  ", "radius": 0})
+    assert "不能小于 1" in str(info.value)
+    assert "必填参数 location 不能为空" in str(info.value)
+
+
+def test_plain_text_input_gets_a_format_hint(validate):
+    """解析器把纯文本兜底成 search_query 时，提示改用 JSON 并给出示例"""
+    with pytest.raises(ToolArgumentError) as info:
+        validate({"search_query": "春熙路附近的火锅"})
+    message = str(info.value)
+    assert "应为 JSON 对象" in message
+    assert '行动输入：{"location": "<字符串>"}' in message
+
+
+def test_search_query_is_accepted_when_the_tool_has_it():
+    validate = compile_validator(
+        {
+            "name_for_model": "google_search",
+            "parameters": [{"name": "search_query", "required": True, "schema": {"type": "string"}}],
+        }
+    )
+    assert validate({"search_query": "成都"}) == {"search_query": "成都"}
@@ -1,29 +1,72 @@
-import os
-import requests
-from dotenv import load_dotenv
+import config
+from utils.http_client import http_get, fanout_executor, AMAP_BASE_URL
+from utils.logger import get_logger
 
-load_dotenv()
-MY_KEY = os.getenv("GAODEDITY_API_KEY")
+logger = get_logger(__name__)
+MY_KEY = config.amap_key()
 
-geo_url = "https://restapi.amap.com/v3/geocode/geo"
-around_url = "https://restapi.amap.com/v5/place/around"
+geo_url = f"{AMAP_BASE_URL}/v3/geocode/geo"
+around_url = f"{AMAP_BASE_URL}/v5/place/around"
+# 高德批量地理编码一次最多 10 个地址
+BATCH_SIZE = 10
 
 
 def address_to_location(address: str):
     """将粗略地址转为经纬度"""
     params = {"key": MY_KEY, "address": address}
     try:
-        response = requests.get(geo_url, params=params)
+        response = http_get(geo_url, params=params)
         data = response.json()
         if data["status"] == "1" and int(data["count"]) > 0:
             # 返回第一个匹配项的经纬度 "121.50,31.24"
             return data["geocodes"][0]["location"]
         return None
     except Exception as e:
-        print(f"地理编码出错: {e}")
+        logger.warning(f"地理编码出错: {e}")
         return None
 
 
+def _geocode_chunk(addresses: list) -> list:
+    """一次 batch=true 请求解析最多 BATCH_SIZE 个地址，返回与输入对齐的经纬度（解析不到为 None）"""
+    params = {"key": MY_KEY, "address": "|".join(addresses), "batch": "true"}
+    try:
+        data = http_get(geo_url, params=params).json()
+    except Exception as e:
+        logger.warning(f"批量地理编码出错: {e}")
+        return [None] * len(addresses)
+    geocodes = data.get("geocodes") or []
+    if data.get("status") != "1" or len(geocodes) != len(addresses):
+        # 批量模式下每个地址对应一项，数量对不上时无法对齐，按全部失败处理
+        return [None] * len(addresses)
+    # 解析不到的地址，高德返回的 location 是空列表
+    return [
+        g.get("location") if isinstance(g.get("location"), str) and g.get("location") else None
+        for g in geocodes
+    ]
+
+
+def batch_address_to_location(addresses: list) -> list:
+    """
+    批量地理编码：按 BATCH_SIZE 个一组拆分，各组在 http_client 的 fanout_executor 里并发请求
+    （共用连接池和限速），
+    返回与 addresses 顺序一致的经纬度列表，解析不到的地址为 None。
+    重复的地址只请求一次；通过 ReactTools 调用时，已缓存的地址不会再请求（见 tool_cache.CACHE_POLICIES）。
+    """
+    addresses = [str(a).strip() for a in addresses]
+    unique = list(dict.fromkeys(a for a in addresses if a))
+    if not unique:
+        return [None] * len(addresses)
+    chunks = [unique[i : i + BATCH_SIZE] for i in range(0, len(unique), BATCH_SIZE)]
+    if len(chunks) == 1:
+        results = [_geocode_chunk(chunks[0])]
+    else:
+        results = list(fanout_executor.map(_geocode_chunk, chunks))
+    locations = {}
+    for chunk, result in zip(chunks, results):
+        locations.update(zip(chunk, result))
+    return [locations.get(a) for a in addresses]
+
+
 GEO_SCHEMA = {
     "name_for_human": "地理编码",
     "name_for_model": "address_to_location",
@@ -41,6 +84,23 @@ GEO_SCHEMA = {
     ],
 }
 
+BATCH_GEO_SCHEMA = {
+    "name_for_human": "批量地理编码",
+    "name_for_model": "batch_address_to_location",
+    "description_for_model": (
+        "一次把多个地址或地名转换为经纬度坐标，返回与输入顺序一致的经纬度列表，解析失败的地址对应 null。"
+        "行程里有多个地点需要坐标时（例如画地图、规划路线前），用这个工具一次查完，不要逐个调用 address_to_location。"
+    ),
+    "parameters": [
+        {
+            "name": "addresses",
+            "description": "地址列表，每一项越详细越准确。例如：['成都市锦江区春熙路', '成都市武侯区锦里']。",
+            "required": True,
+            "schema": {"type": "array", "items": {"type": "string"}},
+        }
+    ],
+}
+
 
 if __name__ == "__main__":
     test_address = "北京市朝阳区望京SOHO"
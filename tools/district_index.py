@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+import config
+from utils.http_client import http_get, AMAP_BASE_URL
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+MY_KEY = config.amap_key()
+
+# 行政区划快照文件，结构为紧凑的嵌套列表 [name, adcode, level, [children...]]
+SNAPSHOT_PATH = config.get_str(
+    "DISTRICT_SNAPSHOT_PATH", os.path.join(config.DATA_DIR, "districts.json")
+)
+# 没有快照时，是否自动从高德拉取一次完整的行政区划树（subdistrict=3）并保存
+AUTO_BUILD = config.get_bool("DISTRICT_INDEX_AUTO_BUILD", True)
+# 构建失败后多久再重试（秒），避免每次 rerun 都去请求一次大接口
+RETRY_INTERVAL = 10 * 60
+
+# 高德返回的名称常见后缀，去掉后作为别名，支持 "成都" -> "成都市" 这样的查询
+_NAME_SUFFIXES = (
+    "特别行政区",
+    "维吾尔自治区",
+    "壮族自治区",
+    "回族自治区",
+    "自治区",
+    "自治州",
+    "自治县",
+    "地区",
+    "省",
+    "市",
+    "区",
+    "县",
+    "盟",
+)
+
+
+class DistrictIndex:
+    """
+    全国行政区划的内存索引。
+
+    所有节点按层序（先省、再市、再区县）存放在几个平行列表里，
+    名称和 adcode 各有一个字典指向节点下标，查询下级只是一次字典查找。
+    """
+
+    def __init__(self):
+        self._names: list[str] = []
+        self._adcodes: list[str] = []
+        self._levels: list[str] = []
+        self._children: list[tuple[int, ...]] = []
+        self._by_name: dict[str, int] = {}
+        self._by_adcode: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @classmethod
+    def from_compact(cls, root: list) -> "DistrictIndex":
+        """从紧凑格式 [name, adcode, level, [children...]] 构建索引"""
+        index = cls()
+        # 层序遍历，保证同名时优先匹配层级更高的行政区（和高德的行为一致）
+        queue = deque([(root, -1)])
+        while queue:
+            node, parent = queue.popleft()
+            name, adcode, level, children = node
+            i = len(index._names)
+            index._names.append(name)
+            index._adcodes.append(adcode)
+            index._levels.append(level)
+            index._children.append(())
+            if parent >= 0:
+                index._children[parent] += (i,)
+            else:
+                # 根节点在高德里叫"中华人民共和国"，查询时通常写"中国"
+                index._by_name.setdefault("中国", i)
+            index._by_adcode.setdefault(adcode, i)
+            index._by_name.setdefault(name, i)
+            alias = _short_name(name)
+            if alias:
+                index._by_name.setdefault(alias, i)
+            for child in children:
+                queue.append((child, i))
+        return index
+
+    @classmethod
+    def from_snapshot(cls, path: str = SNAPSHOT_PATH) -> "DistrictIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_compact(json.load(f))
+
+    def lookup(self, keywords: str):
+        """按名称或 adcode 找节点下标，找不到返回 None"""
+        keywords = str(keywords).strip()
+        i = self._by_adcode.get(keywords)
+        if i is None:
+            i = self._by_name.get(keywords)
+        return i
+
+    def sub_districts(self, keywords: str):
+        """
+        返回直接下级行政区名称列表。
+        名称不在索引里时返回 None，由调用方回退到网络查询。
+        快照只到区县一级，区县的下级（街道）同样交给网络查询。
+        """
+        i = self.lookup(keywords)
+        if i is None:
+            return None
+        children = self._children[i]
+        if not children and self._levels[i] == "district":
+            return None
+        return [self._names[c] for c in children]
+
+
+def _short_name(name: str) -> str:
+    for suffix in _NAME_SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix) + 1:
+            return name[: -len(suffix)]
+    return ""
+
+
+def compact_tree(district: dict) -> list:
+    """把高德 v3/config/district 返回的节点转成紧凑格式"""
+    adcode = district.get("adcode")
+    return [
+        district.get("name"),
+        adcode if isinstance(adcode, str) else "",
+        district.get("level", ""),
+        [compact_tree(d) for d in district.get("districts", [])],
+    ]
+
+
+def fetch_compact_tree(api_key: str = MY_KEY) -> list:
+    """一次请求拉取全国 省/市/区县 三级行政区划"""
+    params = {
+        "key": api_key,
+        "keywords": "中国",
+        "subdistrict": 3,
+        "extensions": "base",
+    }
+    res = http_get(
+        f"{AMAP_BASE_URL}/v3/config/district", params=params, timeout=(3, 60)
+    ).json()
+    if res.get("status") != "1" or not res.get("districts"):
+        raise RuntimeError(f"拉取行政区划失败: {res.get('info')}")
+    return compact_tree(res["districts"][0])
+
+
+def save_snapshot(tree: list, path: str = SNAPSHOT_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(tree, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+_index = None
+_index_lock = threading.Lock()
+_build_thread = None
+_last_failure = 0.0
+
+
+def _build() -> None:
+    """后台线程：从高德拉取完整的行政区划树，保存快照后替换全局索引"""
+    global _index, _last_failure
+    try:
+        tree = fetch_compact_tree()
+        save_snapshot(tree)
+        _index = DistrictIndex.from_compact(tree)
+    except Exception as e:
+        logger.exception(f"构建行政区划索引出错: {e}")
+        _last_failure = time.monotonic()
+
+
+def warm_up():
+    """
+    提前准备索引：有快照时直接加载；没有快照且允许自动构建时，
+    在后台线程里拉取（subdistrict=3 的响应有几 MB），不阻塞调用方。
+    返回正在构建的线程，没有启动构建时返回 None。
+    """
+    global _index, _build_thread, _last_failure
+    with _index_lock:
+        if _index is not None:
+            return None
+        if _build_thread is not None and _build_thread.is_alive():
+            return _build_thread
+        if _last_failure and time.monotonic() - _last_failure < RETRY_INTERVAL:
+            return None
+        if os.path.exists(SNAPSHOT_PATH):
+            try:
+                _index = DistrictIndex.from_snapshot(SNAPSHOT_PATH)
+            except Exception as e:
+                logger.exception(f"加载行政区划快照出错: {e}")
+                _last_failure = time.monotonic()
+            return None
+        if not (AUTO_BUILD and MY_KEY):
+            _last_failure = time.monotonic()
+            return None
+        _build_thread = threading.Thread(
+            target=_build, name="district-index-build", daemon=True
+        )
+        _build_thread.start()
+        return _build_thread
+
+
+def get_district_index():
+    """
+    获取全局行政区划索引（首次调用时加载）。
+    优先读本地快照；没有快照时在后台构建，构建完成前返回 None，
+    调用方回退到网络查询。
+    """
+    if _index is None:
+        warm_up()
+    return _index
+
+
+if __name__ == "__main__":
+    # python -m tools.district_index            从高德拉取并生成快照
+    # python -m tools.district_index raw.json   把已下载的高德原始返回转成快照
+    import sys
+
+    start = time.perf_counter()
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            tree = compact_tree(json.load(f)["districts"][0])
+    else:
+        tree = fetch_compact_tree()
+    save_snapshot(tree)
+    index = DistrictIndex.from_compact(tree)
+    print(
+        f"已写入 {SNAPSHOT_PATH}，共 {len(index)} 个行政区，"
+        f"耗时 {time.perf_counter() - start:.2f}s"
+    )
+    print("四川省下级：", index.sub_districts("四川省"))
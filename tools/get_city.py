@@ -1,19 +1,16 @@
-import os
-import requests
+import config
+from utils.http_client import http_get, AMAP_BASE_URL
 
-from dotenv import load_dotenv
-
-load_dotenv()
-MY_KEY = os.getenv("GAODEDITY_API_KEY")
+MY_KEY = config.amap_key()
 
 
 def get_city(api_key=MY_KEY, **kwargs):
     # 接口地址更换为 v3/ip
-    url = f"https://restapi.amap.com/v3/ip?key={api_key}"
+    url = f"{AMAP_BASE_URL}/v3/ip"
 
     try:
         # 注意：这里没有传 ip 参数，高德会识别你的公网出口 IP
-        response = requests.get(url)
+        response = http_get(url, params={"key": api_key})
         result = response.json()
 
         if result.get("status") == "1":
@@ -56,7 +53,7 @@ CITY_SCHEMA = {
 
 # --- 执行部分 ---
 if __name__ == "__main__":
-    MY_KEY = os.getenv("GAODEDITY_API_KEY")  # <--- 请在此处填写你的 Key
+    MY_KEY = config.amap_key()  # <--- 请在 .env 中填写你的 Key
 
     print("正在扫描周边信号并请求定位信息...")
     location_info = get_city(MY_KEY)[0]["city"]
@@ -1,10 +1,10 @@
-import os
-import requests
-from dotenv import load_dotenv
+import config
+from utils.http_client import http_get, AMAP_BASE_URL
+from tools.district_index import get_district_index
+from utils.logger import get_logger
 
-load_dotenv()
-
-MY_KEY = os.getenv("GAODEDITY_API_KEY")
+logger = get_logger(__name__)
+MY_KEY = config.amap_key()
 
 
 def get_districts(keywords="成都市", subdistrict=1):
@@ -12,7 +12,14 @@ def get_districts(keywords="成都市", subdistrict=1):
     通用行政区域查询
     keywords: 城市名/adcode
     subdistrict: 期望返回的下级层级
+    优先从本地行政区划索引查询，名称不在索引里时才请求高德接口
     """
+    index = get_district_index()
+    if index is not None:
+        names = index.sub_districts(keywords)
+        if names is not None:
+            return names
+
     params = {
         "key": MY_KEY,
         "keywords": keywords,
@@ -20,21 +27,19 @@ def get_districts(keywords="成都市", subdistrict=1):
         "extensions": "base",
     }
     try:
-        res = requests.get(
-            "https://restapi.amap.com/v3/config/district", params=params
-        ).json()
+        res = http_get(f"{AMAP_BASE_URL}/v3/config/district", params=params).json()
         if res["status"] == "1" and res["districts"]:
             # 返回下级行政区的名称列表
             return [d["name"] for d in res["districts"][0].get("districts", [])]
         return []
     except Exception as e:
-        print(f"查询行政区出错: {e}")
+        logger.warning(f"查询行政区出错: {e}")
         return []
 
 
 DISTRICT_SCHEMA = {
     "name_for_human": "行政区划查询",
-    "name_for_model": "get_sub_districts",
+    "name_for_model": "get_districts",
     "description_for_model": (
         "用于查询中国某个行政区域（省、市、区）下属的次级行政区列表。"
         "当你需要引导用户精确选择位置，或者需要确认某个城市下有哪些区县时使用。"
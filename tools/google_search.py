@@ -1,17 +1,15 @@
 import json
-import os
-import requests
-from dotenv import load_dotenv
+import config
+from utils.http_client import http_post, SERPER_BASE_URL
 
 
 def google_search(search_query: str) -> str:
     """执行谷歌搜索并返回格式化的结果内容"""
-    url = "https://google.serper.dev/search"
-    load_dotenv()
+    url = f"{SERPER_BASE_URL}/search"
 
     # 1. 准备请求数据
     payload = json.dumps({"q": search_query})
-    api_key = os.getenv("SERPER_API_KEY")
+    api_key = config.get_str("SERPER_API_KEY")
     headers = {
         "X-API-KEY": api_key,
         "Content-Type": "application/json",
@@ -19,7 +17,7 @@ def google_search(search_query: str) -> str:
 
     try:
         # 2. 发送 POST 请求
-        response = requests.post(url, headers=headers, data=payload)
+        response = http_post(url, headers=headers, data=payload)
         response.raise_for_status()  # 检查请求是否成功
 
         # 3. 解析结果
@@ -1,24 +1,37 @@
-import os
 import urllib.parse
-from dotenv import load_dotenv
+import config
+from utils.http_client import AMAP_BASE_URL
 
-load_dotenv()
-MY_KEY = os.getenv("GAODEDITY_API_KEY")
 
-
-def map_position(locations: list, names: list, zoom: int = None, size: str = "700*400"):
+def map_position(
+    locations: list,
+    names: list,
+    zoom: int = None,
+    size: str = "700*400",
+    optimize_order: bool = False,
+):
     """
     生成高德静态地图 URL (修复 labels 格式错误 INVALID_PARAMS 20000)
+    optimize_order 为 True 时先用 route_optimizer 重排访问顺序（第一个地点作为固定起点）
+    URL 里不带 key：页面通过 static_map_cache 在服务端补上 key 下载图片，密钥不会进入模型上下文和浏览器
     """
-    # 1. 获取 Key
-    api_key = os.getenv("GAODEDITY_API_KEY")
-    if not api_key:
+    # 1. 检查 Key（下载图片时需要）
+    if not config.amap_key():
         return "错误：未检测到 GAODEDITY_API_KEY"
 
     if not locations or len(locations) < 1:
         return "错误：请提供至少一个坐标点"
 
-    base_url = "https://restapi.amap.com/v3/staticmap"
+    if optimize_order and len(locations) >= 3:
+        # route_optimizer 依赖 NumPy，用到时再导入
+        from tools.route_optimizer import optimize_route
+
+        route = optimize_route(locations, names if len(names) == len(locations) else None)
+        if isinstance(route, dict):
+            locations = route["locations"]
+            names = route["names"] or names
+
+    base_url = f"{AMAP_BASE_URL}/v3/staticmap"
 
     # --- 构造 Markers (红点气泡) ---
     marker_groups = []
@@ -55,7 +68,6 @@ def map_position(locations: list, names: list, zoom: int = None, size: str = "70
     # 使用 urllib.parse.quote 确保参数安全，但我们要手动拼接以防过度转义
     # 这里我们只对 values 做简单的字符串处理，不使用 urlencode 对整体编码，防止 : 被转义
     query_parts = [
-        f"key={api_key}",
         f"size={size}",
         f"markers={markers_str}",
         f"labels={labels_str}",
@@ -109,6 +121,12 @@ MAP_POSITION = {
             "required": False,
             "schema": {"type": "string", "default": "700*400"},
         },
+        {
+            "name": "optimize_order",
+            "description": "设为 true 时以第一个地点为起点，自动按最短路线重新排列其余地点后再画图。默认 false。",
+            "required": False,
+            "schema": {"type": "boolean", "default": False},
+        },
     ],
 }
 
@@ -1,11 +1,167 @@
-import os
-import requests
 import json
-from dotenv import load_dotenv
+import config
+from utils.http_client import http_get, fanout_executor, AMAP_BASE_URL
+from tools.poi_index import poi_index
+from utils.logger import tracer
 
-load_dotenv()
-MY_KEY = os.getenv("GAODEDITY_API_KEY")
+MY_KEY = config.amap_key()
 # API调用详解见：https://lbs.amap.com/api/webservice/guide/api-advanced/newpoisearch
+PAGE_SIZE = 10
+# 一次工具调用最多并发获取多少页（修改时同步 NEARBY_SEARCH_SCHEMA_ADVANCED 里 pages 的说明）
+MAX_PAGES = 5
+# 按偏好排序时至少取多少页作为候选
+RANKING_PAGES = 3
+
+
+class PoiSearchError(RuntimeError):
+    """高德接口返回失败（限流重试用完、Key 无效、配额用完等），不能当成“没有结果”"""
+
+
+def _fetch_page(params: dict, page: int) -> list:
+    """请求 v5/place/around 的一页，接口返回失败时抛出 PoiSearchError"""
+    response = http_get(
+        f"{AMAP_BASE_URL}/v5/place/around",
+        params={**params, "page_size": PAGE_SIZE, "page_num": page},
+    )
+    data = response.json()
+    if data.get("status") != "1":
+        raise PoiSearchError(
+            f"{data.get('info') or '未知错误'}（infocode {data.get('infocode')}）"
+        )
+    return data.get("pois") or []
+
+
+def iter_pois_around(params: dict, page: int = 1, pages: int = 1):
+    """
+    从第 page 页开始，在 http_client 的 fanout_executor 里并发请求 pages 页（共用连接池和限速），
+    按页序逐页 yield 新的 POI 列表：
+    - 按 POI id 去重，前面页出现过的不再返回；
+    - 某一页不满 PAGE_SIZE 说明后面没有了，立即停止并取消还没开始的请求；
+    - 按距离排序、不限定区划时先查本地的 POI 空间索引，命中就不再请求接口；
+      从第一页开始连续取到的结果会登记进索引。
+    调用方可以随时停止迭代，剩下的请求会被取消。
+    任何一页请求失败都抛出 PoiSearchError（已经 yield 的页不撤回，也不登记索引）。
+    """
+    page, pages = max(int(page), 1), min(max(int(pages), 1), MAX_PAGES)
+    indexable = params.get("sortrule") == "distance" and not params.get("region")
+    if indexable:
+        pois = poi_index.query(
+            params["location"],
+            params.get("keywords"),
+            params.get("types"),
+            params.get("radius"),
+            page=page,
+            page_size=PAGE_SIZE * pages,
+            fields=params.get("show_fields"),
+        )
+        if pois is not None:
+            tracer.current().set(poi_index="hit")
+            yield pois
+            return
+
+    if pages == 1:
+        futures = None
+        results = [_fetch_page(params, page)]
+    else:
+        futures = [
+            fanout_executor.submit(_fetch_page, params, number)
+            for number in range(page, page + pages)
+        ]
+        results = (future.result() for future in futures)
+
+    seen = set()
+    collected = []
+    complete = False
+    try:
+        for pois in results:
+            fresh = []
+            for poi in pois:
+                poi_id = poi.get("id")
+                if poi_id and poi_id in seen:
+                    continue
+                seen.add(poi_id)
+                fresh.append(poi)
+            collected.extend(fresh)
+            if fresh:
+                yield fresh
+            if len(pois) < PAGE_SIZE:
+                complete = True
+                break
+    finally:
+        if futures:
+            for future in futures:
+                future.cancel()
+    if indexable and page == 1:
+        poi_index.add(
+            params["location"],
+            params.get("keywords"),
+            params.get("types"),
+            params.get("radius"),
+            collected,
+            complete=complete,
+            fields=params.get("show_fields"),
+        )
+
+
+def _search_around(params: dict, page: int = 1, pages: int = 1) -> list:
+    """把 iter_pois_around 的结果合并成一个列表"""
+    return [poi for chunk in iter_pois_around(params, page, pages) for poi in chunk]
+
+
+def format_pois(pois: list) -> list:
+    """把高德返回的 POI 整理成简要信息"""
+    results = []
+    for poi in pois:
+        biz = poi.get("business", {})
+        results.append(
+            {
+                "名称": poi.get("name"),
+                "评分": biz.get("rating") or poi.get("rating"),
+                "费用": biz.get("cost") or poi.get("cost"),
+                "距离": f"{poi.get('distance')}m",
+                "地址": poi.get("address"),
+                "状态": biz.get("opentime_today", "未知"),
+            }
+        )
+    return results
+
+
+def format_pois_advanced(pois: list) -> list:
+    """把高德返回的 POI 整理成包含商业信息的定制化结构"""
+    custom_results = []
+    for poi in pois:
+        # 提取商业信息
+        biz = poi.get("business", {})
+        # 提取图片（取第一张作为封面）
+        photos = poi.get("photos", [])
+        cover_image = photos[0].get("url") if photos else None
+        # v5 接口把评分和人均放在 business 里
+        rating = biz.get("rating") or poi.get("rating")
+        cost = biz.get("cost") or poi.get("cost")
+
+        # 构造高度定制化的数据结构
+        info = {
+            "基本信息": {
+                "名称": poi.get("name"),
+                "类型": poi.get("type"),
+                "距离": f"{poi.get('distance')}米",
+                "评分": rating or "暂无评分",
+                "人均消费": (f"{cost}元" if cost else "未知"),
+            },
+            "运营状态": {
+                "今日营业时间": biz.get("opentime_today", "未知"),
+                "商圈": biz.get("business_area", "未知"),
+                "特色标签": poi.get("tag", "无"),
+            },
+            "位置详情": {
+                "详细地址": poi.get("address"),
+                "停车场": poi.get("parking_type", "暂无数据"),
+                "经纬度": poi.get("location"),
+            },
+            "图片链接": cover_image,
+        }
+        custom_results.append(info)
+    return custom_results
 
 
 def nearby_search(location, keywords="", types="050000", **kwargs):
@@ -23,101 +179,77 @@ def nearby_search(location, keywords="", types="050000", **kwargs):
         "region": kwargs.get("region"),
         "radius": kwargs.get("radius", 3000),
         "show_fields": "cost,rating,business,tag",
-        "page_size": 10,
     }
 
     # 过滤掉 None 值
     params = {k: v for k, v in params.items() if v is not None}
 
-    url = "https://restapi.amap.com/v5/place/around"
-
     try:
-        response = requests.get(url, params=params)
-        data = response.json()
-
-        if data["status"] == "1" and int(data["count"]) > 0:
-            results = []
-            for poi in data["pois"]:
-                biz = poi.get("business", {})
-                results.append(
-                    {
-                        "名称": poi.get("name"),
-                        "评分": poi.get("rating"),
-                        "费用": poi.get("cost"),
-                        "距离": f"{poi.get('distance')}m",
-                        "地址": poi.get("address"),
-                        "状态": biz.get("opentime_today", "未知"),
-                    }
-                )
-            return results
+        pois = _search_around(params)
+        if pois:
+            return format_pois(pois)
         return "在该范围内未找到匹配的结果。"
+    except PoiSearchError as e:
+        return f"接口请求失败: {e}"
     except Exception as e:
         return f"接口调用失败: {e}"
 
 
-def nearby_search_advanced(
-    location, keywords="", types="050000", radius=2000, sortrule="distance", page=1
-):
-    """
-    定制化周边搜索：最大化获取商业信息
-    """
-    url = "https://restapi.amap.com/v5/place/around"
-
+def _advanced_params(location, keywords, types, radius, sortrule) -> dict:
     # 核心：通过 show_fields 指定需要返回的详细字段
     # 开启：cost(人均), rating(评分), business(营业时间/商圈), photos(图片), navi(出入口)
     show_fields = "cost,rating,business,photos,tag,navi,parking_type"
 
-    params = {
+    return {
         "key": MY_KEY,
         "location": location,
         "keywords": keywords,
         "types": types,
         "radius": radius,
         "sortrule": sortrule,
-        "page_size": 10,
-        "page_num": page,
         "show_fields": show_fields,
     }
 
+
+def nearby_search_advanced(
+    location,
+    keywords="",
+    types="050000",
+    radius=2000,
+    sortrule="distance",
+    page=1,
+    pages=1,
+    preferences=None,
+    top_k=5,
+):
+    """
+    定制化周边搜索：最大化获取商业信息
+    pages > 1 时从第 page 页开始并发获取多页，按 POI id 去重后合并返回
+    preferences 不为空时（如 "cheap,open_now"）在本地按偏好打分，只返回排好序的前 top_k 个，
+    候选至少取 RANKING_PAGES 页
+    """
+    params = _advanced_params(location, keywords, types, radius, sortrule)
+
     try:
-        response = requests.get(url, params=params)
-        data = response.json()
-
-        if data["status"] == "1" and int(data["count"]) > 0:
-            custom_results = []
-            for poi in data["pois"]:
-                # 提取商业信息
-                biz = poi.get("business", {})
-                # 提取图片（取第一张作为封面）
-                photos = poi.get("photos", [])
-                cover_image = photos[0].get("url") if photos else None
-
-                # 构造高度定制化的数据结构
-                info = {
-                    "基本信息": {
-                        "名称": poi.get("name"),
-                        "类型": poi.get("type"),
-                        "距离": f"{poi.get('distance')}米",
-                        "评分": poi.get("rating", "暂无评分"),
-                        "人均消费": (
-                            f"{poi.get('cost')}元" if poi.get("cost") else "未知"
-                        ),
-                    },
-                    "运营状态": {
-                        "今日营业时间": biz.get("opentime_today", "未知"),
-                        "商圈": biz.get("business_area", "未知"),
-                        "特色标签": poi.get("tag", "无"),
-                    },
-                    "位置详情": {
-                        "详细地址": poi.get("address"),
-                        "停车场": poi.get("parking_type", "暂无数据"),
-                        "经纬度": poi.get("location"),
-                    },
-                    "图片链接": cover_image,
-                }
-                custom_results.append(info)
-            return custom_results
-        return "搜索成功，但范围内没有匹配的结果。"
+        if preferences:
+            pages = max(int(pages), RANKING_PAGES)
+        pois = _search_around(params, page, pages)
+        if not pois:
+            return "搜索成功，但范围内没有匹配的结果。"
+        if not preferences:
+            return format_pois_advanced(pois)
+        # poi_ranking 依赖 NumPy，用到时再导入
+        from tools.poi_ranking import rank_pois
+
+        ranked = rank_pois(pois, preferences, top_k)
+        if not ranked:
+            return "搜索成功，但范围内没有符合偏好的结果（可能都已打烊）。"
+        results = format_pois_advanced([poi for poi, _, _ in ranked])
+        for rank, (info, (_, score, reasons)) in enumerate(zip(results, ranked), 1):
+            info["推荐"] = {"排名": rank, "得分": score, "理由": reasons}
+        return results
+    except PoiSearchError as e:
+        return f"接口请求失败: {e}"
     except Exception as e:
         return f"接口请求异常: {str(e)}"
 
@@ -213,6 +345,38 @@ NEARBY_SEARCH_SCHEMA_ADVANCED = {
             "required": False,
             "schema": {"type": "string", "default": "distance"},
         },
+        {
+            "name": "page",
+            "description": "从第几页开始获取（从1开始），默认1。",
+            "required": False,
+            "schema": {"type": "integer", "minimum": 1, "default": 1},
+        },
+        {
+            "name": "pages",
+            "description": (
+                "一次获取的页数（每页10条，最多5页），默认1。"
+                "需要更多候选时一次取多页，不要反复翻页调用。"
+            ),
+            "required": False,
+            "schema": {"type": "integer", "default": 1},
+        },
+        {
+            "name": "preferences",
+            "description": (
+                "可选的用户偏好，多个用逗号分隔：cheap(便宜)、open_now(正在营业)、"
+                "short_walk(离得近)、top_rated(评分高)、balanced(综合)。"
+                "提供后工具会在本地按偏好打分，直接返回排好序的前 top_k 个结果及推荐理由，"
+                "你只需要解释推荐，不要再自己排序。"
+            ),
+            "required": False,
+            "schema": {"type": "string"},
+        },
+        {
+            "name": "top_k",
+            "description": "提供 preferences 时返回前几个结果，默认5。",
+            "required": False,
+            "schema": {"type": "integer", "default": 5},
+        },
     ],
 }
 
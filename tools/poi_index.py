@@ -0,0 +1,327 @@
+import copy
+import math
+import threading
+import time
+from collections import OrderedDict
+import config
+
+# 网格大小（度），0.01° 约 1 公里；覆盖记录按它覆盖到的网格登记
+CELL_DEG = config.get_float("POI_INDEX_CELL_DEG", 0.01)
+# 覆盖记录的有效期（秒），和 tool_cache 里周边搜索的缓存时间一致
+TTL = config.get_int("POI_INDEX_TTL", 5 * 60)
+# 内存上限：最多保存多少条覆盖记录、多少个 POI
+MAX_COVERAGES = config.get_int("POI_INDEX_MAX_COVERAGES", 2000)
+MAX_POIS = config.get_int("POI_INDEX_MAX_POIS", 20000)
+
+EARTH_RADIUS = 6371000.0
+
+
+def parse_location(location: str):
+    """'经度,纬度' -> (lng, lat)，格式不对返回 None"""
+    try:
+        lng, lat = str(location).split(",")
+        return float(lng), float(lat)
+    except (TypeError, ValueError):
+        return None
+
+
+def haversine(lng1: float, lat1: float, lng2: float, lat2: float) -> float:
+    """两点间的球面距离（米）"""
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def _type_prefixes(types: str) -> tuple:
+    """
+    分类码去掉末尾的 "00" 作为前缀：050000 -> "05"，050100 -> "0501"。
+    大类的前缀是小类前缀的前缀，用来判断分类是否被覆盖以及过滤 POI 的 typecode。
+    """
+    prefixes = []
+    for code in str(types or "").split("|"):
+        code = code.strip()
+        while code.endswith("00"):
+            code = code[:-2]
+        prefixes.append(code)
+    return tuple(sorted(prefixes))
+
+
+def _field_set(fields: str) -> frozenset:
+    return frozenset(f.strip() for f in str(fields or "").split(",") if f.strip())
+
+
+class _Coverage:
+    """一次周边搜索覆盖到的范围：在这个圆内、这组分类和关键词下的 POI 都已经拿到了"""
+
+    __slots__ = (
+        "lng", "lat", "radius", "types", "keywords", "fields", "expires", "poi_ids", "cells"
+    )
+
+    def __init__(self, lng, lat, radius, types, keywords, fields, expires, poi_ids, cells):
+        self.lng = lng
+        self.lat = lat
+        self.radius = radius
+        self.types = types
+        self.keywords = keywords
+        self.fields = fields
+        self.expires = expires
+        self.poi_ids = poi_ids
+        self.cells = cells
+
+
+class POIIndex:
+    """
+    已获取 POI 的运行时空间索引，用来在本地回答落在之前搜索范围内的周边查询。
+
+    - 每次按距离排序的周边搜索登记一条覆盖记录（中心、半径、分类、关键词）。
+      如果结果不满一页，整个搜索圆都算覆盖；满页时只覆盖到最远那个 POI 的距离。
+    - 覆盖记录按经纬度网格登记，查询时只检查查询中心所在网格里的记录。
+    - 新查询的圆完全落在某条记录的圆内、分类被包含、关键词相同时，
+      直接用记录里的 POI 按距离过滤、排序、分页返回。
+    - 覆盖记录按 TTL 过期，超过数量上限时淘汰最早的记录，POI 按引用计数随之释放。
+    """
+
+    def __init__(
+        self,
+        ttl: int = TTL,
+        max_coverages: int = MAX_COVERAGES,
+        max_pois: int = MAX_POIS,
+        cell_deg: float = CELL_DEG,
+    ):
+        self.ttl = ttl
+        self.max_coverages = max_coverages
+        self.max_pois = max_pois
+        self.cell_deg = cell_deg
+        self._lock = threading.Lock()
+        self._coverages: OrderedDict[int, _Coverage] = OrderedDict()
+        self._grid: dict[tuple, set] = {}
+        # poi id -> [poi, lng, lat, 引用计数]
+        self._pois: dict[str, list] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _cell(self, lng: float, lat: float) -> tuple:
+        return (math.floor(lng / self.cell_deg), math.floor(lat / self.cell_deg))
+
+    def _cells_for(self, lng: float, lat: float, radius: float) -> list:
+        """圆的外接矩形覆盖到的网格"""
+        dlat = math.degrees(radius / EARTH_RADIUS)
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        x0, y0 = self._cell(lng - dlng, lat - dlat)
+        x1, y1 = self._cell(lng + dlng, lat + dlat)
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def add(
+        self,
+        location: str,
+        keywords: str,
+        types: str,
+        radius: int,
+        pois: list,
+        complete: bool,
+        fields: str = "",
+    ) -> None:
+        """
+        登记一次按距离排序、从第一页开始连续获取的搜索结果。
+        complete 表示范围内的结果已经全部取到（最后一页不满）；
+        fields 是请求时的 show_fields，之后只回答字段不超出它的查询。
+        """
+        center = parse_location(location)
+        if center is None:
+            return
+        try:
+            radius = float(radius)
+        except (TypeError, ValueError):
+            return
+        entries = []
+        for poi in pois:
+            point = parse_location(poi.get("location"))
+            if point is None or not poi.get("id"):
+                # 缺少坐标或 id 的 POI 没法在本地过滤，这次结果不登记
+                return
+            entries.append((poi["id"], poi, point))
+
+        lng, lat = center
+        if complete:
+            covered = radius
+        elif entries:
+            # 满页：只能确定最远那个 POI 以内的都拿到了
+            covered = max(haversine(lng, lat, *point) for _, _, point in entries)
+        else:
+            return
+        if covered <= 0:
+            return
+
+        cells = self._cells_for(lng, lat, covered)
+        with self._lock:
+            for poi_id, poi, point in entries:
+                record = self._pois.get(poi_id)
+                if record is None:
+                    self._pois[poi_id] = [copy.deepcopy(poi), point[0], point[1], 1]
+                else:
+                    # 新数据更"新鲜"（营业状态、评分），覆盖旧的
+                    record[0] = copy.deepcopy(poi)
+                    record[3] += 1
+            coverage_id = self._next_id
+            self._next_id += 1
+            self._coverages[coverage_id] = _Coverage(
+                lng,
+                lat,
+                covered,
+                _type_prefixes(types),
+                (keywords or "").strip(),
+                _field_set(fields),
+                time.monotonic() + self.ttl,
+                [poi_id for poi_id, _, _ in entries],
+                cells,
+            )
+            for cell in cells:
+                self._grid.setdefault(cell, set()).add(coverage_id)
+            self._evict()
+
+    def query(
+        self,
+        location: str,
+        keywords: str,
+        types: str,
+        radius: int,
+        page: int = 1,
+        page_size: int = 10,
+        fields: str = "",
+    ):
+        """
+        用本地数据回答一次按距离排序的周边搜索，返回这一页的 POI 列表（distance 已按新中心重算）；
+        没有能完全覆盖这次查询的记录时返回 None。
+        """
+        center = parse_location(location)
+        if center is None:
+            return None
+        try:
+            radius = float(radius)
+        except (TypeError, ValueError):
+            return None
+        lng, lat = center
+        prefixes = _type_prefixes(types)
+        keywords = (keywords or "").strip()
+        wanted_fields = _field_set(fields)
+        now = time.monotonic()
+        with self._lock:
+            coverage = None
+            for coverage_id in list(self._grid.get(self._cell(lng, lat), ())):
+                candidate = self._coverages.get(coverage_id)
+                if candidate is None:
+                    continue
+                if candidate.expires <= now:
+                    self._remove(coverage_id)
+                    continue
+                if (
+                    candidate.keywords != keywords
+                    or not wanted_fields <= candidate.fields
+                    or not self._types_covered(prefixes, candidate.types)
+                ):
+                    continue
+                offset = haversine(lng, lat, candidate.lng, candidate.lat)
+                if offset + radius <= candidate.radius:
+                    coverage = candidate
+                    break
+            found = self._collect(coverage, lng, lat, radius, prefixes)
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        found.sort(key=lambda item: (item[0], item[1]))
+        start = (max(int(page), 1) - 1) * page_size
+        results = []
+        for distance, _, poi in found[start : start + page_size]:
+            poi = copy.deepcopy(poi)
+            poi["distance"] = str(int(round(distance)))
+            results.append(poi)
+        return results
+
+    def _collect(self, coverage, lng: float, lat: float, radius: float, prefixes: tuple):
+        """覆盖记录里落在查询圆内、属于查询分类的 POI；没有可用记录或无法判断分类时返回 None"""
+        if coverage is None:
+            return None
+        found = []
+        for poi_id in coverage.poi_ids:
+            poi, plng, plat, _ = self._pois[poi_id]
+            distance = haversine(lng, lat, plng, plat)
+            if distance > radius:
+                continue
+            matched = self._type_matches(poi, prefixes, coverage.types)
+            if matched is None:
+                # 需要按小类过滤但 POI 没有 typecode，本地回答不了
+                return None
+            if matched:
+                found.append((distance, poi_id, poi))
+        return found
+
+    @staticmethod
+    def _types_covered(wanted: tuple, covered: tuple) -> bool:
+        """查询的每个分类都属于记录里的某个分类"""
+        return all(any(w.startswith(c) for c in covered) for w in wanted)
+
+    @staticmethod
+    def _type_matches(poi: dict, wanted: tuple, covered: tuple):
+        """POI 是否属于查询的分类；需要按 typecode 过滤而 POI 没有 typecode 时返回 None"""
+        if wanted == covered:
+            return True
+        typecode = str(poi.get("typecode") or "")
+        if not typecode:
+            return None
+        # 多个分类码时高德用 | 分隔
+        return any(code.startswith(w) for code in typecode.split("|") for w in wanted)
+
+    def _remove(self, coverage_id: int) -> None:
+        coverage = self._coverages.pop(coverage_id)
+        for cell in coverage.cells:
+            ids = self._grid.get(cell)
+            if ids is not None:
+                ids.discard(coverage_id)
+                if not ids:
+                    del self._grid[cell]
+        for poi_id in coverage.poi_ids:
+            record = self._pois[poi_id]
+            record[3] -= 1
+            if record[3] <= 0:
+                del self._pois[poi_id]
+
+    def _evict(self) -> None:
+        # TTL 相同，插入顺序就是过期顺序，只需要从最早的记录开始检查
+        now = time.monotonic()
+        while self._coverages:
+            coverage_id, coverage = next(iter(self._coverages.items()))
+            if coverage.expires > now:
+                break
+            self._remove(coverage_id)
+        while self._coverages and (
+            len(self._coverages) > self.max_coverages or len(self._pois) > self.max_pois
+        ):
+            self._remove(next(iter(self._coverages)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._coverages.clear()
+            self._grid.clear()
+            self._pois.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "coverages": len(self._coverages),
+                "pois": len(self._pois),
+                "cells": len(self._grid),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 进程内共享的 POI 索引
+poi_index = POIIndex()
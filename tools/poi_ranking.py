@@ -0,0 +1,171 @@
+import re
+import time
+import numpy as np
+
+# 偏好档案：各项特征的权重。特征都归一化到 0~1，越大越好
+#   rating: 评分  cost: 便宜程度  distance: 近  open: 正在营业
+PROFILES = {
+    "balanced": {"rating": 0.4, "cost": 0.2, "distance": 0.3, "open": 0.1},
+    "cheap": {"rating": 0.15, "cost": 0.65, "distance": 0.1, "open": 0.1},
+    "open_now": {"rating": 0.2, "cost": 0.05, "distance": 0.15, "open": 0.6},
+    "short_walk": {"rating": 0.15, "cost": 0.05, "distance": 0.7, "open": 0.1},
+    "top_rated": {"rating": 0.75, "cost": 0.05, "distance": 0.1, "open": 0.1},
+}
+# 模型可能用中文描述偏好
+PROFILE_ALIASES = {
+    "便宜": "cheap",
+    "性价比": "cheap",
+    "正在营业": "open_now",
+    "营业中": "open_now",
+    "近": "short_walk",
+    "步行": "short_walk",
+    "离得近": "short_walk",
+    "评分高": "top_rated",
+    "好评": "top_rated",
+    "综合": "balanced",
+}
+FEATURES = ("rating", "cost", "distance", "open")
+
+_TIME_RANGE = re.compile(r"(\d{1,2}):(\d{2})\s*[-~至到]\s*(次日)?\s*(\d{1,2}):(\d{2})")
+
+
+def parse_opening_hours(text: str) -> list:
+    """
+    解析高德的 opentime_today，返回 [(开始分钟, 结束分钟), ...]。
+    支持 "10:00-22:00"、"09:00-14:00,17:00-21:00"、跨夜的 "18:00-次日02:00" / "18:00-02:00"，
+    以及 "24小时营业"。无法解析时返回空列表。
+    """
+    if not text:
+        return []
+    text = str(text)
+    if "24小时" in text:
+        return [(0, 24 * 60)]
+    intervals = []
+    for h1, m1, next_day, h2, m2 in _TIME_RANGE.findall(text):
+        start = int(h1) * 60 + int(m1)
+        end = int(h2) * 60 + int(m2)
+        if next_day or end <= start:
+            end += 24 * 60
+        intervals.append((start, end))
+    return intervals
+
+
+def is_open(intervals: list, minute: int) -> float:
+    """现在是否营业：1 营业、0 打烊、nan 未知（没有营业时间）"""
+    if not intervals:
+        return np.nan
+    for start, end in intervals:
+        # 跨夜的时段在第二天凌晨同样算营业
+        if start <= minute < end or start <= minute + 24 * 60 < end:
+            return 1.0
+    return 0.0
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def to_columns(pois: list, now: float = None) -> dict:
+    """把 POI 列表转成按列存放的数组（缺失值为 nan）"""
+    local = time.localtime(now)
+    minute = local.tm_hour * 60 + local.tm_min
+    n = len(pois)
+    rating = np.empty(n)
+    cost = np.empty(n)
+    distance = np.empty(n)
+    open_now = np.empty(n)
+    for i, poi in enumerate(pois):
+        biz = poi.get("business") or {}
+        # v5 接口把评分和人均放在 business 里，旧字段在顶层
+        rating[i] = _number(biz.get("rating") or poi.get("rating"))
+        cost[i] = _number(biz.get("cost") or poi.get("cost"))
+        distance[i] = _number(poi.get("distance"))
+        open_now[i] = is_open(parse_opening_hours(biz.get("opentime_today")), minute)
+    return {"rating": rating, "cost": cost, "distance": distance, "open": open_now}
+
+
+def _fill(values: np.ndarray, default: float) -> np.ndarray:
+    """缺失值用这一列的中位数填充，整列缺失时用 default"""
+    present = ~np.isnan(values)
+    fill = np.median(values[present]) if present.any() else default
+    return np.where(present, values, fill)
+
+
+def _inverse_minmax(values: np.ndarray) -> np.ndarray:
+    """越小越好的列归一化到 0~1（最小值得 1 分）"""
+    low, high = values.min(), values.max()
+    if high - low < 1e-9:
+        return np.ones_like(values)
+    return (high - values) / (high - low)
+
+
+def feature_matrix(columns: dict) -> np.ndarray:
+    """各项特征归一化到 0~1，返回 (n, 4) 的矩阵，列顺序见 FEATURES"""
+    rating = np.clip((_fill(columns["rating"], 3.5) - 3.0) / 2.0, 0.0, 1.0)
+    cost = _inverse_minmax(_fill(columns["cost"], 0.0))
+    distance = _inverse_minmax(_fill(columns["distance"], 0.0))
+    # 营业时间未知的算一半
+    open_now = np.where(np.isnan(columns["open"]), 0.5, columns["open"])
+    return np.column_stack([rating, cost, distance, open_now])
+
+
+def profile_weights(preferences) -> np.ndarray:
+    """把偏好（如 "cheap,open_now" 或列表）合成一个权重向量，未知的偏好忽略"""
+    if isinstance(preferences, str):
+        preferences = re.split(r"[,，、|\s]+", preferences)
+    names = []
+    for item in preferences or []:
+        item = str(item).strip()
+        name = PROFILE_ALIASES.get(item, item.lower())
+        if name in PROFILES:
+            names.append(name)
+    if not names:
+        names = ["balanced"]
+    weights = np.zeros(len(FEATURES))
+    for name in names:
+        weights += [PROFILES[name][feature] for feature in FEATURES]
+    return weights / weights.sum()
+
+
+def rank_pois(pois: list, preferences="balanced", top_k: int = 5, now: float = None) -> list:
+    """
+    按偏好给 POI 打分排序，返回前 top_k 个 (poi, 得分, 理由列表)。
+    同分时距离近的在前，结果是确定的。偏好里有 open_now 时排除已经打烊的店。
+    """
+    if not pois:
+        return []
+    columns = to_columns(pois, now)
+    features = feature_matrix(columns)
+    weights = profile_weights(preferences)
+    scores = features @ weights
+
+    candidates = np.arange(len(pois))
+    wants_open = "open_now" in str(preferences) or "营业" in str(preferences)
+    if wants_open:
+        candidates = candidates[columns["open"][candidates] != 0.0]
+    distance = np.nan_to_num(columns["distance"], nan=np.inf)
+    # lexsort 最后一个键优先：先按得分降序，再按距离升序
+    order = candidates[np.lexsort((distance[candidates], -scores[candidates]))]
+
+    results = []
+    for i in order[: max(int(top_k), 1)]:
+        results.append((pois[i], round(float(scores[i]) * 100, 1), _reasons(columns, features, i)))
+    return results
+
+
+def _reasons(columns: dict, features: np.ndarray, i: int) -> list:
+    reasons = []
+    if not np.isnan(columns["rating"][i]) and features[i, 0] >= 0.8:
+        reasons.append(f"评分{columns['rating'][i]:g}")
+    if not np.isnan(columns["cost"][i]) and features[i, 1] >= 0.7:
+        reasons.append(f"人均{columns['cost'][i]:g}元较便宜")
+    if not np.isnan(columns["distance"][i]) and features[i, 2] >= 0.7:
+        reasons.append(f"距离{columns['distance'][i]:g}米较近")
+    if columns["open"][i] == 1.0:
+        reasons.append("正在营业")
+    elif columns["open"][i] == 0.0:
+        reasons.append("现在已打烊")
+    return reasons
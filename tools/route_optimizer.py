@@ -0,0 +1,204 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+from tools.poi_index import EARTH_RADIUS, parse_location
+
+# 2-opt 最多扫描多少轮，几百个点通常十几轮内收敛
+MAX_2OPT_PASSES = 50
+_EPS = 1e-6
+
+
+def distance_matrix(coords: np.ndarray) -> np.ndarray:
+    """coords 为 (n, 2) 的 [经度, 纬度]，返回 (n, n) 的球面距离矩阵（米）"""
+    rad = np.radians(coords)
+    lng = rad[:, 0]
+    lat = rad[:, 1]
+    dlng = lng[:, None] - lng[None, :]
+    dlat = lat[:, None] - lat[None, :]
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def path_length(dist: np.ndarray, order) -> float:
+    order = np.asarray(order)
+    return float(dist[order[:-1], order[1:]].sum()) if len(order) > 1 else 0.0
+
+
+def _nearest_neighbour(dist: np.ndarray, start: int, end: int = None) -> np.ndarray:
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    order = np.empty(n, dtype=np.intp)
+    order[0] = start
+    visited[start] = True
+    if end is not None:
+        # 终点留到最后
+        visited[end] = True
+        order[-1] = end
+    last = n - 1 if end is not None else n
+    current = start
+    for k in range(1, last):
+        row = np.where(visited, np.inf, dist[current])
+        current = int(row.argmin())
+        order[k] = current
+        visited[current] = True
+    return order
+
+
+def _two_opt(dist: np.ndarray, order: np.ndarray, fixed_start: bool, fixed_end: bool) -> np.ndarray:
+    """
+    开放路径上的 2-opt：反转 order[i..j] 能缩短总距离就反转。
+    对每个 i 用向量化一次算出所有 j 的收益，取最好的那个。
+    起点/终点固定时对应的端点不参与反转。
+    """
+    n = len(order)
+    # 在距离矩阵末尾加一个到所有点距离都是 0 的"虚拟点"，表示路径端点之外没有边
+    ext = np.zeros((n + 1, n + 1))
+    ext[:n, :n] = dist
+    path = np.append(order, n)
+    i_lo = 1 if fixed_start else 0
+    j_hi = n - 2 if fixed_end else n - 1
+    for _ in range(MAX_2OPT_PASSES):
+        improved = False
+        for i in range(i_lo, j_hi):
+            a = path[i - 1] if i > 0 else n
+            b = path[i]
+            js = np.arange(i + 1, j_hi + 1)
+            c = path[js]
+            d = path[js + 1]
+            delta = ext[a, c] + ext[b, d] - ext[a, b] - ext[c, d]
+            k = int(delta.argmin())
+            if delta[k] < -_EPS:
+                j = js[k]
+                path[i : j + 1] = path[i : j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return path[:n]
+
+
+def solve_order(
+    coords: np.ndarray, start: int = None, end: int = None
+) -> tuple[list, np.ndarray]:
+    """
+    求一条较短的访问顺序（最近邻构造 + 2-opt 优化）。
+    start / end 为固定起点、终点的下标，None 表示不固定。
+    返回 (顺序下标列表, 距离矩阵)。
+    """
+    n = len(coords)
+    dist = distance_matrix(coords)
+    if n <= 2:
+        order = list(range(n))
+        if n == 2 and (start == 1 or end == 0):
+            order.reverse()
+        return order, dist
+    if start is None:
+        # 不固定起点时从离中心最远的点出发，通常是路线的一端
+        centroid = coords.mean(axis=0, keepdims=True)
+        far = distance_matrix(np.vstack([centroid, coords]))[0, 1:]
+        if end is not None:
+            far[end] = -1
+        first = int(far.argmax())
+    else:
+        first = start
+    order = _nearest_neighbour(dist, first, end)
+    order = _two_opt(dist, order, start is not None, end is not None)
+    return order.tolist(), dist
+
+
+def optimize_route(
+    locations: list,
+    names: list = None,
+    fixed_start: bool = True,
+    fixed_end: bool = False,
+):
+    """
+    优化多个地点的访问顺序，使总步行/行车直线距离尽量短。
+    fixed_start: 第一个地点作为固定起点（如酒店）；fixed_end: 最后一个地点作为固定终点。
+    """
+    if not locations:
+        return "错误：请提供至少一个坐标点"
+    coords = []
+    for loc in locations:
+        point = parse_location(str(loc).strip())
+        if point is None:
+            return f"错误：坐标格式不正确: {loc}，应为 '经度,纬度'"
+        coords.append(point)
+    names = list(names or [])
+    if names and len(names) != len(locations):
+        return "错误：names 与 locations 的数量不一致"
+
+    n = len(coords)
+    order, dist = solve_order(
+        np.array(coords, dtype=float),
+        start=0 if fixed_start else None,
+        end=n - 1 if fixed_end and n > 1 else None,
+    )
+    return {
+        "顺序": order,
+        "locations": [locations[i] for i in order],
+        "names": [names[i] for i in order] if names else [],
+        "优化后总距离(米)": round(path_length(dist, order)),
+        "原顺序总距离(米)": round(path_length(dist, range(n))),
+    }
+
+
+ROUTE_OPTIMIZER_SCHEMA = {
+    "name_for_human": "行程顺序优化",
+    "name_for_model": "optimize_route",
+    "description_for_model": (
+        "给定多个地点坐标，自动计算总距离最短的访问顺序（可固定起点/终点），"
+        "返回重新排序后的 locations 和 names，可以直接传给 map_position。"
+        "规划多个地点的游览或探店路线时使用，不要自己推算顺序。"
+    ),
+    "parameters": [
+        {
+            "name": "locations",
+            "description": "经纬度坐标列表，格式为 '经度,纬度'。",
+            "required": True,
+            "schema": {"type": "array", "items": {"type": "string"}},
+        },
+        {
+            "name": "names",
+            "description": "与 locations 一一对应的地点名称列表。",
+            "required": False,
+            "schema": {"type": "array", "items": {"type": "string"}},
+        },
+        {
+            "name": "fixed_start",
+            "description": "是否把第一个地点作为固定起点（如酒店、当前位置），默认 true。",
+            "required": False,
+            "schema": {"type": "boolean", "default": True},
+        },
+        {
+            "name": "fixed_end",
+            "description": "是否把最后一个地点作为固定终点，默认 false。",
+            "required": False,
+            "schema": {"type": "boolean", "default": False},
+        },
+    ],
+}
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    for n in (10, 100, 300):
+        pts = np.column_stack(
+            [104.0 + rng.random(n) * 0.2, 30.6 + rng.random(n) * 0.2]
+        )
+        locs = [f"{lng:.6f},{lat:.6f}" for lng, lat in pts]
+        start = time.perf_counter()
+        result = optimize_route(locs)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(
+            f"{n} 个点: {elapsed:.1f} ms，"
+            f"{result['原顺序总距离(米)']} -> {result['优化后总距离(米)']} 米"
+        )
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+import urllib.parse
+import config
+from utils.disk_lru import DiskLRU
+from utils.http_client import http_get, AMAP_BASE_URL
+from utils.logger import get_logger
+from utils.singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+# 静态地图图片的缓存目录和总大小上限
+CACHE_DIR = config.get_str(
+    "STATIC_MAP_CACHE_DIR", os.path.join(config.DATA_DIR, "static_maps")
+)
+MAX_BYTES = config.get_int("STATIC_MAP_CACHE_MAX_BYTES", 200 * 1024 * 1024)
+# 不参与缓存键的参数：密钥
+SECRET_PARAMS = ("key",)
+
+
+def parse_map_url(url: str) -> dict:
+    """
+    解析模型给出的静态地图 URL，返回去掉密钥后的参数。
+    map_position 手工拼接的参数里含有未转义的 ':' ',' '|'，这里只按 '&' 和第一个 '=' 切分。
+    """
+    query = url.split("?", 1)[1] if "?" in url else ""
+    params = {}
+    for part in query.split("&"):
+        if not part:
+            continue
+        name, _, value = part.partition("=")
+        if name in SECRET_PARAMS:
+            continue
+        params[name] = urllib.parse.unquote(value)
+    return params
+
+
+def cache_key(params: dict) -> str:
+    """按规范化的参数（排序后）计算内容地址"""
+    canonical = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class StaticMapCache:
+    """
+    高德静态地图的本地磁盘缓存。
+
+    - 以去掉 key 之后的地图参数做内容寻址，同一张图只从高德下载一次；
+    - 命中时直接返回磁盘上的文件路径，由 st.image 读取文件，URL 和密钥都不会发给浏览器；
+    - 按总大小淘汰最久没用过的图片（命中时更新文件的修改时间）。
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        # 按总大小淘汰最久没用过的图片
+        self.lru = DiskLRU(directory, max_bytes, ".png")
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.png")
+
+    def get(self, url: str):
+        """返回地图图片在磁盘上的路径；下载失败（或高德返回的不是图片）时返回 None"""
+        params = parse_map_url(url)
+        if not params:
+            return None
+        digest = cache_key(params)
+        path = self._path(digest)
+        if os.path.exists(path):
+            self.lru.touch(path)
+            with self._lock:
+                self.hits += 1
+            return path
+        with self._lock:
+            self.misses += 1
+        # 同一张图同时被多个会话请求时只下载一次
+        result, _ = self._flight.do(digest, lambda: self._download(params, path))
+        return result
+
+    def _download(self, params: dict, path: str):
+        if os.path.exists(path):
+            return path
+        api_key = config.amap_key()
+        if not api_key:
+            return None
+        query = "&".join(
+            f"{k}={urllib.parse.quote(v, safe=':,|;*.')}" for k, v in params.items()
+        )
+        try:
+            response = http_get(f"{AMAP_BASE_URL}/v3/staticmap?{query}&key={api_key}")
+        except Exception:
+            return None
+        # 参数错误时高德也返回 200，但内容是 JSON 错误信息
+        if response.status_code != 200 or not response.headers.get(
+            "Content-Type", ""
+        ).startswith("image/"):
+            return None
+        content = response.content
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            # 另一个进程可能刚写过同一张图，只记入大小的差值
+            old_size = self.lru.size_of(path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 磁盘满、目录没有写权限等：这张图不显示，页面照常渲染文字
+            logger.warning(f"写入静态地图缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+        self.lru.account(len(content) - old_size)
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self.lru.total}
+
+
+# 进程内共享的静态地图缓存
+static_map_cache = StaticMapCache()
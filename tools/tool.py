@@ -1,57 +1,197 @@
+import ast
+import asyncio
+import contextvars
+import functools
+import importlib
+import importlib.util
+import inspect
 import json
 import os
+import threading
+from collections.abc import Mapping
 from typing import List, Dict, Any, Callable
-from tools.weather import get_weather, WEATHER_SCHEMA
-from tools.google_search import google_search, GOOGLE_SEARCH
-from tools.get_city import get_city, CITY_SCHEMA
-from tools.get_districts import get_districts, DISTRICT_SCHEMA
-from tools.address_to_location import address_to_location, GEO_SCHEMA
-from tools.nearby_search import (
-    nearby_search,
-    nearby_search_advanced,
-    NEARBY_SEARCH_SCHEMA,
-    NEARBY_SEARCH_SCHEMA_ADVANCED,
-)
-from tools.map_position import map_position, MAP_POSITION
+from tools.tool_cache import ToolCache, default_tool_cache
+from tools.tool_schema import ToolArgumentError, compile_validator
+from utils.logger import tracer
+from utils.singleflight import SingleFlight
+
+# 工具注册表：工具名 -> (模块, 函数名, 工具描述的变量名)
+# 后期新增工具只需在这里添加一行；模块在第一次调用该工具时才导入
+TOOL_REGISTRY = {
+    "get_weather": ("tools.weather", "get_weather", "WEATHER_SCHEMA"),
+    "google_search": ("tools.google_search", "google_search", "GOOGLE_SEARCH"),
+    "get_city": ("tools.get_city", "get_city", "CITY_SCHEMA"),
+    "get_districts": ("tools.get_districts", "get_districts", "DISTRICT_SCHEMA"),
+    "address_to_location": ("tools.address_to_location", "address_to_location", "GEO_SCHEMA"),
+    "batch_address_to_location": (
+        "tools.address_to_location",
+        "batch_address_to_location",
+        "BATCH_GEO_SCHEMA",
+    ),
+    "search_nearby_poi": ("tools.nearby_search", "nearby_search", "NEARBY_SEARCH_SCHEMA"),
+    "nearby_search_advanced": (
+        "tools.nearby_search",
+        "nearby_search_advanced",
+        "NEARBY_SEARCH_SCHEMA_ADVANCED",
+    ),
+    "map_position": ("tools.map_position", "map_position", "MAP_POSITION"),
+    "optimize_route": ("tools.route_optimizer", "optimize_route", "ROUTE_OPTIMIZER_SCHEMA"),
+}
+
+# 进程内共享：不同会话、不同 ReactTools 实例的相同调用也能合并
+default_single_flight = SingleFlight()
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema(module: str, name: str) -> dict:
+    """
+    读取工具描述而不导入工具模块：从源码里找到 name = {...} 的赋值，用 ast.literal_eval 求值。
+    描述不是纯字面量（或找不到源码）时退回到导入模块。
+    """
+    spec = importlib.util.find_spec(module)
+    try:
+        with open(spec.origin, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == name
+                for target in node.targets
+            ):
+                return ast.literal_eval(node.value)
+    except (AttributeError, OSError, SyntaxError, ValueError):
+        pass
+    return getattr(importlib.import_module(module), name)
+
+
+class _LazyTools(Mapping):
+    """工具名 -> 对象，第一次取某个工具时才调用 load(name) 构造并缓存；in 判断不触发加载"""
+
+    def __init__(self, names, load: Callable):
+        self._names = names
+        self._load = load
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str):
+        value = self._loaded.get(name)
+        if value is None:
+            if name not in self._names:
+                raise KeyError(name)
+            with self._lock:
+                value = self._loaded.get(name)
+                if value is None:
+                    value = self._loaded[name] = self._load(name)
+        return value
+
+    def __contains__(self, name) -> bool:
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
 
 
 class ReactTools:
     """
     React Agent 工具类
 
-    为 ReAct Agent 提供标准化的工具接口
+    为 ReAct Agent 提供标准化的工具接口。
+    工具按 TOOL_REGISTRY 懒加载：构造时只读取工具描述（用于生成 prompt），
+    某个工具第一次被调用时才导入它的模块（以及 requests、NumPy 等依赖）。
     """
 
-    def __init__(self) -> None:
-        # 注册工具，后期新增工具只需在这里添加即可
-        self._tools_map: Dict[str, Callable] = {
-            # FIXME:要注册新的函数注册即可
-            "get_weather": get_weather,
-            "google_search": google_search,
-            "get_city": get_city,
-            "get_districts": get_districts,
-            "address_to_location": address_to_location,
-            "search_nearby_poi": nearby_search,
-            "nearby_search_advanced": nearby_search_advanced,
-            "map_position": map_position,
-        }
+    def __init__(
+        self,
+        cache: ToolCache = None,
+        single_flight: SingleFlight = None,
+        registry: dict = None,
+    ) -> None:
+        self.registry = dict(TOOL_REGISTRY if registry is None else registry)
+        self._raw_tools_map: Dict[str, Callable] = _LazyTools(
+            self.registry, self._import_tool
+        )
+        # 按 tool_cache.CACHE_POLICIES 给工具套上缓存，直接用 _tools_map 调用也会命中
+        self.cache = cache or default_tool_cache
+        self._tools_map: Dict[str, Callable] = _LazyTools(
+            self.registry, lambda name: self.cache.wrap(name, self._raw_tools_map[name])
+        )
+        # 合并同时在飞的相同调用，参数按缓存键的规则规整（坐标取整、去掉密钥等）
+        self.single_flight = single_flight or default_single_flight
+        self._signatures = _LazyTools(
+            self.registry, lambda name: inspect.signature(self._raw_tools_map[name])
+        )
         # 注册工具的描述，用于生成prompt
         self.toolConfig = [
-            WEATHER_SCHEMA,
-            GOOGLE_SEARCH,
-            CITY_SCHEMA,
-            DISTRICT_SCHEMA,
-            GEO_SCHEMA,
-            NEARBY_SEARCH_SCHEMA,
-            NEARBY_SEARCH_SCHEMA_ADVANCED,
-            MAP_POSITION,
+            load_schema(module, schema) for module, _, schema in self.registry.values()
         ]
+        # 按描述里的 parameters 预先生成参数校验函数，调用工具前先校验、规整参数
+        self._validators = {}
+        for name, tool in zip(self.registry, self.toolConfig):
+            if tool["name_for_model"] != name:
+                raise ValueError(
+                    f"工具 {name} 的描述里 name_for_model 是 {tool['name_for_model']}，两者必须一致"
+                )
+            self._validators[name] = compile_validator(tool)
+
+    def _import_tool(self, name: str) -> Callable:
+        module, func_name, _ = self.registry[name]
+        return getattr(importlib.import_module(module), func_name)
+
+    def validate_args(self, tool_name: str, kwargs: dict) -> dict:
+        """按工具描述校验并规整参数，不合法时抛出 ToolArgumentError（不会导入工具或发出请求）"""
+        try:
+            return self._validators[tool_name](kwargs)
+        except ToolArgumentError:
+            tracer.incr("agent_tool_invalid_args_total", tool=tool_name)
+            raise
 
     def execute_tool(self, tool_name: str, **kwargs) -> str:
-        """统一的工具执行入口"""
+        """统一的工具执行入口，同时进行中的相同调用只请求一次上游"""
         if tool_name not in self._tools_map:
             return f"错误：工具 {tool_name} 未定义。"
-        return self._tools_map[tool_name](**kwargs)
+        return self._execute(tool_name, self.validate_args(tool_name, kwargs))
+
+    def _execute(self, tool_name: str, kwargs: dict):
+        func = self._tools_map[tool_name]
+        key = self.cache.make_key(tool_name, self._signatures[tool_name], (), kwargs)
+        if key is None:
+            return func(**kwargs)
+        result, shared = self.single_flight.do(
+            key, functools.partial(func, **kwargs), group=tool_name
+        )
+        if shared:
+            tracer.current().set(coalesced=True)
+            tracer.incr("agent_tool_coalesced_total", tool=tool_name)
+        return result
+
+    async def aexecute_tool(self, tool_name: str, executor=None, **kwargs):
+        """
+        异步执行入口：协程工具直接 await；同步工具（基于 requests）放到线程池里执行，
+        不阻塞事件循环。executor 为 None 时使用事件循环默认的线程池。
+        参数在事件循环里校验，不合法时不占用线程池。
+        """
+        if tool_name not in self._tools_map:
+            return f"错误：工具 {tool_name} 未定义。"
+        kwargs = self.validate_args(tool_name, kwargs)
+        func = self._tools_map[tool_name]
+        if inspect.iscoroutinefunction(func):
+            return await func(**kwargs)
+        # 复制上下文，线程里的工具调用仍能挂在当前的追踪 span 下
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            executor,
+            functools.partial(ctx.run, self._execute, tool_name, kwargs),
+        )
+
+    def cache_stats(self) -> dict:
+        """工具缓存的命中/未命中统计"""
+        return self.cache.stats()
+
+    def single_flight_stats(self) -> dict:
+        """请求合并的统计：总调用数、被合并的调用数（按工具分组）、正在进行的调用数"""
+        return self.single_flight.stats()
 
     def get_tool_descriptions(self) -> str:
         """
@@ -0,0 +1,215 @@
+import copy
+import functools
+import inspect
+from typing import Callable, Dict
+import config
+from utils.cache import TTLCache, MISSING
+from utils.logger import tracer
+
+# 坐标保留的小数位数：4 位约等于 10 米，足够让"几乎同一个点"命中同一条缓存
+COORD_PRECISION = config.get_int("TOOL_CACHE_COORD_PRECISION", 4)
+
+# 每个工具的缓存策略（ttl 单位：秒），不在这里的工具不做缓存
+# persist: 同时写入持久化记忆（SQLite），进程重启后仍可复用
+# per_item: 批量工具，list_param 里的每一项按单项工具（参数名 item_param）的策略分别缓存，
+#           批量函数需要返回与输入对齐的列表，每一项和单项工具的返回值相同
+CACHE_POLICIES = {
+    # 行政区划几乎不变
+    "get_districts": {"ttl": 3 * 24 * 3600},
+    # 地址 -> 经纬度 基本不变
+    "address_to_location": {"ttl": 7 * 24 * 3600, "persist": True},
+    # 批量地理编码按地址逐个读写 address_to_location 的缓存，只请求没缓存的地址
+    "batch_address_to_location": {
+        "per_item": "address_to_location",
+        "list_param": "addresses",
+        "item_param": "address",
+    },
+    # IP 定位，短时间内不会变
+    "get_city": {"ttl": 10 * 60},
+    # 周边 POI 的营业状态会变化，只缓存几分钟
+    "search_nearby_poi": {"ttl": 5 * 60, "persist": True},
+    "nearby_search_advanced": {"ttl": 5 * 60, "persist": True},
+    # 天气大约半小时更新一次
+    "get_weather": {"ttl": 30 * 60},
+}
+
+# 表示调用失败的返回值特征，这些结果不写入缓存
+_ERROR_MARKERS = ("错误", "失败", "异常")
+
+
+def _normalize_value(name: str, value):
+    """把参数值规整成稳定的缓存键"""
+    if isinstance(value, str):
+        value = value.strip()
+        if name == "location":
+            return _round_location(value)
+        return value
+    if isinstance(value, float):
+        return round(value, COORD_PRECISION)
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize_value(name, v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize_value(k, v)) for k, v in value.items()))
+    return value
+
+
+def _round_location(location: str) -> str:
+    """'116.4814881,39.9904641' -> '116.4815,39.9905'"""
+    try:
+        lng, lat = (float(x) for x in location.split(","))
+    except ValueError:
+        return location
+    return f"{lng:.{COORD_PRECISION}f},{lat:.{COORD_PRECISION}f}"
+
+
+def _record_cache(tool_name: str, result: str) -> None:
+    """把缓存命中情况记到当前的追踪 span 和指标里（未开启追踪时是空操作）"""
+    tracer.current().set(cache=result)
+    tracer.incr("agent_tool_cache_total", tool=tool_name, result=result)
+
+
+def _is_cacheable(result) -> bool:
+    """失败、空结果不缓存，避免把一次网络抖动缓存很久"""
+    if result is None or result == [] or result == "":
+        return False
+    if isinstance(result, str):
+        return not any(marker in result for marker in _ERROR_MARKERS)
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        return "error" not in result[0]
+    return True
+
+
+class ToolCache:
+    """
+    工具调用的结果缓存。
+
+    用 wrap() 包装工具函数后，无论是通过 ReactTools.execute_tool 还是直接从
+    _tools_map 取函数调用，都会先查缓存。
+    设置了 store（如 memory.manager.MemoryManager）时，内存未命中会再查持久化存储。
+    """
+
+    def __init__(self, policies: dict = None, cache: TTLCache = None, store=None):
+        self.policies = CACHE_POLICIES if policies is None else policies
+        # 持久化存储，需要提供 get_tool_result / put_tool_result
+        self.store = store
+        self.cache = cache or TTLCache(
+            max_entries=config.get_int("TOOL_CACHE_MAX_ENTRIES", 2048),
+            max_bytes=config.get_int("TOOL_CACHE_MAX_BYTES", 16 * 1024 * 1024),
+        )
+
+    def make_key(
+        self, tool_name: str, signature: inspect.Signature, args: tuple, kwargs: dict
+    ):
+        """用规整后的参数构造缓存键"""
+        try:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+        except TypeError:
+            # 参数对不上签名，交给工具函数自己报错
+            return None
+        # 展开 **kwargs 收集到的额外参数
+        for name, param in signature.parameters.items():
+            if param.kind is inspect.Parameter.VAR_KEYWORD:
+                params.update(params.pop(name, {}))
+        # 密钥之类的参数不参与缓存键
+        params.pop("api_key", None)
+        return (tool_name,) + tuple(
+            sorted((k, _normalize_value(k, v)) for k, v in params.items())
+        )
+
+    def _get(self, tool_name: str, key: tuple, policy: dict):
+        """先查内存再查持久化存储，没有时返回 MISSING"""
+        value = self.cache.get(key)
+        if value is not MISSING:
+            _record_cache(tool_name, "memory")
+            return copy.deepcopy(value)
+        if self.store is not None and policy.get("persist"):
+            value = self.store.get_tool_result(tool_name, key)
+            if value is not MISSING:
+                _record_cache(tool_name, "store")
+                self.cache.set(key, copy.deepcopy(value), policy["ttl"])
+                return value
+        _record_cache(tool_name, "miss")
+        return MISSING
+
+    def _put(self, tool_name: str, key: tuple, result, policy: dict) -> None:
+        if not _is_cacheable(result):
+            return
+        self.cache.set(key, copy.deepcopy(result), policy["ttl"])
+        if self.store is not None and policy.get("persist"):
+            self.store.put_tool_result(tool_name, key, result, policy["ttl"])
+
+    def wrap(self, tool_name: str, func: Callable) -> Callable:
+        """按缓存策略包装工具函数，没有策略的工具原样返回"""
+        policy = self.policies.get(tool_name)
+        if policy is None:
+            return func
+        if "per_item" in policy:
+            return self._wrap_per_item(func, policy)
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def cached(*args, **kwargs):
+            key = self.make_key(tool_name, signature, args, kwargs)
+            if key is None:
+                return func(*args, **kwargs)
+            value = self._get(tool_name, key, policy)
+            if value is not MISSING:
+                return value
+            result = func(*args, **kwargs)
+            self._put(tool_name, key, result, policy)
+            return result
+
+        return cached
+
+    def _wrap_per_item(self, func: Callable, policy: dict) -> Callable:
+        """批量工具：逐项查单项工具的缓存，只把没命中的项交给 func，结果写回单项缓存后按输入顺序拼好"""
+        item_tool = policy["per_item"]
+        item_policy = self.policies[item_tool]
+        list_param = policy["list_param"]
+        signature = inspect.signature(func)
+        # 单项工具只有 item_param 一个参数时，这样构造的键和直接调用单项工具的缓存键相同
+        item_signature = inspect.Signature(
+            [inspect.Parameter(policy["item_param"], inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+        )
+
+        @functools.wraps(func)
+        def cached(*args, **kwargs):
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                return func(*args, **kwargs)
+            items = bound.arguments.get(list_param)
+            if not isinstance(items, list):
+                return func(*args, **kwargs)
+            keys = [
+                self.make_key(item_tool, item_signature, (item,), {}) for item in items
+            ]
+            results = {}
+            for key in dict.fromkeys(keys):
+                value = self._get(item_tool, key, item_policy)
+                if value is not MISSING:
+                    results[key] = value
+            hits = len(results)
+            misses = {key: item for key, item in zip(keys, items) if key not in results}
+            if misses:
+                bound.arguments[list_param] = list(misses.values())
+                fetched = func(*bound.args, **bound.kwargs)
+                for key, value in zip(misses, fetched):
+                    results[key] = value
+                    self._put(item_tool, key, value, item_policy)
+            tracer.current().set(cache_hits=hits, cache_misses=len(misses))
+            return [copy.deepcopy(results.get(key)) for key in keys]
+
+        return cached
+
+    def wrap_all(self, tools_map: Dict[str, Callable]) -> Dict[str, Callable]:
+        return {name: self.wrap(name, func) for name, func in tools_map.items()}
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+# 进程内共享一个缓存：Streamlit 的每次 rerun 和每个 ReactTools 实例都能命中
+default_tool_cache = ToolCache()
@@ -0,0 +1,203 @@
+import difflib
+import json
+
+import json5
+
+# 模型常把列表写成一个字符串，按这些分隔符拆开（逗号留给经纬度，不作为分隔符）
+_LIST_SEPARATORS = ("|", ";", "；", "、", "\n")
+_TRUE = {"true", "yes", "1", "是", "对"}
+_FALSE = {"false", "no", "0", "否", "不"}
+_TYPE_NAMES = {
+    "string": "字符串",
+    "integer": "整数",
+    "number": "数字",
+    "boolean": "布尔值",
+    "array": "列表",
+}
+# core/parser.py 解析不出 JSON 时把整段行动输入放进这个参数（只有 google_search 真的有它）
+_RAW_INPUT_KEY = "search_query"
+
+
+class ToolArgumentError(ValueError):
+    """工具参数不符合描述；在调用工具（发出任何请求）之前抛出，错误信息直接作为观察返回给模型"""
+
+
+def _show(value) -> str:
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= 60 else text[:57] + "..."
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _coerce_string(value):
+    if isinstance(value, str):
+        return value.strip()
+    if _is_number(value):
+        return str(value)
+    # 坐标写成了 [116.4, 39.9] 或 {"lng": 116.4, "lat": 39.9}
+    if isinstance(value, (list, tuple)) and value and all(_is_number(v) for v in value):
+        return ",".join(str(v) for v in value)
+    if isinstance(value, dict):
+        lng = next((value[k] for k in ("lng", "lon", "longitude") if k in value), None)
+        lat = next((value[k] for k in ("lat", "latitude") if k in value), None)
+        if _is_number(lng) and _is_number(lat):
+            return f"{lng},{lat}"
+    raise ValueError
+
+
+def _coerce_integer(value):
+    if isinstance(value, str):
+        value = float(value.strip())
+    if _is_number(value) and float(value).is_integer():
+        return int(value)
+    raise ValueError
+
+
+def _coerce_number(value):
+    if isinstance(value, str):
+        return float(value.strip())
+    if _is_number(value):
+        return value
+    raise ValueError
+
+
+def _coerce_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    raise ValueError
+
+
+def _split_list(text: str) -> list:
+    text = text.strip()
+    if text.startswith("["):
+        try:
+            value = json5.loads(text)
+        except ValueError:
+            value = None
+        if isinstance(value, list):
+            return value
+    for separator in _LIST_SEPARATORS:
+        if separator in text:
+            return [part for part in (p.strip() for p in text.split(separator)) if part]
+    return [text] if text else []
+
+
+def _compile_type(schema: dict):
+    """按参数的 schema 生成转换函数：能无损转换的就转换，不能时抛出 ValueError"""
+    kind = schema.get("type")
+    if kind == "string":
+        return _coerce_string
+    if kind == "integer":
+        return _coerce_integer
+    if kind == "number":
+        return _coerce_number
+    if kind == "boolean":
+        return _coerce_boolean
+    if kind == "array":
+        item = _compile_type(schema.get("items") or {})
+
+        def coerce_array(value):
+            if isinstance(value, str):
+                value = _split_list(value)
+            elif isinstance(value, tuple):
+                value = list(value)
+            if not isinstance(value, list):
+                raise ValueError
+            return [item(v) for v in value]
+
+        return coerce_array
+    return lambda value: value
+
+
+def _type_name(schema: dict) -> str:
+    name = _TYPE_NAMES.get(schema.get("type"), schema.get("type") or "任意值")
+    items = schema.get("items")
+    if schema.get("type") == "array" and items:
+        name += f"（元素为{_type_name(items)}）"
+    return name
+
+
+def _format_hint(tool_name: str, params: dict, required: list, raw) -> str:
+    """行动输入不是 JSON 时的提示，附上按参数描述生成的示例"""
+    names = required or list(params)[:1]
+    example = json.dumps(
+        {name: f"<{params[name][1]}>" for name in names}, ensure_ascii=False
+    )
+    return (
+        f"工具 {tool_name} 的行动输入应为 JSON 对象，收到的是纯文本 {_show(raw)}。"
+        f"请按格式重新给出，例如：行动输入：{example}"
+    )
+
+
+def compile_validator(tool_schema: dict):
+    """
+    根据工具描述里的 parameters 生成参数校验函数 validate(kwargs) -> 规整后的 kwargs。
+    - 类型能无损转换的直接转换（如数字坐标转成 "lng,lat"、字符串写的列表拆成列表、"500" 转成 500）；
+    - 缺少必填参数、必填字符串为空、参数名不存在、类型无法转换、数值小于 minimum 时抛出
+      ToolArgumentError，一次列出全部问题，参数名写错时给出最接近的正确参数名；
+    - 行动输入不是 JSON（解析器兜底成了 search_query）而工具没有这个参数时，提示正确的格式；
+    - 值为 None 的可选参数视为没传，使用工具函数自己的默认值。
+    """
+    tool_name = tool_schema.get("name_for_model", "")
+    params = {}
+    required = []
+    for param in tool_schema.get("parameters") or []:
+        schema = param.get("schema") or {}
+        params[param["name"]] = (
+            _compile_type(schema),
+            _type_name(schema),
+            schema.get("minimum"),
+        )
+        if param.get("required"):
+            required.append(param["name"])
+
+    def validate(kwargs: dict) -> dict:
+        if list(kwargs) == [_RAW_INPUT_KEY] and _RAW_INPUT_KEY not in params:
+            raise ToolArgumentError(
+                _format_hint(tool_name, params, required, kwargs[_RAW_INPUT_KEY])
+            )
+        errors = []
+        args = {}
+        for name, value in kwargs.items():
+            if name not in params:
+                guess = difflib.get_close_matches(name, params, n=1, cutoff=0.5)
+                hint = f"（是否想用 {guess[0]}）" if guess else ""
+                errors.append(f"未知参数 {name}{hint}")
+                continue
+            if value is None:
+                continue
+            coerce, type_name, minimum = params[name]
+            try:
+                args[name] = coerce(value)
+            except (TypeError, ValueError):
+                errors.append(f"参数 {name} 应为{type_name}，收到 {_show(value)}")
+                continue
+            if minimum is not None and args[name] < minimum:
+                errors.append(f"参数 {name} 不能小于 {minimum}，收到 {_show(value)}")
+        for name in required:
+            if name in args:
+                if args[name] in ("", []):
+                    errors.append(f"必填参数 {name} 不能为空")
+            elif name not in kwargs or kwargs[name] is None:
+                errors.append(f"缺少必填参数 {name}")
+        if errors:
+            usage = ", ".join(
+                f"{name}{'*' if name in required else ''}" for name in params
+            )
+            raise ToolArgumentError(
+                f"工具 {tool_name} 的参数不正确：{'；'.join(errors)}。"
+                f"可用参数（* 为必填）：{usage or '无'}"
+            )
+        return args
+
+    return validate
@@ -1,5 +1,6 @@
 # tools/weather.py
 import requests
+from utils.http_client import http_get, WTTR_BASE_URL
 
 
 def get_weather(city: str) -> str:
@@ -7,11 +8,11 @@ def get_weather(city: str) -> str:
     通过调用 wttr.in API 查询真实的天气信息。
     """
     # API端点，我们请求JSON格式的数据
-    url = f"https://wttr.in/{city}?format=j1"
+    url = f"{WTTR_BASE_URL}/{city}?format=j1"
 
     try:
         # 发起网络请求
-        response = requests.get(url)
+        response = http_get(url)
         # 检查响应状态码是否为200 (成功)
         response.raise_for_status()
         # 解析返回的JSON数据
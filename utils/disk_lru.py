@@ -0,0 +1,82 @@
+import os
+import threading
+
+# 超出上限时一次清理到上限的多少，避免每写一个文件就扫描一次目录
+EVICT_TO = 0.8
+
+
+class DiskLRU:
+    """
+    按总大小淘汰的磁盘缓存目录：文件的修改时间就是最近使用时间（命中时由调用方 touch），
+    写入文件后调用 account()，超过 max_bytes 时删除最久没用过的文件，直到降到上限的 EVICT_TO。
+    覆盖已有文件时先用 size_of() 取旧文件的大小，只记入差值；删除文件用 discard()。
+    只统计以 suffix 结尾的文件。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        # 目录的总大小，第一次写入时才扫描
+        self.total = None
+
+    @staticmethod
+    def touch(path: str) -> None:
+        """标记为刚用过"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def size_of(path: str) -> int:
+        """文件当前的大小，不存在时为 0"""
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def discard(self, path: str) -> None:
+        """删除一个缓存文件并扣掉它的大小"""
+        size = self.size_of(path)
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        self.account(-size)
+
+    def _scan(self) -> list:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                full = os.path.join(root, name)
+                try:
+                    stat = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, full))
+        return entries
+
+    def account(self, added: int) -> None:
+        """记录新增的字节数（可以是负数），必要时淘汰"""
+        with self._lock:
+            if self.total is None:
+                self.total = sum(size for _, size, _ in self._scan())
+            else:
+                self.total += added
+            if self.total <= self.max_bytes:
+                return
+            entries = sorted(self._scan())
+            self.total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * EVICT_TO
+            for _, size, full in entries:
+                if self.total <= target:
+                    break
+                try:
+                    os.remove(full)
+                    self.total -= size
+                except OSError:
+                    pass
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class BackgroundLoop:
+    """
+    在守护线程里常驻的事件循环，整个进程共用一个。
+
+    同步代码（Streamlit 的脚本线程、ReactAgent.run）用 submit() 把协程交给它执行，
+    所有会话的模型请求、工具调用都在同一个循环里并发，AsyncOpenAI 客户端和连接池也一直复用。
+    提交时会带上调用方的 contextvars（如当前的追踪 span）。
+    """
+
+    def __init__(self, name: str = "agent-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro) -> Future:
+        """提交协程，立即返回 concurrent.futures.Future；future.cancel() 会取消对应的任务"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """提交协程并等待结果；在循环自己的线程里调用会死锁，直接报错"""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("不能在后台事件循环的线程里同步等待，请直接 await")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+
+_default_loop = None
+_default_lock = threading.Lock()
+
+
+def default_loop() -> BackgroundLoop:
+    """进程内共享的后台事件循环，第一次用到时才启动"""
+    global _default_loop
+    with _default_lock:
+        if _default_loop is None:
+            _default_loop = BackgroundLoop()
+        return _default_loop
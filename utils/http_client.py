@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+import config
+from utils.rate_limit import upstreams
+
+# 所有工具共用的 HTTP 客户端：复用 TCP/TLS 连接（keep-alive），并统一设置超时
+# 连接超时 / 读取超时（秒）
+CONNECT_TIMEOUT = config.get_float("HTTP_CONNECT_TIMEOUT", 3.0)
+READ_TIMEOUT = config.get_float("HTTP_READ_TIMEOUT", 10.0)
+# 连接池：最多缓存多少个 host 的连接池，以及每个 host 最多保持多少条连接
+POOL_CONNECTIONS = config.get_int("HTTP_POOL_CONNECTIONS", 8)
+POOL_MAXSIZE = config.get_int("HTTP_POOL_MAXSIZE", 16)
+# 工具内部并发发请求（多页周边搜索、分组批量地理编码）共用的线程池，大小和每个 host 的连接数一致。
+# 池里的任务只调用 http_get/http_post，不会再向这个池提交任务，所以不会互相等待而卡死
+fanout_executor = ThreadPoolExecutor(max_workers=POOL_MAXSIZE, thread_name_prefix="http-fanout")
+
+# 上游服务地址，方便切换到代理或本地的模拟服务
+AMAP_BASE_URL = config.get_str("AMAP_BASE_URL", "https://restapi.amap.com")
+WTTR_BASE_URL = config.get_str("WTTR_BASE_URL", "https://wttr.in")
+SERPER_BASE_URL = config.get_str("SERPER_BASE_URL", "https://google.serper.dev")
+# 按 URL 前缀找到对应上游的限速/重试策略（见 utils/rate_limit.py）
+_UPSTREAM_PREFIXES = (
+    (AMAP_BASE_URL, "amap"),
+    (WTTR_BASE_URL, "wttr"),
+    (SERPER_BASE_URL, "serper"),
+)
+
+_session = None
+_session_lock = threading.Lock()
+# 异步客户端和事件循环绑定，每个事件循环各用一个
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session() -> requests.Session:
+    """获取全局共享的 requests.Session（首次调用时创建）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def upstream_for(url: str):
+    """URL 所属的上游（高德、wttr.in、Serper），其他地址返回 None"""
+    for prefix, name in _UPSTREAM_PREFIXES:
+        if url.startswith(prefix):
+            return upstreams[name]
+    return None
+
+
+def http_get(url: str, params: dict = None, headers: dict = None, timeout=None):
+    """GET 请求，走共享连接池，默认带超时；已知上游的请求按它的策略限速、重试和对冲"""
+
+    def send():
+        return get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+        )
+
+    upstream = upstream_for(url)
+    return upstream.call(send, hedge=True) if upstream else send()
+
+
+def http_post(
+    url: str, data=None, json: dict = None, headers: dict = None, timeout=None
+):
+    """POST 请求，走共享连接池，默认带超时；已知上游的请求限速、重试，但不做对冲（可能按次计费）"""
+
+    def send():
+        return get_session().post(
+            url,
+            data=data,
+            json=json,
+            headers=headers,
+            timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+        )
+
+    upstream = upstream_for(url)
+    return upstream.call(send) if upstream else send()
+
+
+def get_async_client():
+    """获取当前事件循环对应的 httpx.AsyncClient（首次调用时创建），连接池大小和超时与同步客户端一致"""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=POOL_CONNECTIONS * POOL_MAXSIZE,
+                max_keepalive_connections=POOL_MAXSIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def _asend(url: str, send):
+    import httpx
+
+    upstream = upstream_for(url)
+    if upstream is None:
+        return await send()
+    # 连接失败和超时按可重试处理，和同步版本的 ConnectionError / Timeout 对应
+    return await upstream.acall(send, network_errors=(httpx.TransportError,))
+
+
+async def ahttp_get(url: str, params: dict = None, headers: dict = None):
+    """异步 GET 请求，已知上游的请求按它的策略限速和重试（等待时不占用线程，不做对冲）"""
+    client = get_async_client()
+    return await _asend(url, lambda: client.get(url, params=params, headers=headers))
+
+
+async def ahttp_post(url: str, data=None, json: dict = None, headers: dict = None):
+    """异步 POST 请求，已知上游的请求按它的策略限速和重试"""
+    client = get_async_client()
+    return await _asend(
+        url, lambda: client.post(url, content=data, json=json, headers=headers)
+    )
+
+
+def close():
+    """关闭共享的同步连接池（一般在进程退出时调用）"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
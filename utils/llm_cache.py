@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import config
+from utils.disk_lru import DiskLRU
+
+# 模型回复缓存（默认关闭）：相同的模型、参数和对话历史直接返回上次的回复，不再调用接口
+ENABLED = config.get_bool("LLM_CACHE_ENABLED", False)
+CACHE_DIR = config.get_str("LLM_CACHE_DIR", os.path.join(config.DATA_DIR, "llm_cache"))
+# 过期时间（秒）：回复里可能有营业状态、天气等会变的信息，不宜缓存太久
+TTL = config.get_int("LLM_CACHE_TTL", 24 * 3600)
+MAX_BYTES = config.get_int("LLM_CACHE_MAX_BYTES", 50 * 1024 * 1024)
+# 每次都会变、但不影响回复的内容，计算缓存键前去掉
+# （当前时间来自 core/prompt.py 的 build_dynamic_context，精确到分钟）
+VOLATILE_PATTERNS = (re.compile(r"现在时间是 \d{4}-\d{2}-\d{2} \d{2}:\d{2}。"),)
+
+
+def canonical_messages(messages: list) -> list:
+    """只保留 role、name 和去掉易变内容后的 content，首尾空白不影响缓存键"""
+    canonical = []
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, sort_keys=True)
+        for pattern in VOLATILE_PATTERNS:
+            content = pattern.sub("", content)
+        item = {"role": message.get("role"), "content": content.strip()}
+        if message.get("name"):
+            item["name"] = message["name"]
+        canonical.append(item)
+    return canonical
+
+
+class CompletionCache:
+    """
+    模型回复的本地磁盘缓存。
+
+    - 缓存键是模型名、调用参数和规范化后的对话历史的 SHA-256，每条回复一个 JSON 文件；
+    - 超过 ttl 的回复视为未命中并删除；
+    - 按总大小淘汰最久没用过的回复（命中时更新文件的修改时间）。
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: int = TTL, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        # 按总大小淘汰最久没用过的回复
+        self.lru = DiskLRU(directory, max_bytes, ".json")
+        # 多个会话和工具线程会同时读缓存，命中统计加锁
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, messages: list, **params) -> str:
+        payload = {
+            "model": model,
+            "params": {k: v for k, v in params.items() if v is not None},
+            "messages": canonical_messages(messages),
+        }
+        canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """返回缓存的回复文本，没有或已过期时返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if time.time() - record.get("created", 0) > self.ttl:
+            self.lru.discard(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        self.lru.touch(path)
+        with self._lock:
+            self.hits += 1
+        return record.get("text")
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        data = json.dumps({"created": time.time(), "text": text}, ensure_ascii=False)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            # bypass_cache 刷新时会覆盖旧回复，只记入大小的差值
+            old_size = self.lru.size_of(path)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self.lru.account(len(data.encode("utf-8")) - old_size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self.lru.total}
+
+
+# 进程内共享的模型回复缓存，LLM_CACHE_ENABLED 开启时 OpenAICompatibleClient 默认使用
+completion_cache = CompletionCache()
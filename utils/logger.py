@@ -0,0 +1,283 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+# 链路追踪的 JSON Lines 输出文件，设为空字符串则不写文件
+TRACE_JSONL_PATH = config.get_str(
+    "TRACE_JSONL_PATH", os.path.join(config.DATA_DIR, "traces.jsonl")
+)
+# 后台写线程：每攒够多少条 span，或者最多等多久（秒），写一次文件
+TRACE_BATCH_SIZE = 256
+TRACE_FLUSH_INTERVAL = 1.0
+# 延迟直方图的分桶（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """统一的日志格式，级别由环境变量 LOG_LEVEL 控制（默认 INFO）"""
+    logger = logging.getLogger(name)
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+        )
+        logger.addHandler(handler)
+    # 根 logger 已经有 handler（如 Streamlit）时也按 LOG_LEVEL 设置级别
+    logger.setLevel(config.get_str("LOG_LEVEL", "INFO"))
+    return logger
+
+
+class _NoopSpan:
+    """未开启追踪时使用的空 span，所有操作都是空操作"""
+
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一次被追踪的操作：查询 / 一轮迭代 / 一次 LLM 调用 / 一次工具调用"""
+
+    recording = True
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        kind: str,
+        name: str,
+        parent,
+        attrs: dict,
+        detached: bool = False,
+    ):
+        self.tracer = tracer
+        # detached 的 span 不会成为当前 span，用于生成器这类会交出控制权的代码
+        self.detached = detached
+        self.kind = kind
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self._token = None
+
+    def __enter__(self):
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        if not self.detached:
+            self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        # 调用方提前结束生成器不算出错
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.attrs["error"] = repr(exc)
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+        }
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Tracer:
+    """
+    轻量的链路追踪与指标收集。
+
+    - 只有用 span(..., root=True) 开启的一次查询才会记录，子 span 只在有父 span 时创建，
+      未开启时只多一次 ContextVar 读取，几乎没有开销；
+    - span 结束时累计到指标里，并放进队列，由后台线程批量写入 JSON Lines 文件；
+    - 计数器（incr）不依赖 span，任何时候都会累计；
+    - prometheus_text() 输出 Prometheus 文本格式，start_metrics_server() 提供 /metrics。
+    跨线程（如线程池里的工具调用）需要用 contextvars.copy_context() 传递父 span。
+    """
+
+    def __init__(self, jsonl_path: str = TRACE_JSONL_PATH):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._file = None
+        self._queue: queue.Queue = queue.Queue()
+        # 第一次有 span 结束时才启动写线程
+        self._writer = None
+        # (kind, name) -> [count, sum, 每个分桶的计数]
+        self._latency: dict[tuple, list] = {}
+        # (metric, labels) -> value
+        self._counters: dict[tuple, float] = {}
+
+    def span(
+        self,
+        kind: str,
+        name: str = "",
+        root: bool = False,
+        detached: bool = False,
+        **attrs,
+    ):
+        """创建 span；不是根 span 且当前没有正在记录的父 span 时返回空 span"""
+        parent = _current_span.get()
+        if parent is None and not root:
+            return NOOP_SPAN
+        return Span(self, kind, name or kind, parent, attrs, detached)
+
+    def current(self):
+        """当前正在记录的 span，没有时返回空 span"""
+        return _current_span.get() or NOOP_SPAN
+
+    def incr(self, metric: str, value: float = 1, **labels) -> None:
+        """累加计数器"""
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _finish(self, span: Span) -> None:
+        key = (span.kind, span.name)
+        with self._lock:
+            stats = self._latency.get(key)
+            if stats is None:
+                stats = self._latency[key] = [0, 0.0, [0] * len(LATENCY_BUCKETS)]
+            stats[0] += 1
+            stats[1] += span.duration
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if span.duration <= bound:
+                    stats[2][i] += 1
+            if self.jsonl_path and self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="trace-writer", daemon=True
+                )
+                self._writer.start()
+                atexit.register(self.flush)
+        if self.jsonl_path:
+            self._queue.put(span.to_dict())
+
+    def flush(self) -> None:
+        """等待队列里的 span 全部写入文件"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + TRACE_FLUSH_INTERVAL
+            # 攒一批再写，每批只 flush 一次
+            while len(batch) < TRACE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, records: list) -> None:
+        if not self.jsonl_path:
+            return
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+                self._file = open(self.jsonl_path, "a", encoding="utf-8")
+            self._file.write(
+                "".join(
+                    json.dumps(record, ensure_ascii=False, default=str) + "\n"
+                    for record in records
+                )
+            )
+            self._file.flush()
+        except OSError:
+            self.jsonl_path = ""
+
+    def prometheus_text(self) -> str:
+        """以 Prometheus 文本格式导出指标"""
+        lines = [
+            "# HELP agent_span_duration_seconds 各类操作的耗时",
+            "# TYPE agent_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (kind, name), (count, total, buckets) in sorted(self._latency.items()):
+                labels = f'kind="{kind}",name="{name}"'
+                for bound, value in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(
+                        f'agent_span_duration_seconds_bucket{{{labels},le="{bound}"}} {value}'
+                    )
+                lines.append(
+                    f'agent_span_duration_seconds_bucket{{{labels},le="+Inf"}} {count}'
+                )
+                lines.append(f"agent_span_duration_seconds_sum{{{labels}}} {total:.6f}")
+                lines.append(f"agent_span_duration_seconds_count{{{labels}}} {count}")
+            seen = set()
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} counter")
+                    seen.add(metric)
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{metric}{{{label_str}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self, port: int = 9108, host: str = "127.0.0.1"):
+        """在后台线程启动 /metrics 服务，返回 HTTPServer"""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# 进程内共享的 tracer
+tracer = Tracer()
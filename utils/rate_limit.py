@@ -0,0 +1,325 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+import requests
+import config
+from utils.logger import get_logger, tracer
+
+logger = get_logger(__name__)
+
+# 判定结果：成功 / 可重试 / 被限流（可重试，并且本地也要放慢） / 不可重试
+OK, RETRY, THROTTLED, FATAL = "ok", "retry", "throttled", "fatal"
+
+# HTTP 状态码：429 是限流，5xx 是服务端临时错误
+THROTTLE_STATUS = {429}
+RETRY_STATUS = {500, 502, 503, 504}
+
+# 高德 infocode（https://lbs.amap.com/api/webservice/guide/tools/info）
+# 并发/QPS 超限：稍后重试即可
+AMAP_THROTTLED = {
+    "10004",  # ACCESS_TOO_FREQUENT
+    "10014",  # QPS_HAS_EXCEEDED_THE_LIMIT
+    "10019",  # CQPS_HAS_EXCEEDED_THE_LIMIT
+    "10020",  # CKQPS_HAS_EXCEEDED_THE_LIMIT
+    "10021",  # CUQPS_HAS_EXCEEDED_THE_LIMIT
+}
+# 服务端临时故障；3 开头的引擎错误也按可重试处理
+AMAP_RETRYABLE = {
+    "10015",  # GATEWAY_TIMEOUT
+    "10016",  # SERVER_IS_BUSY
+    "10017",  # RESOURCE_UNAVAILABLE
+    "20003",  # UNKNOWN_ERROR
+}
+# 其余（Key 无效、日配额用完、参数错误等）重试也没用
+
+
+class RateLimitTimeout(requests.exceptions.RequestException):
+    """排队等待令牌的时间超过上限。继承 RequestException，工具里现有的网络错误处理可以直接捕获"""
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶：每秒补充 rate 个令牌，最多攒 burst 个。
+    取令牌时先"预订"再睡眠，令牌数可以透支成负数，后来的调用排在后面，保证先来先得。
+    rate <= 0 表示不限速。
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """取一个令牌，返回还需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        """有现成的令牌就取走，不等待"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _reserve_within(self, max_wait: float = None) -> float:
+        """预订一个令牌，返回需要等待的秒数；超过 max_wait 时退还令牌并抛出 RateLimitTimeout"""
+        delay = self.reserve()
+        if max_wait is not None and delay > max_wait:
+            with self._lock:
+                self._tokens += 1
+            raise RateLimitTimeout(f"等待限流令牌需要 {delay:.1f} 秒，超过上限 {max_wait} 秒")
+        return delay
+
+    def acquire(self, max_wait: float = None) -> float:
+        """取一个令牌，必要时睡眠等待，返回等待的秒数；需要等待超过 max_wait 时抛出 RateLimitTimeout"""
+        delay = self._reserve_within(max_wait)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def aacquire(self, max_wait: float = None) -> float:
+        """acquire 的异步版本，等待时不占用线程"""
+        delay = self._reserve_within(max_wait)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def drain(self) -> None:
+        """上游报告限流时清空攒下的令牌，之后的请求按 rate 匀速发出"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+def classify_http(response) -> str:
+    """按 HTTP 状态码判断"""
+    if response.status_code in THROTTLE_STATUS:
+        return THROTTLED
+    if response.status_code in RETRY_STATUS:
+        return RETRY
+    return OK
+
+
+def classify_amap(response) -> str:
+    """高德接口出错时 HTTP 状态码仍是 200，需要看返回 JSON 里的 infocode"""
+    verdict = classify_http(response)
+    if verdict != OK or response.status_code >= 400:
+        return verdict if verdict != OK else FATAL
+    if "json" not in response.headers.get("Content-Type", ""):
+        # 静态地图等返回图片
+        return OK
+    try:
+        data = response.json()
+    except ValueError:
+        return OK
+    if not isinstance(data, dict) or "infocode" not in data or str(data.get("status")) == "1":
+        return OK
+    infocode = str(data["infocode"])
+    if infocode in AMAP_THROTTLED:
+        return THROTTLED
+    if infocode in AMAP_RETRYABLE or infocode.startswith("3"):
+        return RETRY
+    return FATAL
+
+
+# 对冲请求用的线程池：慢请求超过 hedge_after 秒后再发一份，先回来的结果生效
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="http-hedge")
+
+
+class Upstream:
+    """
+    一个上游服务的调用策略：令牌桶限速、带抖动的指数退避重试、可选的对冲请求。
+    所有工具通过 utils/http_client 共用同一个 Upstream 实例，限速是进程级的。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        qps: float,
+        burst: float = None,
+        classify=classify_http,
+        max_retries: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 5.0,
+        max_wait: float = 10.0,
+        hedge_after: float = None,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(qps, burst)
+        self.classify = classify
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.hedge_after = hedge_after
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "fatal": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += value
+
+    def backoff(self, attempt: int, response=None) -> float:
+        """
+        第 attempt 次重试前的等待时间：上限按 2^attempt 增长，在上限的一半到全部之间随机取值，
+        避免多个会话在同一时刻一起重试；服务端给了 Retry-After 时至少等那么久。
+        """
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = cap / 2 + random.uniform(0, cap / 2)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("Retry-After", 0)))
+            except (TypeError, ValueError):
+                pass
+        return min(delay, self.max_delay)
+
+    def call(self, send, hedge: bool = False):
+        """
+        按策略执行 send()（发出一次请求并返回 requests.Response）：
+        - 每次发送前从令牌桶取令牌；
+        - 可重试的错误（限流、5xx、连接失败、超时）按退避时间重试，最多 max_retries 次；
+        - 不可重试的错误或重试用完时，返回最后一次的响应（或抛出最后一次的网络异常），
+          由调用方按原来的方式处理；
+        - hedge 为 True 且设置了 hedge_after 时启用对冲请求（只应用于幂等的 GET）。
+        """
+        attempt = 0
+        while True:
+            self._count_request(self.bucket.acquire(self.max_wait))
+            response, error = None, None
+            try:
+                response = self._send(send, hedge)
+                verdict = self.classify(response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error, verdict = e, RETRY
+            delay = self._retry_delay(verdict, attempt, response)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            time.sleep(delay)
+
+    async def acall(self, send, network_errors: tuple = ()):
+        """
+        call 的异步版本：send 是发出一次请求的协程函数（如 httpx.AsyncClient.get），
+        限速、重试规则与 call 相同，等待令牌和退避时用 asyncio.sleep，不占用线程；不做对冲。
+        network_errors 是按连接失败/超时处理（可重试）的异常类型。
+        """
+        attempt = 0
+        while True:
+            self._count_request(await self.bucket.aacquire(self.max_wait))
+            response, error = None, None
+            try:
+                response = await send()
+                verdict = self.classify(response)
+            except network_errors as e:
+                error, verdict = e, RETRY
+            delay = self._retry_delay(verdict, attempt, response)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _count_request(self, waited: float) -> None:
+        self._count("requests")
+        if waited:
+            self._count("wait_seconds", waited)
+
+    def _retry_delay(self, verdict: str, attempt: int, response):
+        """记录这次请求的结果，返回第 attempt + 1 次重试前要等待的秒数；不再重试时返回 None"""
+        if verdict == THROTTLED:
+            self._count("throttled")
+            self.bucket.drain()
+        elif verdict == FATAL:
+            self._count("fatal")
+        if verdict in (OK, FATAL) or attempt >= self.max_retries:
+            tracer.incr("agent_upstream_requests_total", upstream=self.name, outcome=verdict)
+            return None
+        delay = self.backoff(attempt, response)
+        self._count("retries")
+        tracer.incr("agent_upstream_retries_total", upstream=self.name, reason=verdict)
+        logger.debug(f"{self.name} 第 {attempt + 1} 次重试（{verdict}），等待 {delay:.2f} 秒")
+        return delay
+
+    def _send(self, send, hedge: bool):
+        if not hedge or not self.hedge_after:
+            return send()
+        first = _hedge_executor.submit(send)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FutureTimeout:
+            pass
+        # 对冲请求同样受限速约束，没有现成的令牌就不发，避免在上游变慢时放大压力
+        if not self.bucket.try_acquire():
+            return first.result()
+        self._count("hedged")
+        second = _hedge_executor.submit(send)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = second if second in done and first not in done else first
+        if winner.exception() is not None:
+            # 先结束的那个失败了，等另一个
+            winner = second if winner is first else first
+        if winner is second:
+            self._count("hedge_wins")
+        return winner.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        return stats
+
+
+def _upstream_from_env(name: str, qps: float, classify=classify_http) -> Upstream:
+    """读取 RATE_LIMIT_<NAME>_QPS / _BURST / _HEDGE_AFTER 和全局的 HTTP_MAX_RETRIES"""
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    return Upstream(
+        name,
+        qps=config.get_float(f"{prefix}_QPS", qps),
+        burst=config.get_float(f"{prefix}_BURST", None),
+        classify=classify,
+        max_retries=config.get_int("HTTP_MAX_RETRIES", 3),
+        hedge_after=config.get_float(f"{prefix}_HEDGE_AFTER", None),
+    )
+
+
+# 进程内共享的上游策略；高德个人开发者 Key 的 QPS 限制一般在几十以内
+upstreams = {
+    "amap": _upstream_from_env("amap", 30, classify_amap),
+    "wttr": _upstream_from_env("wttr", 5),
+    "serper": _upstream_from_env("serper", 5),
+}
+
+
+def upstream_stats() -> dict:
+    """各上游的请求、重试、限流、对冲次数和累计排队时间"""
+    return {name: upstream.stats() for name, upstream in upstreams.items()}
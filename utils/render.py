@@ -0,0 +1,29 @@
+import re
+from utils.http_client import AMAP_BASE_URL
+
+# 回复里的高德静态地图（地址和 map_position 一样取自 AMAP_BASE_URL）：
+# 可能是 markdown 图片 ![地图](url)，也可能是裸 URL
+# [^)\s]+ 表示匹配除了 "右括号 )" 和 "空白字符" 之外的所有字符
+_MAP_URL = re.escape(f"{AMAP_BASE_URL}/v3/staticmap?") + r"[^)\s]+"
+MAP_URL_PATTERN = re.compile(rf"!?\[[^\]\n]*\]\(({_MAP_URL})\)|({_MAP_URL})")
+# 长 URL 在正文里替换成的短提示
+MAP_PLACEHOLDER = " *(⬇️ 查看下方地图)* "
+
+
+def build_render_artifact(text: str, resolve_image=None) -> dict:
+    """
+    把一条助手回复解析成渲染产物，每条消息只解析一次，之后页面 rerun 直接用产物渲染：
+    - markdown: 去掉地图 URL 之后的正文
+    - map_url:  回复里的第一张静态地图（没有时为 None）
+    - image:    resolve_image(map_url) 的结果，通常是本地缓存的图片路径；下载失败时为 None
+    """
+    match = MAP_URL_PATTERN.search(text or "")
+    if not match:
+        return {"markdown": text, "map_url": None, "image": None}
+    map_url = match.group(1) or match.group(2)
+    return {
+        "markdown": text.replace(match.group(0), MAP_PLACEHOLDER),
+        "map_url": map_url,
+        "image": resolve_image(map_url) if resolve_image else None,
+    }
+
@@ -0,0 +1,79 @@
+import copy
+import threading
+
+
+class _Call:
+    """一次正在进行中的调用"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并同一时刻的相同调用：同一个 key 第一个到达的调用方真正执行，
+    执行期间到达的其他调用方等待并共享它的结果（或异常），不再重复请求上游。
+
+    和缓存不同，这里只合并"同时在飞"的调用，调用结束后立即释放，不保存结果。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self._calls_total = 0
+        self._merged_total = 0
+        # 每个分组（如工具名）被合并的调用数
+        self._merged_by_group: dict = {}
+
+    def do(self, key, func, group: str = ""):
+        """
+        执行无参的 func()，返回 (result, shared)。
+        shared 为 True 表示结果来自另一个调用方的请求；共享的结果是深拷贝，调用方可以随意修改。
+        """
+        with self._lock:
+            self._calls_total += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                call.waiters += 1
+                self._merged_total += 1
+                self._merged_by_group[group] = self._merged_by_group.get(group, 0) + 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        result = None
+        try:
+            result = func()
+            return result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            if waiters and call.error is None:
+                # 先做一份快照，避免调用方随后修改结果影响到等待者
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self._calls_total,
+                "merged": self._merged_total,
+                "in_flight": len(self._calls),
+                "merged_by_group": dict(self._merged_by_group),
+            }
@@ -0,0 +1,38 @@
+import re
+
+# 中文字符与全角标点
+_CJK_RE = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """优先用 tiktoken 精确计数（首次使用时加载）；没有安装或加载失败时返回 None"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """估算一段文本的 token 数"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # 粗略估算：中文约 0.6 token/字，其余约 4 字符/token
+    cjk = len(_CJK_RE.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) / 4) + 1
+
+
+def count_message_tokens(messages: list) -> int:
+    """估算一组 chat 消息的 token 数（每条消息额外计 4 个格式 token）"""
+    return sum(count_tokens(m.get("content") or "") + 4 for m in messages)